@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from gemma import metrics
+
+
+class Command(BaseCommand):
+    help = "Shows request latency per endpoint recorded by TimingMiddleware"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="print raw JSON")
+        parser.add_argument(
+            "--reset", action="store_true", help="clear the recorded histograms"
+        )
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            metrics.reset()
+            self.stdout.write("Histograms cleared")
+            return
+
+        if not metrics.shared():
+            self.stderr.write(
+                "The cache is local to this process, so requests served by "
+                "other processes are not included; set REDIS_URL to share it."
+            )
+
+        report = metrics.report()
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        if not report:
+            self.stdout.write("No requests recorded")
+            return
+
+        self.stdout.write(
+            f"{'endpoint':<40} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8} "
+            f"{'queries':>8} {'db ms':>8} {'render':>8} {'bytes':>9}"
+        )
+        for endpoint, row in report.items():
+            self.stdout.write(
+                f"{endpoint:<40} {row['count']:>7} {row['p50_ms']:>8} "
+                f"{row['p95_ms']:>8} {row['p99_ms']:>8} {row['db_queries']:>8} "
+                f"{row['db_ms']:>8} {row['render_ms']:>8} {row['bytes']:>9}"
+            )
@@ -0,0 +1,163 @@
+"""
+Per-endpoint latency histograms.
+
+Each worker accumulates its own counters in memory and, at most every
+PERF_FLUSH_INTERVAL seconds, writes a snapshot of them to the cache under
+its own key. Readers (``/api/perf/``, ``manage.py perf_stats``) merge the
+snapshots of all workers, so writers never contend on shared counters.
+With the default per-process LocMemCache a reader only sees the counters
+of its own process; other processes need a shared cache (``REDIS_URL``).
+Times are kept in integer microseconds.
+"""
+
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+# Upper bounds of the wall-time buckets in milliseconds; one more bucket
+# catches everything slower.
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+WORKERS_KEY = "perf:workers"
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+COUNTERS = ("count", "wall_us", "max_us", "db_queries", "db_us", "render_us", "bytes")
+
+
+def _empty() -> dict:
+    stats = dict.fromkeys(COUNTERS, 0)
+    stats["buckets"] = [0] * (len(BUCKETS_MS) + 1)
+    return stats
+
+
+def _bucket(wall_us: int) -> int:
+    wall_ms = wall_us / 1000
+    for i, bound in enumerate(BUCKETS_MS):
+        if wall_ms <= bound:
+            return i
+    return len(BUCKETS_MS)
+
+
+def merge(into: dict, stats: dict) -> dict:
+    for name in COUNTERS:
+        if name == "max_us":
+            into[name] = max(into[name], stats[name])
+        else:
+            into[name] += stats[name]
+    into["buckets"] = [a + b for a, b in zip(into["buckets"], stats["buckets"])]
+    return into
+
+
+class Recorder:
+    """This worker's counters, one entry per endpoint"""
+
+    def __init__(self):
+        self.key = f"perf:worker:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.endpoints = {}
+        self.lock = threading.Lock()
+        self.flushed_at = 0.0
+        self.registered = False
+
+    def record(self, endpoint, wall_us, db_queries, db_us, render_us, size) -> None:
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = _empty()
+            stats["count"] += 1
+            stats["wall_us"] += wall_us
+            stats["max_us"] = max(stats["max_us"], wall_us)
+            stats["db_queries"] += db_queries
+            stats["db_us"] += db_us
+            stats["render_us"] += render_us
+            stats["bytes"] += size
+            stats["buckets"][_bucket(wall_us)] += 1
+
+        if time.monotonic() - self.flushed_at >= settings.PERF_FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                endpoint: {**stats, "buckets": list(stats["buckets"])}
+                for endpoint, stats in self.endpoints.items()
+            }
+
+    def flush(self) -> None:
+        self.flushed_at = time.monotonic()
+        cache.set(self.key, self.snapshot(), SNAPSHOT_TIMEOUT)
+
+        workers = cache.get(WORKERS_KEY) or set()
+        if self.key not in workers:
+            cache.set(WORKERS_KEY, workers | {self.key}, SNAPSHOT_TIMEOUT)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.endpoints.clear()
+
+
+recorder = Recorder()
+
+
+def shared() -> bool:
+    """Whether snapshots written here are visible to other processes."""
+    return not isinstance(caches["default"], LocMemCache)
+
+
+def collect() -> dict[str, dict]:
+    """Counters of every endpoint, merged over all workers."""
+    recorder.flush()
+    workers = cache.get(WORKERS_KEY) or set()
+    merged = {}
+    for snapshot in cache.get_many(list(workers)).values():
+        for endpoint, stats in snapshot.items():
+            merge(merged.setdefault(endpoint, _empty()), stats)
+    return merged
+
+
+def reset() -> None:
+    recorder.reset()
+    workers = cache.get(WORKERS_KEY) or set()
+    cache.delete_many([*workers, WORKERS_KEY])
+
+
+def percentile(stats: dict, q: float) -> float | None:
+    """Upper bound (ms) of the bucket holding the q-th request."""
+    if not stats["count"]:
+        return None
+    rank = q * stats["count"]
+    seen = 0
+    for i, count in enumerate(stats["buckets"]):
+        seen += count
+        if seen >= rank:
+            if i < len(BUCKETS_MS):
+                return float(BUCKETS_MS[i])
+            break
+    return round(stats["max_us"] / 1000, 3)
+
+
+def summarize(stats: dict) -> dict:
+    count = stats["count"] or 1
+    return {
+        "count": stats["count"],
+        "mean_ms": round(stats["wall_us"] / count / 1000, 3),
+        "p50_ms": percentile(stats, 0.50),
+        "p95_ms": percentile(stats, 0.95),
+        "p99_ms": percentile(stats, 0.99),
+        "max_ms": round(stats["max_us"] / 1000, 3),
+        "db_queries": round(stats["db_queries"] / count, 2),
+        "db_ms": round(stats["db_us"] / count / 1000, 3),
+        "render_ms": round(stats["render_us"] / count / 1000, 3),
+        "bytes": stats["bytes"] // count,
+        "histogram": dict(
+            zip([f"le_{bound}ms" for bound in BUCKETS_MS] + ["inf"], stats["buckets"])
+        ),
+    }
+
+
+def report() -> dict[str, dict]:
+    return {endpoint: summarize(stats) for endpoint, stats in sorted(collect().items())}
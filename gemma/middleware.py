@@ -0,0 +1,208 @@
+"""
+Project middleware.
+
+TimingMiddleware samples requests and records wall, database and render
+time per endpoint (see ``gemma.metrics``) and, with PERF_SERVER_TIMING,
+reports them in a ``Server-Timing`` header.
+
+CompressionMiddleware negotiates brotli or gzip from ``Accept-Encoding``. Responses carrying a
+strong ETag (the catalog endpoints, see ``shop.conditional``) are
+compressed once per ETag at a high level and the encoded bytes are kept
+in the cache next to the uncompressed snapshot; everything else is
+compressed per request at a cheaper level.
+"""
+
+import contextlib
+import gzip
+import hashlib
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+from . import metrics
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Codings the client accepts with a non-zero q-value."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def _brotli(content: bytes, quality: int) -> bytes:
+    return brotli.compress(content, quality=quality)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress content with brotli or gzip if the client allows it.
+    Streaming responses and bodies under COMPRESSION_MIN_SIZE are left alone.
+    """
+
+    max_random_bytes = 100
+
+    def _choose(self, request) -> str | None:
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compress(self, encoding: str, content: bytes) -> bytes:
+        if encoding == "br":
+            return _brotli(content, settings.COMPRESSION_BROTLI_QUALITY)
+        return compress_string(content, max_random_bytes=self.max_random_bytes)
+
+    def _compress_cached(self, encoding: str, content: bytes, etag: str) -> bytes:
+        """One high-level compression per representation, shared through the cache."""
+        digest = hashlib.sha1(f"{etag}|{len(content)}".encode()).hexdigest()
+        key = f"gemma:compressed:{encoding}:{digest}"
+
+        compressed = cache.get(key)
+        if compressed is None:
+            if encoding == "br":
+                compressed = _brotli(content, 11)
+            else:
+                compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+        return compressed
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+
+        content_type = response.get("Content-Type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = self._choose(request)
+        if encoding is None:
+            return response
+
+        etag = response.get("ETag", "")
+        if etag.startswith('"') and response.status_code == 200:
+            compressed = self._compress_cached(encoding, response.content, etag)
+        else:
+            compressed = self._compress(encoding, response.content)
+
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        response.headers["Content-Encoding"] = encoding
+
+        # Same as GZipMiddleware: a strong ETag can't describe both
+        # encodings, a weak one still matches conditional requests.
+        if etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        return response
+
+
+class _QueryTimer:
+    """``execute_wrapper`` counting queries and their time"""
+
+    def __init__(self):
+        self.queries = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.queries += 1
+
+
+class TimingMiddleware:
+    """
+    Times a PERF_SAMPLE_RATE share of requests. Render time runs from the
+    view returning a template response to the end of its rendering.
+    Unsampled requests cost one ``random()`` call.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PERF_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timer = _QueryTimer()
+        request._perf_render = [0.0, 0.0]
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        wall = time.perf_counter() - started
+
+        render_start, render_end = request._perf_render
+        render = render_end - render_start if render_end else 0.0
+        size = 0 if response.streaming else len(response.content)
+
+        match = getattr(request, "resolver_match", None)
+        endpoint = f"{request.method} /{match.route}" if match else "<unresolved>"
+        metrics.recorder.record(
+            endpoint,
+            wall_us=int(wall * 1e6),
+            db_queries=timer.queries,
+            db_us=int(timer.elapsed * 1e6),
+            render_us=int(render * 1e6),
+            size=size,
+        )
+
+        if settings.PERF_SERVER_TIMING:
+            response.headers["Server-Timing"] = (
+                f"app;dur={wall * 1000:.1f}, "
+                f'db;dur={timer.elapsed * 1000:.1f};desc="{timer.queries} queries", '
+                f"render;dur={render * 1000:.1f}"
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        marks = getattr(request, "_perf_render", None)
+        if marks is not None:
+            marks[0] = time.perf_counter()
+
+            def rendered(response):
+                marks[1] = time.perf_counter()
+
+            response.add_post_render_callback(rendered)
+        return response
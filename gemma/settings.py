@@ -37,6 +37,8 @@ ALLOWED_HOSTS = config.ALLOWED_HOSTS
 # Application definition
 
 INSTALLED_APPS = [
+    # Ahead of channels, whose unused runworker command it replaces.
+    "tasks",
     "daphne",
     "channels",
     "rest_framework",
@@ -51,12 +53,15 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
 
+    "gemma",
     "shop",
     "user.apps.UserConfig",
 ]
 
 MIDDLEWARE = [
+    "gemma.middleware.TimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    "gemma.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -95,7 +100,26 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    # orjson-backed when installed (`uv sync --extra fast`), stock DRF otherwise
+    "DEFAULT_RENDERER_CLASSES": [
+        "gemma.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "gemma.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Sliding-window limits, see user.rate_limit
+    "DEFAULT_THROTTLE_RATES": {
+        "login_code_ip": "20/min",
+        "login_code_target": "4/min",
+    },
+    # Reverse proxies in front of the app. Throttles key on the client IP
+    # they append to X-Forwarded-For; with 0 the header is ignored and
+    # REMOTE_ADDR is used, so clients can't pick their own IP.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 0)),
 }
 
 WSGI_APPLICATION = "gemma.wsgi.application"
@@ -120,6 +144,96 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+        if REDIS_URL
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "gemma",
+        }
+    ),
+}
+
+# How long a computed catalog version is trusted before it is re-read from
+# the database. Bounds staleness between workers that don't share a cache.
+CATALOG_VERSION_TTL = 30
+CATALOG_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+# Number of fixed-width buckets in the price facet histogram.
+CATALOG_PRICE_BUCKETS = 10
+# Keyset pagination of the product and ingredient lists.
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 200
+# Serve catalog GETs through shop.compiled instead of the DRF serializers.
+CATALOG_COMPILED_SERIALIZERS = True
+# Catalog import (shop.importer): records per bulk write, concurrent image
+# downloads and the per-download timeout in seconds.
+CATALOG_IMPORT_BATCH_SIZE = 500
+CATALOG_IMPORT_IMAGE_WORKERS = 8
+CATALOG_IMPORT_TIMEOUT = 10
+# Rows fetched (and prefetched) per query by the streaming exports.
+EXPORT_CHUNK_SIZE = 1000
+# Delta sync (/api/catalog/changes/): rows per model per call, seconds a
+# change waits before it is served (covers commits that land after their
+# updated_at), and how long tombstones of deleted rows are kept; older
+# cursors get 410 and must resync.
+CATALOG_CHANGES_LIMIT = 500
+CATALOG_CHANGES_LAG = 2
+CATALOG_TOMBSTONE_RETENTION = 60 * 60 * 24 * 30
+
+# Response compression (gemma.middleware.CompressionMiddleware). Brotli is
+# offered when the `brotli` package is installed (`uv sync --extra fast`).
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+# Responses with a strong ETag are compressed once and kept this long.
+COMPRESSION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Request timing (gemma.middleware.TimingMiddleware). Share of requests that
+# are measured; histograms are read from /api/perf/ or `manage.py perf_stats`.
+# Workers publish their counters to the cache, so `perf_stats`, which runs in
+# its own process, only sees them with a cache shared by all processes (Redis).
+PERF_SAMPLE_RATE = 0.1
+# The Server-Timing header shows database time to every client.
+PERF_SERVER_TIMING = DEBUG
+# How often a worker publishes its counters to the cache, in seconds.
+PERF_FLUSH_INTERVAL = 10
+
+# Access tokens are verified from their signed claims, without a database
+# lookup. Revoked token ids are shared through the cache and re-read by
+# each worker at most every JWT_REVOCATION_REFRESH seconds, so this needs a
+# cache shared by all processes (Redis); otherwise every request checks the
+# token row.
+JWT_STATELESS_ACCESS_TOKENS = bool(REDIS_URL)
+JWT_REVOCATION_REFRESH = 5
+# Per-worker cache of users behind valid access tokens.
+JWT_USER_CACHE_SIZE = 1024
+JWT_USER_CACHE_TTL = 30
+# Per-worker cache of token rows, used when tokens are checked against the
+# database (refresh tokens, or access tokens in stateful mode).
+JWT_TOKEN_CACHE_SIZE = 4096
+JWT_TOKEN_CACHE_TTL = 60
+
+# Deletion of expired tokens, old verification codes and finished tasks
+# (user.purge), every PURGE_INTERVAL seconds from TASK_SCHEDULE.
+PURGE_INTERVAL = 60 * 10
+PURGE_BATCH_SIZE = 500
+# Upper bound on rows deleted by one periodic run, None for no limit.
+PURGE_MAX_ROWS = 50_000
+PURGE_VERIFICATION_CODES_AFTER = 60 * 60
+# Sent and failed rows of the outbound mail queue.
+PURGE_OUTBOUND_EMAILS_AFTER = 60 * 60 * 24 * 7
+# Successful and failed QueuedTask rows, with their results.
+PURGE_FINISHED_TASKS_AFTER = 60 * 60 * 24 * 7
+
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 CORS_EXPOSE_HEADERS = ["Content-Type", "X-CSRFToken"]
@@ -172,6 +286,59 @@ EMAIL_HOST_USER = EMAIL
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_PASSWORD")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Outbound mail queue (user.mail). Drained by the user.tasks.send_queued_mail
+# task, enqueued with every message and run every MAIL_QUEUE_POLL_INTERVAL
+# seconds from TASK_SCHEDULE for retries; `manage.py send_queued_mail` does
+# the same by hand.
+MAIL_QUEUE_BATCH_SIZE = 50
+MAIL_QUEUE_MAX_ATTEMPTS = 5
+# Retry after 30s, 60s, 120s, ...
+MAIL_QUEUE_RETRY_DELAY = 30
+# Seconds a claimed batch stays reserved for its worker.
+MAIL_QUEUE_LEASE = 60 * 5
+MAIL_QUEUE_POLL_INTERVAL = 30
+
+# Login codes (user.codes). Codes live in the cache when it is shared by all
+# processes (Redis), in VerificationCode rows otherwise.
+VERIFICATION_CODE_STORE = (
+    "user.codes.CacheCodeStore" if REDIS_URL else "user.codes.DatabaseCodeStore"
+)
+VERIFICATION_CODE_TTL = 60 * 5
+VERIFICATION_CODE_MAX_ATTEMPTS = 5
+# Copy cache-stored codes to VerificationCode, for audit. Opt-in: it starts
+# a flushing thread in every web process (user.codes.start_audit_worker).
+VERIFICATION_CODE_AUDIT = False
+VERIFICATION_CODE_AUDIT_INTERVAL = 5
+
+# Background tasks (django.tasks), run by `manage.py runworker`.
+TASKS = {
+    "default": {
+        "BACKEND": "tasks.backends.DatabaseBackend",
+        "QUEUES": [],
+    },
+}
+# Seconds an idle worker waits before polling the task table again.
+TASK_POLL_INTERVAL = 2
+# Seconds a claimed task stays reserved for its worker; a task still RUNNING
+# after that (its worker died) is run again. Keep it above the longest run.
+TASK_LEASE = 60 * 60
+# Recurring tasks: {name: {"task": "module.path", "interval": seconds,
+# "args": [...], "kwargs": {...}}}
+TASK_SCHEDULE = {
+    "purge_expired": {
+        "task": "user.tasks.purge_expired_rows",
+        "interval": PURGE_INTERVAL,
+    },
+    "send_queued_mail": {
+        "task": "user.tasks.send_queued_mail",
+        "interval": MAIL_QUEUE_POLL_INTERVAL,
+    },
+    "purge_tombstones": {
+        "task": "shop.tasks.purge_catalog_tombstones",
+        "interval": 60 * 60 * 24,
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -25,8 +25,11 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+from .views import PerfStatsView
+
 urlpatterns = [
     path("api/auth/", include("user.urls")),
+    path("api/perf/", PerfStatsView.as_view()),
     path("api/", include("shop.urls")),
     path("admin/", admin.site.urls),
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -0,0 +1,14 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import metrics
+
+
+class PerfStatsView(APIView):
+    """Latency histograms per endpoint, merged over all workers (staff only)"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics.report())
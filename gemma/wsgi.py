@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gemma.settings')
 
 application = get_wsgi_application()
+
+from user.codes import start_audit_worker  # noqa: E402  (needs the app registry)
+
+# Only with VERIFICATION_CODE_AUDIT; periodic jobs run in `manage.py runworker`.
+start_audit_worker()
@@ -1,5 +1,44 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 
 
 class ShopConfig(AppConfig):
     name = 'shop'
+
+    def ready(self):
+        from .changes import SOURCES
+        from .models import (
+            Category,
+            CategoryProductSize,
+            DoughType,
+            Product,
+            ProductIngredient,
+        )
+        from .signals import (
+            catalog_changed,
+            category_deleted,
+            category_link_changed,
+            dough_type_deleted,
+            dough_types_changed,
+            product_link_changed,
+            record_tombstone,
+        )
+        from .versioning import CATALOG_MODELS
+
+        for model in CATALOG_MODELS:
+            post_save.connect(catalog_changed, sender=model)
+            post_delete.connect(catalog_changed, sender=model)
+
+        m2m_changed.connect(catalog_changed, sender=Product.dough_types.through)
+
+        # Delta sync: deletions leave tombstones, link changes touch the
+        # product or category they belong to.
+        for model, columns in SOURCES.values():
+            post_delete.connect(record_tombstone, sender=model)
+        for signal in (post_save, post_delete):
+            signal.connect(product_link_changed, sender=ProductIngredient)
+            signal.connect(category_link_changed, sender=CategoryProductSize)
+        m2m_changed.connect(dough_types_changed, sender=Product.dough_types.through)
+        # Deletes that change products without a signal of their own
+        pre_delete.connect(dough_type_deleted, sender=DoughType)
+        pre_delete.connect(category_deleted, sender=Category)
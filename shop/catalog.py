@@ -0,0 +1,263 @@
+"""
+# shop/catalog.py
+
+Catalog assembly: prefetch trees for the read endpoints and the
+query-param filters of the home page resolved once per request.
+
+The serializer modules import the filter helpers from here, so they are
+imported lazily inside the functions below.
+"""
+
+import functools
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import ValidationError
+
+from .facets import get_facet_index
+from .models import (
+    Category,
+    CategoryProductSize,
+    DoughType,
+    Ingredient,
+    Product,
+    ProductIngredient,
+)
+
+PRICE_QUANTUM = Decimal("0.01")
+PRODUCT_EXPANDABLE = frozenset({"ingredients", "dough_types"})
+
+
+def parse_product_filters(query_params) -> dict:
+    """Parses the product filters of the home page query string."""
+
+    def _ids(name):
+        try:
+            return [int(value) for value in query_params.getlist(name)]
+        except ValueError:
+            raise ValidationError({name: "Ожидается целое число"})
+
+    def _price(name):
+        value = query_params.get(name)
+        if not value:
+            return None
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            price = None
+        if price is None or not price.is_finite():
+            raise ValidationError({name: "Ожидается число"})
+        return price
+
+    return {
+        "dough_type": _ids("dough_type"),
+        "product_size": _ids("product_size"),
+        "ingredient": _ids("ingredient"),
+        "min_price": _price("min_price"),
+        "max_price": _price("max_price"),
+    }
+
+
+def has_filters(filters: dict) -> bool:
+    return any(value not in (None, []) for value in filters.values())
+
+
+def filter_products(qs, filters: dict):
+    """Applies parsed filters to a product queryset."""
+    filters_list = Q()
+
+    if filters["dough_type"]:
+        filters_list &= Q(dough_types__in=filters["dough_type"])
+
+    if filters["product_size"]:
+        filters_list &= Q(
+            category__category_product_size__product_size_id__in=filters["product_size"]
+        )
+
+    if filters["ingredient"]:
+        filters_list &= Q(product_ingredient__ingredient_id__in=filters["ingredient"])
+
+    if filters["min_price"] is not None:
+        filters_list &= Q(price__gte=filters["min_price"])
+
+    if filters["max_price"] is not None:
+        filters_list &= Q(price__lte=filters["max_price"])
+
+    return qs.filter(filters_list).distinct()
+
+
+def filtered_product_ids(filters: dict) -> set[int] | None:
+    """Ids of all products matching the filters, ``None`` when unfiltered."""
+    if not has_filters(filters):
+        return None
+    return get_facet_index().resolve(filters)
+
+
+def facet_counts(filters: dict) -> dict:
+    """Per-value product counts under the filters, for the storefront sidebar."""
+    counts = get_facet_index().counts(filters)
+    for bucket in counts["price"]:
+        bucket["min"] = str(bucket["min"].quantize(PRICE_QUANTUM))
+        bucket["max"] = str(bucket["max"].quantize(PRICE_QUANTUM))
+    return counts
+
+
+@functools.cache
+def _product_field_names() -> frozenset[str]:
+    from .serializers import ProductSerializer
+
+    return frozenset(ProductSerializer().fields)
+
+
+def parse_product_fields(query_params) -> dict:
+    """Parses ``?fields=`` and ``?expand=`` into ``ProductSerializer`` context."""
+
+    def _names(name, allowed):
+        value = query_params.get(name)
+        if value is None:
+            return None
+        names = {part.strip() for part in value.split(",") if part.strip()}
+        unknown = names - allowed
+        if unknown:
+            raise ValidationError(
+                {name: f"Неизвестные поля: {', '.join(sorted(unknown))}"}
+            )
+        return names
+
+    return {
+        "fields": _names("fields", _product_field_names()),
+        "expand": _names("expand", PRODUCT_EXPANDABLE),
+    }
+
+
+def product_queryset(fields: set[str] | None = None):
+    """Products with the relations ``ProductSerializer`` will read prefetched."""
+    prefetches = []
+    if fields is None or "ingredients" in fields:
+        prefetches.append(
+            Prefetch(
+                "product_ingredient",
+                queryset=ProductIngredient.objects.select_related(
+                    "ingredient"
+                ).order_by("pk"),
+            )
+        )
+    if fields is None or "dough_types" in fields:
+        prefetches.append(
+            Prefetch("dough_types", queryset=DoughType.objects.order_by("pk"))
+        )
+    return Product.objects.order_by("pk").prefetch_related(*prefetches)
+
+
+def category_queryset(
+    fields: set[str] | None = None, product_ids: set[int] | None = None
+):
+    """
+    Categories with their products and sizes prefetched in a fixed number
+    of queries; ``product_ids`` limits the products (and their links) read.
+    """
+    products = product_queryset(fields)
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    return Category.objects.order_by("pk").prefetch_related(
+        Prefetch("products", queryset=products),
+        Prefetch(
+            "category_product_size",
+            queryset=CategoryProductSize.objects.select_related(
+                "product_size"
+            ).order_by("pk"),
+        ),
+    )
+
+
+def listing_queryset(model, fields: set[str] | None = None):
+    """What the list endpoints paginate: ``values()`` rows or prefetched instances."""
+    from .compiled import IngredientCompiled, ProductCompiled
+
+    if settings.CATALOG_COMPILED_SERIALIZERS:
+        compiled = ProductCompiled if model is Product else IngredientCompiled
+        return model.objects.values(*compiled.columns())
+    if model is Product:
+        return product_queryset(fields)
+    return model.objects.all()
+
+
+def serialize_listing(model, page, context: dict) -> list:
+    """Serializes a page taken from ``listing_queryset``."""
+    from .compiled import IngredientCompiled, ProductCompiled
+    from .serializers import IngredientSerializer, ProductSerializer
+
+    if settings.CATALOG_COMPILED_SERIALIZERS:
+        if model is Product:
+            return ProductCompiled(context).serialize(page)
+        return IngredientCompiled(context).many(page)
+
+    serializer = ProductSerializer if model is Product else IngredientSerializer
+    return serializer(page, many=True, context=context).data
+
+
+def serialize_product(pk: int, context: dict) -> dict:
+    from .compiled import ProductCompiled
+    from .serializers import ProductSerializer
+
+    fields = context.get("fields")
+    if not settings.CATALOG_COMPILED_SERIALIZERS:
+        product = get_object_or_404(product_queryset(fields), id=pk)
+        return ProductSerializer(product, context=context).data
+
+    rows = ProductCompiled(context).serialize(
+        Product.objects.filter(id=pk).values(*ProductCompiled.columns())
+    )
+    if not rows:
+        raise Http404
+    return rows[0]
+
+
+def build_home_payload(request) -> dict:
+    """Assembles the ``/api/home/`` payload."""
+    from .compiled import CategoryCompiled, DoughTypeCompiled, IngredientCompiled
+    from .serializers import (
+        CategorySerializer,
+        DoughTypeSerializer,
+        IngredientSerializer,
+    )
+
+    filters = parse_product_filters(request.query_params)
+    product_fields = parse_product_fields(request.query_params)
+    context = {
+        "request": request,
+        "product_ids": filtered_product_ids(filters),
+        **product_fields,
+    }
+
+    if settings.CATALOG_COMPILED_SERIALIZERS:
+        return {
+            "category": CategoryCompiled(context).serialize(
+                Category.objects.order_by("pk").values(*CategoryCompiled.columns())
+            ),
+            "ingredients": IngredientCompiled(context).many(
+                Ingredient.objects.order_by("pk").values(*IngredientCompiled.columns())
+            ),
+            "dought_tyoes": DoughTypeCompiled(context).many(
+                DoughType.objects.order_by("pk").values(*DoughTypeCompiled.columns())
+            ),
+            "facets": facet_counts(filters),
+        }
+
+    return {
+        "category": CategorySerializer(
+            category_queryset(product_fields["fields"], context["product_ids"]),
+            many=True,
+            context=context,
+        ).data,
+        "ingredients": IngredientSerializer(
+            Ingredient.objects.order_by("pk"), many=True, context=context
+        ).data,
+        "dought_tyoes": DoughTypeSerializer(
+            DoughType.objects.order_by("pk"), many=True, context=context
+        ).data,
+        "facets": facet_counts(filters),
+    }
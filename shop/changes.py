@@ -0,0 +1,240 @@
+"""
+# shop/changes.py
+
+Delta sync of the catalog. A client keeps the opaque cursor returned by
+``GET /catalog/changes/`` and passes it back as ``?since=``. The answer
+holds the rows changed after the cursor and the ids deleted after it,
+plus a new cursor.
+
+Every model is read in ``(updated_at, id)`` order from where the cursor
+left it (tombstones in ``(deleted_at, id)`` order), on matching indexes,
+at most CATALOG_CHANGES_LIMIT rows per model; ``has_more`` asks the
+client to call again at once.
+
+Only rows older than CATALOG_CHANGES_LAG seconds are returned, so a
+transaction that commits a little after it stamped ``updated_at`` is
+still picked up by the next poll. Bulk writers that run long
+transactions (the importer, the seeder) call ``stamp`` as their last
+statement before commit, so the lag only has to cover the commit. Link tables have no rows of their own
+in the answer: a product or category whose links change is touched
+(see ``shop.signals``) and comes back with its full link lists.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    Category,
+    CategoryProductSize,
+    DoughType,
+    Ingredient,
+    Product,
+    ProductIngredient,
+    ProductSize,
+    Tombstone,
+)
+
+# Response key -> (model, values() columns)
+SOURCES = {
+    "categories": (Category, ["id", "name", "updated_at"]),
+    "products": (
+        Product,
+        ["id", "name", "price", "category_id", "image", "updated_at"],
+    ),
+    "ingredients": (Ingredient, ["id", "name", "price", "image", "updated_at"]),
+    "dough_types": (DoughType, ["id", "name", "value", "order", "updated_at"]),
+    "product_sizes": (ProductSize, ["id", "name", "size", "order", "updated_at"]),
+}
+TOMBSTONE_KEYS = {model._meta.model_name: key for key, (model, _) in SOURCES.items()}
+DELETED = "deleted"
+
+CENT = Decimal("0.01")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorExpired(Exception):
+    """The tombstones a cursor needs may have been purged; resync from scratch."""
+
+
+def encode_cursor(positions: dict) -> str:
+    """``{key: (timestamp, id)}`` -> opaque cursor"""
+    raw = json.dumps(
+        {key: [at.isoformat(), pk] for key, (at, pk) in positions.items()},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(encoded: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+        positions = {
+            key: (datetime.datetime.fromisoformat(at), int(pk))
+            for key, (at, pk) in json.loads(raw).items()
+        }
+    except (binascii.Error, ValueError, TypeError, AttributeError):
+        raise InvalidCursor(encoded)
+    if positions.keys() != {*SOURCES, DELETED}:
+        raise InvalidCursor(encoded)
+    # Naive times can't be compared with the database's aware ones.
+    if any(timezone.is_naive(at) for at, pk in positions.values()):
+        raise InvalidCursor(encoded)
+    return positions
+
+
+def _after(field: str, position) -> Q:
+    """``(field, id) > position`` spelled out in Q."""
+    at, pk = position
+    return Q(**{f"{field}__gt": at}) | Q(**{field: at, "id__gt": pk})
+
+
+def _page(queryset, field: str, position, upper, limit):
+    """
+    ``values()`` rows after ``position`` up to ``upper``; returns the rows,
+    the position to continue from and whether rows were left out.
+    """
+    if position is not None:
+        queryset = queryset.filter(_after(field, position))
+    rows = list(
+        queryset.filter(**{f"{field}__lte": upper}).order_by(field, "id")[: limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    last = (rows[-1][field], rows[-1]["id"]) if rows else None
+    if more:
+        return rows, last, True
+    # Everything up to ``upper`` has been seen.
+    return rows, max(filter(None, [last, (upper, 0)])), False
+
+
+def _image_url(request, name):
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _links(model, owner: str, target: str, owner_ids, *extra) -> dict:
+    links = defaultdict(list)
+    rows = (
+        model.objects.filter(**{f"{owner}__in": owner_ids})
+        .order_by("pk")
+        .values_list(owner, target, *extra)
+    )
+    for owner_id, *values in rows:
+        links[owner_id].append(values[0] if not extra else values)
+    return links
+
+
+def _present(key: str, rows: list[dict], request) -> list[dict]:
+    for row in rows:
+        if "price" in row:
+            row["price"] = str(row["price"].quantize(CENT))
+        if "image" in row:
+            row["image"] = _image_url(request, row["image"])
+
+    ids = [row["id"] for row in rows]
+    if key == "products" and ids:
+        dough_types = _links(
+            Product.dough_types.through, "product_id", "doughtype_id", ids
+        )
+        ingredients = _links(
+            ProductIngredient, "product_id", "ingredient_id", ids, "is_default"
+        )
+        for row in rows:
+            row["dough_types"] = dough_types[row["id"]]
+            row["ingredients"] = [
+                {"id": ingredient_id, "is_default": is_default}
+                for ingredient_id, is_default in ingredients[row["id"]]
+            ]
+    elif key == "categories" and ids:
+        sizes = _links(CategoryProductSize, "category_id", "product_size_id", ids)
+        for row in rows:
+            row["product_sizes"] = sizes[row["id"]]
+    return rows
+
+
+def catalog_changes(since: str | None = None, request=None, limit=None) -> dict:
+    """
+    Changes after the ``since`` cursor, or the whole catalog without one.
+    Raises InvalidCursor or CursorExpired.
+    """
+    limit = limit or settings.CATALOG_CHANGES_LIMIT
+    now = timezone.now()
+    upper = now - datetime.timedelta(seconds=settings.CATALOG_CHANGES_LAG)
+
+    positions = {}
+    if since:
+        positions = decode_cursor(since)
+        retention = datetime.timedelta(seconds=settings.CATALOG_TOMBSTONE_RETENTION)
+        if positions[DELETED][0] < now - retention:
+            raise CursorExpired(since)
+
+    changes, deleted = {}, {key: [] for key in SOURCES}
+    new_positions, has_more = {}, False
+    for key, (model, columns) in SOURCES.items():
+        rows, new_positions[key], more = _page(
+            model.objects.values(*columns),
+            "updated_at",
+            positions.get(key),
+            upper,
+            limit,
+        )
+        changes[key] = _present(key, rows, request)
+        has_more |= more
+
+    if since:
+        tombstones, new_positions[DELETED], more = _page(
+            Tombstone.objects.values("id", "model", "object_id", "deleted_at"),
+            "deleted_at",
+            positions.get(DELETED),
+            upper,
+            limit,
+        )
+        for tombstone in tombstones:
+            if tombstone["model"] in TOMBSTONE_KEYS:
+                key = TOMBSTONE_KEYS[tombstone["model"]]
+                deleted[key].append(tombstone["object_id"])
+        has_more |= more
+    else:
+        # A full sync has nothing to delete.
+        new_positions[DELETED] = (upper, 0)
+
+    return {
+        "cursor": encode_cursor(new_positions),
+        "has_more": has_more,
+        "changes": changes,
+        "deleted": deleted,
+    }
+
+
+def stamp(touched: dict, batch_size: int = 2000) -> None:
+    """Sets ``updated_at`` of the ``{model: pks}`` rows to now."""
+    now = timezone.now()
+    for model, pks in touched.items():
+        pks = sorted(pks)
+        for start in range(0, len(pks), batch_size):
+            model.objects.filter(pk__in=pks[start : start + batch_size]).update(
+                updated_at=now
+            )
+
+
+def purge_tombstones(now=None) -> int:
+    """Deletes tombstones no live cursor can still need."""
+    now = now or timezone.now()
+    before = now - datetime.timedelta(seconds=settings.CATALOG_TOMBSTONE_RETENTION)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=before).delete()
+    return deleted
@@ -0,0 +1,279 @@
+"""
+# shop/compiled.py
+
+Compiled read path for the catalog GET endpoints. Each class compiles
+the field plan of a DRF serializer once and then turns ``values()`` rows
+into plain dicts, producing the same JSON as the DRF serializers without
+per-row field dispatch or nested serializer instances.
+"""
+
+import decimal
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from rest_framework import fields as drf_fields
+from rest_framework import relations
+
+from .models import CategoryProductSize, Product, ProductIngredient
+from .serializers import (
+    CategorySerializer,
+    DoughTypeSerializer,
+    IngredientSerializer,
+    ProductSerializer,
+    ProductSizeSerializer,
+)
+
+
+def _decimal_converter(field):
+    exponent = decimal.Decimal(".1") ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        return f"{value.quantize(exponent, rounding=rounding, context=context):f}"
+
+    return convert
+
+
+def _datetime_converter(serializer):
+    tz = serializer.tz
+
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+def _converter(field, serializer):
+    if isinstance(field, drf_fields.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, drf_fields.DateTimeField):
+        return _datetime_converter(serializer)
+    if isinstance(field, drf_fields.IntegerField):
+        return int
+    if isinstance(field, drf_fields.CharField):
+        return str
+    return field.to_representation
+
+
+class CompiledSerializer:
+    """
+    Read-only counterpart of a DRF ``ModelSerializer``.
+
+    The plan is a list of ``(name, column, kind)`` computed once per class
+    from ``source``; ``columns()`` lists what to pass to ``values()``.
+    Method fields are looked up as ``get_<name>(row)`` on the subclass.
+    """
+
+    source = None
+    uses_field_selection = False
+    _plan = None
+
+    def __init__(self, context: dict):
+        self.context = context
+        self.request = context.get("request")
+        self.tz = timezone.get_current_timezone()
+
+        fields = self.context.get("fields") if self.uses_field_selection else None
+        self.entries = []
+        for name, column, kind in self.plan():
+            if fields is not None and name not in fields:
+                continue
+            if kind == "method":
+                self.entries.append((name, None, getattr(self, f"get_{name}")))
+            else:
+                self.entries.append((name, column, self._convert(kind)))
+
+    @classmethod
+    def plan(cls) -> list[tuple[str, str | None, object]]:
+        if cls.__dict__.get("_plan") is None:
+            plan = []
+            for name, field in cls.source().fields.items():
+                if isinstance(field, drf_fields.SerializerMethodField):
+                    plan.append((name, None, "method"))
+                elif isinstance(field, relations.PrimaryKeyRelatedField):
+                    attname = cls.source.Meta.model._meta.get_field(name).attname
+                    plan.append((name, attname, "pk"))
+                else:
+                    plan.append((name, field.source, field))
+            cls._plan = plan
+        return cls._plan
+
+    @classmethod
+    def columns(cls) -> list[str]:
+        return [column for _, column, _ in cls.plan() if column is not None]
+
+    def _convert(self, kind):
+        if kind == "pk":
+            return None
+        return _converter(kind, self)
+
+    def to_representation(self, row: dict) -> dict:
+        data = {}
+        for name, column, convert in self.entries:
+            if column is None:
+                data[name] = convert(row)
+                continue
+            value = row[column]
+            data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    def many(self, rows) -> list[dict]:
+        return [self.to_representation(row) for row in rows]
+
+    def image_url(self, name: str) -> str | None:
+        if not name:
+            return None
+        return self.request.build_absolute_uri(default_storage.url(name))
+
+
+class IngredientCompiled(CompiledSerializer):
+    source = IngredientSerializer
+
+    @classmethod
+    def columns(cls) -> list[str]:
+        return super().columns() + ["image"]
+
+    def get_image(self, row) -> str | None:
+        return self.image_url(row["image"])
+
+
+class DoughTypeCompiled(CompiledSerializer):
+    source = DoughTypeSerializer
+
+
+class ProductSizeCompiled(CompiledSerializer):
+    source = ProductSizeSerializer
+
+
+def _prefixed(rows, relation: str, key: str) -> dict[int, list[dict]]:
+    """Groups joined ``values()`` rows by ``key`` and strips the relation prefix."""
+    grouped = defaultdict(list)
+    prefix = f"{relation}__"
+    for row in rows:
+        grouped[row[key]].append(
+            {name[len(prefix) :]: value for name, value in row.items() if name != key}
+        )
+    return grouped
+
+
+class ProductCompiled(CompiledSerializer):
+    source = ProductSerializer
+    uses_field_selection = True
+
+    def __init__(self, context: dict):
+        super().__init__(context)
+        self.ingredients = IngredientCompiled(context)
+        self.dough_types = DoughTypeCompiled(context)
+
+    @classmethod
+    def columns(cls) -> list[str]:
+        return super().columns() + ["image"]
+
+    def _expanded(self, name) -> bool:
+        expand = self.context.get("expand")
+        if expand is None:
+            return not self.context.get("minimal")
+        return name in expand
+
+    def _wanted(self, name) -> bool:
+        fields = self.context.get("fields")
+        return fields is None or name in fields
+
+    def load(self, rows, product_ids=None) -> list[dict]:
+        """
+        Fetches the relations of ``rows`` in one query each. ``product_ids``
+        narrows the relation queries; ``None`` loads them for all products.
+        """
+        self._ingredients = {}
+        self._dough_types = {}
+
+        if self._wanted("ingredients"):
+            if self._expanded("ingredients"):
+                columns = [f"ingredient__{c}" for c in IngredientCompiled.columns()]
+            else:
+                columns = ["ingredient__name"]
+            links = ProductIngredient.objects.order_by("pk")
+            if product_ids is not None:
+                links = links.filter(product_id__in=product_ids)
+            self._ingredients = _prefixed(
+                links.values("product_id", *columns), "ingredient", "product_id"
+            )
+
+        if self._wanted("dough_types"):
+            if self._expanded("dough_types"):
+                columns = [f"doughtype__{c}" for c in DoughTypeCompiled.columns()]
+            else:
+                columns = ["doughtype__name"]
+            links = Product.dough_types.through.objects.order_by("doughtype_id")
+            if product_ids is not None:
+                links = links.filter(product_id__in=product_ids)
+            self._dough_types = _prefixed(
+                links.values("product_id", *columns), "doughtype", "product_id"
+            )
+
+        return rows
+
+    def get_image(self, row) -> str | None:
+        return self.image_url(row["image"])
+
+    def get_ingredients(self, row) -> list:
+        ingredients = self._ingredients.get(row["id"], [])
+        if not self._expanded("ingredients"):
+            return [ingredient["name"] for ingredient in ingredients]
+        return self.ingredients.many(ingredients)
+
+    def get_dough_types(self, row) -> list:
+        dough_types = self._dough_types.get(row["id"], [])
+        if not self._expanded("dough_types"):
+            return [str(dough_type["name"]) for dough_type in dough_types]
+        return self.dough_types.many(dough_types)
+
+    def serialize(self, rows) -> list[dict]:
+        rows = list(rows)
+        self.load(rows, [row["id"] for row in rows])
+        return self.many(rows)
+
+
+class CategoryCompiled(CompiledSerializer):
+    source = CategorySerializer
+
+    def __init__(self, context: dict):
+        super().__init__(context)
+        self.products = ProductCompiled({**context, "minimal": True})
+        self.product_sizes = ProductSizeCompiled(context)
+
+    def serialize(self, rows) -> list[dict]:
+        """
+        Serializes categories with their products and sizes. With filters,
+        only the products in ``product_ids`` and their links are read.
+        """
+        product_ids = self.context.get("product_ids")
+
+        products = defaultdict(list)
+        product_rows = Product.objects.order_by("pk").values(*ProductCompiled.columns())
+        if product_ids is not None:
+            product_rows = product_rows.filter(pk__in=product_ids)
+        for row in self.products.load(product_rows, product_ids):
+            products[row["category_id"]].append(row)
+        self._products = products
+
+        links = CategoryProductSize.objects.order_by("pk").values(
+            "category_id",
+            *[f"product_size__{c}" for c in ProductSizeCompiled.columns()],
+        )
+        self._product_sizes = _prefixed(links, "product_size", "category_id")
+
+        return self.many(rows)
+
+    def get_products(self, row) -> list[dict]:
+        return self.products.many(self._products.get(row["id"], []))
+
+    def get_product_sizes(self, row) -> list[dict]:
+        return self.product_sizes.many(self._product_sizes.get(row["id"], []))
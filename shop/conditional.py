@@ -0,0 +1,50 @@
+"""
+# shop/conditional.py
+
+Conditional GET for the catalog endpoints. Validators come from the
+catalog version stamp, so a matching ``If-None-Match`` or
+``If-Modified-Since`` is answered with 304 before any serialization.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .versioning import catalog_stamp
+
+
+def catalog_validators(request) -> tuple[str, int | None]:
+    """Strong ETag and Last-Modified timestamp for a catalog representation."""
+    version, last_modified = catalog_stamp()
+
+    renderer = getattr(request, "accepted_media_type", "")
+    raw = f"{version}|{request.build_absolute_uri()}|{renderer}"
+    etag = '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def catalog_conditional(view_method):
+    """Wraps a catalog ``get`` handler with ETag / Last-Modified handling."""
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = catalog_validators(request)
+
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response.headers.setdefault("ETag", etag)
+        if last_modified is not None:
+            response.headers.setdefault("Last-Modified", http_date(last_modified))
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    return wrapper
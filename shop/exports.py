@@ -0,0 +1,209 @@
+"""
+# shop/exports.py
+
+Streaming exports of the catalog and the order history as JSONL or CSV.
+
+Rows are read with ``QuerySet.iterator(chunk_size=EXPORT_CHUNK_SIZE)``;
+the relations of each chunk are prefetched with one query per relation
+as the chunk is fetched, and every row is encoded and handed on before
+the next chunk is read. Memory use depends on the chunk size, not on
+the size of the export. Under ASGI the lines come from ``aexport``,
+which reads them in a worker thread, since Django buffers a synchronous
+iterator in full before sending it there.
+
+CSV cells starting with a character a spreadsheet reads as a formula get
+a leading ``'``, so an exported product name or comment is never run.
+"""
+
+import csv
+import itertools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+
+from gemma.renderers import FastJSONRenderer
+
+from .catalog import product_queryset
+from .models import CartProduct, Order
+
+# Columns of the CSV exports; nested lists are joined with "; ".
+PRODUCT_COLUMNS = [
+    "id",
+    "name",
+    "price",
+    "category_id",
+    "category",
+    "image",
+    "dough_types",
+    "ingredients",
+    "created_at",
+    "updated_at",
+]
+ORDER_COLUMNS = [
+    "id",
+    "status",
+    "user_id",
+    "user_email",
+    "total",
+    "full_name",
+    "address",
+    "comment",
+    "created_at",
+    "updated_at",
+]
+ORDER_LINE_COLUMNS = ["product_id", "product", "product_size", "dough_type", "quantity"]
+
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _chunk_size(chunk_size: int | None) -> int:
+    return chunk_size or settings.EXPORT_CHUNK_SIZE
+
+
+def product_rows(chunk_size: int | None = None):
+    products = product_queryset().select_related("category")
+    for product in products.iterator(chunk_size=_chunk_size(chunk_size)):
+        yield {
+            "id": product.pk,
+            "name": product.name,
+            "price": str(product.price),
+            "category_id": product.category_id,
+            "category": product.category.name if product.category else None,
+            "image": product.image.name or None,
+            "dough_types": [dough_type.name for dough_type in product.dough_types.all()],
+            "ingredients": [
+                {
+                    "id": link.ingredient_id,
+                    "name": link.ingredient.name,
+                    "is_default": link.is_default,
+                }
+                for link in product.product_ingredient.all()
+            ],
+            "created_at": product.created_at,
+            "updated_at": product.updated_at,
+        }
+
+
+def order_rows(chunk_size: int | None = None):
+    orders = (
+        Order.objects.order_by("pk")
+        .select_related("user")
+        .prefetch_related(
+            Prefetch(
+                "cart__cartproduct_set",
+                queryset=CartProduct.objects.select_related(
+                    "product", "product_size", "dough_type"
+                ).order_by("pk"),
+            )
+        )
+    )
+    for order in orders.iterator(chunk_size=_chunk_size(chunk_size)):
+        lines = order.cart.cartproduct_set.all() if order.cart_id else []
+        yield {
+            "id": order.pk,
+            "status": order.status,
+            "user_id": order.user_id,
+            "user_email": order.user.email if order.user else None,
+            "total": order.total,
+            "full_name": order.full_name,
+            "address": order.address,
+            "comment": order.comment,
+            "created_at": order.created_at,
+            "updated_at": order.updated_at,
+            "lines": [
+                {
+                    "product_id": line.product_id,
+                    "product": line.product.name if line.product else None,
+                    "product_size": (
+                        line.product_size.name if line.product_size else None
+                    ),
+                    "dough_type": line.dough_type.name if line.dough_type else None,
+                    "quantity": line.quantity,
+                }
+                for line in lines
+            ],
+        }
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return "; ".join(
+            item["name"] if isinstance(item, dict) else str(item) for item in value
+        )
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _product_csv(row) -> list[list]:
+    return [[_csv_value(row[column]) for column in PRODUCT_COLUMNS]]
+
+
+def _order_csv(row) -> list[list]:
+    """One CSV row per cart line; an order without lines still gets one."""
+    order = [_csv_value(row[column]) for column in ORDER_COLUMNS]
+    lines = row["lines"] or [dict.fromkeys(ORDER_LINE_COLUMNS, "")]
+    return [order + [line[column] for column in ORDER_LINE_COLUMNS] for line in lines]
+
+
+DATASETS = {
+    "products": (product_rows, PRODUCT_COLUMNS, _product_csv),
+    "orders": (order_rows, ORDER_COLUMNS + ORDER_LINE_COLUMNS, _order_csv),
+}
+FORMATS = {
+    "jsonl": "application/jsonl; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Line:
+    """File-like target for ``csv.writer`` that hands back what it wrote"""
+
+    def write(self, value):
+        return value
+
+
+def to_jsonl(rows):
+    render = FastJSONRenderer().render
+    for row in rows:
+        yield render(row) + b"\n"
+
+
+def to_csv(rows, columns, to_csv_rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(columns).encode()
+    for row in rows:
+        for csv_row in to_csv_rows(row):
+            yield writer.writerow([_csv_cell(value) for value in csv_row]).encode()
+
+
+def export(dataset: str, file_format: str, chunk_size: int | None = None):
+    """Encoded lines (bytes) of ``dataset`` in ``file_format``."""
+    rows, columns, to_csv_rows = DATASETS[dataset]
+    if file_format == "csv":
+        return to_csv(rows(chunk_size), columns, to_csv_rows)
+    return to_jsonl(rows(chunk_size))
+
+
+def _next_lines(lines, count: int) -> list[bytes]:
+    return list(itertools.islice(lines, count))
+
+
+async def aexport(dataset: str, file_format: str, chunk_size: int | None = None):
+    """``export`` for ASGI: the lines of each chunk are read in the sync thread."""
+    chunk_size = _chunk_size(chunk_size)
+    lines = export(dataset, file_format, chunk_size)
+    read = sync_to_async(_next_lines, thread_sensitive=True)
+    try:
+        while batch := await read(lines, chunk_size):
+            for line in batch:
+                yield line
+    finally:
+        await sync_to_async(lines.close, thread_sensitive=True)()
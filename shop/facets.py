@@ -0,0 +1,195 @@
+"""
+# shop/facets.py
+
+In-process faceted index over the catalog. Every product gets a bit
+position; each dough type, size and ingredient maps to a bitmap (a plain
+``int``) of the products that carry it, and prices are kept sorted for
+range lookups. Filters resolve by bitmap intersection without SQL.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import CategoryProductSize, Product, ProductIngredient
+from .versioning import catalog_version
+
+
+def _bitmap(positions) -> int:
+    positions = list(positions)
+    if not positions:
+        return 0
+    buffer = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _positions(bits: int) -> list[int]:
+    binary = bin(bits)[:1:-1]
+    return [i for i, bit in enumerate(binary) if bit == "1"]
+
+
+class FacetIndex:
+    """Bitmaps of product positions per facet value"""
+
+    def __init__(
+        self, version, products, dough_types, sizes, ingredients, price_buckets=10
+    ):
+        self.version = version
+
+        # products: (id, price, category_id) ordered by id
+        self.product_ids = [product_id for product_id, _, _ in products]
+        self.positions = {pk: i for i, pk in enumerate(self.product_ids)}
+        self.all = (1 << len(self.product_ids)) - 1
+
+        by_price = sorted(
+            (price, position) for position, (_, price, _) in enumerate(products)
+        )
+        self.prices = [price for price, _ in by_price]
+        self.price_positions = [position for _, position in by_price]
+        self._build_price_buckets(products, price_buckets)
+
+        self.dough_types = self._group(dough_types)
+        self.ingredients = self._group(ingredients)
+
+        category_positions = defaultdict(list)
+        for position, (_, _, category_id) in enumerate(products):
+            category_positions[category_id].append(position)
+        self.sizes = {
+            size_id: _bitmap(
+                position
+                for category_id in category_ids
+                for position in category_positions[category_id]
+            )
+            for size_id, category_ids in self._collect(sizes).items()
+        }
+
+    def _build_price_buckets(self, products, count):
+        """Fixed-width buckets over the whole catalog so edges don't move with filters."""
+        self.price_edges = []
+        self.price_bucket_of = []
+        if not self.prices:
+            return
+
+        low, high = self.prices[0], self.prices[-1]
+        width = (high - low) / count
+        if not width:
+            count, width = 1, 1
+
+        self.price_edges = [low + width * i for i in range(count)] + [high]
+        self.price_bucket_of = [
+            min(int((price - low) / width), count - 1) for _, price, _ in products
+        ]
+
+    @staticmethod
+    def _collect(pairs) -> dict:
+        grouped = defaultdict(list)
+        for key, value in pairs:
+            grouped[value].append(key)
+        return grouped
+
+    def _group(self, pairs) -> dict[int, int]:
+        """(product_id, value_id) pairs -> {value_id: bitmap}"""
+        return {
+            value_id: _bitmap(
+                self.positions[pk] for pk in product_ids if pk in self.positions
+            )
+            for value_id, product_ids in self._collect(pairs).items()
+        }
+
+    @classmethod
+    def build(cls, version: str) -> "FacetIndex":
+        return cls(
+            version,
+            list(
+                Product.objects.order_by("pk").values_list("id", "price", "category_id")
+            ),
+            Product.dough_types.through.objects.values_list(
+                "product_id", "doughtype_id"
+            ),
+            CategoryProductSize.objects.values_list("category_id", "product_size_id"),
+            ProductIngredient.objects.values_list("product_id", "ingredient_id"),
+            settings.CATALOG_PRICE_BUCKETS,
+        )
+
+    def _any(self, bitmaps: dict, value_ids) -> int:
+        bits = 0
+        for value_id in value_ids:
+            bits |= bitmaps.get(value_id, 0)
+        return bits
+
+    def price_range(self, min_price=None, max_price=None) -> int:
+        lo = 0 if min_price is None else bisect_left(self.prices, min_price)
+        hi = (
+            len(self.prices)
+            if max_price is None
+            else bisect_right(self.prices, max_price)
+        )
+        return _bitmap(self.price_positions[lo:hi])
+
+    def match(self, filters: dict) -> int:
+        """Bitmap of the products matching parsed home filters."""
+        bits = self.all
+        if filters["dough_type"]:
+            bits &= self._any(self.dough_types, filters["dough_type"])
+        if filters["product_size"]:
+            bits &= self._any(self.sizes, filters["product_size"])
+        if filters["ingredient"]:
+            bits &= self._any(self.ingredients, filters["ingredient"])
+        if filters["min_price"] is not None or filters["max_price"] is not None:
+            bits &= self.price_range(filters["min_price"], filters["max_price"])
+        return bits
+
+    def resolve(self, filters: dict) -> set[int]:
+        return {self.product_ids[i] for i in _positions(self.match(filters))}
+
+    def counts(self, filters: dict) -> dict:
+        """Facet counts and price histogram over the products matching the filters."""
+        bits = self.match(filters)
+
+        def _counts(bitmaps):
+            return [
+                {"id": value_id, "count": (bits & bitmap).bit_count()}
+                for value_id, bitmap in sorted(bitmaps.items())
+            ]
+
+        histogram = [0] * (len(self.price_edges) - 1)
+        for position in _positions(bits):
+            histogram[self.price_bucket_of[position]] += 1
+
+        return {
+            "total": bits.bit_count(),
+            "dough_type": _counts(self.dough_types),
+            "product_size": _counts(self.sizes),
+            "ingredient": _counts(self.ingredients),
+            "price": [
+                {
+                    "min": self.price_edges[i],
+                    "max": self.price_edges[i + 1],
+                    "count": count,
+                }
+                for i, count in enumerate(histogram)
+            ],
+        }
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_facet_index() -> FacetIndex:
+    """Returns this worker's index, rebuilding it when the catalog version moves."""
+    global _index
+
+    version = catalog_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = FacetIndex.build(version)
+        return _index
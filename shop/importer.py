@@ -0,0 +1,519 @@
+"""
+# shop/importer.py
+
+Catalog import from a document shaped like ``test-data.json`` or from a
+JSONL stream with one record per line:
+
+    {"type": "ingredient", "name": ..., "price": ..., "imageUrl": ...}
+    {"type": "product_size", "name": ..., "value": ..., "sortOrder": ...}
+    {"type": "dough_type", "name": ..., "value": ..., "sortOrder": ...}
+    {"type": "category", "name": ..., "product_sizes": [<size name>, ...]}
+    {"type": "product", "name": ..., "price": ..., "category": ...,
+     "imageUrl": ..., "dough_types": [...], "ingredients": [...]}
+
+Rows are matched by name. Records are applied in batches: one SELECT
+finds the existing rows of a batch, new rows are written with
+``bulk_create`` and changed ones with ``bulk_update``; unchanged rows are
+not written at all. The rows go in with one transaction. Images are
+downloaded after it commits by a bounded thread pool and stored only when
+their SHA-256 differs from the file the row already has.
+
+A record that fails ``clean_record`` is listed in the summary's errors
+and skipped; CatalogImportError is raised only for input that cannot be
+read at all. JSONL input is streamed; a JSON document is loaded whole.
+"""
+
+import collections
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Category,
+    CategoryProductSize,
+    DoughType,
+    Ingredient,
+    Product,
+    ProductIngredient,
+    ProductSize,
+)
+from .changes import stamp
+from .versioning import invalidate_catalog
+
+logger = logging.getLogger(__name__)
+
+# Record type -> (model, {model field: record key}); listed in dependency
+# order, so a kind only refers to kinds before it.
+KINDS = {
+    "ingredient": (Ingredient, {"price": "price"}),
+    "product_size": (ProductSize, {"size": "value", "order": "sortOrder"}),
+    "dough_type": (DoughType, {"value": "value", "order": "sortOrder"}),
+    "category": (Category, {}),
+    "product": (Product, {"price": "price"}),
+}
+ORDER = list(KINDS)
+# Record key -> kinds it must appear in
+REQUIRED = {"value": ("product_size", "dough_type")}
+NAME_LISTS = ("product_sizes", "dough_types", "ingredients")
+# Largest price a DecimalField(max_digits=10, decimal_places=2) holds
+MAX_PRICE = Decimal("99999999.99")
+CENT = Decimal("0.01")
+
+
+class CatalogImportError(ValueError):
+    pass
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+@dataclasses.dataclass
+class ImportSummary:
+    dry_run: bool = False
+    created: collections.Counter = dataclasses.field(default_factory=collections.Counter)
+    updated: collections.Counter = dataclasses.field(default_factory=collections.Counter)
+    unchanged: collections.Counter = dataclasses.field(
+        default_factory=collections.Counter
+    )
+    links: collections.Counter = dataclasses.field(default_factory=collections.Counter)
+    images: collections.Counter = dataclasses.field(default_factory=collections.Counter)
+    errors: list[str] = dataclasses.field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "created": dict(self.created),
+            "updated": dict(self.updated),
+            "unchanged": dict(self.unchanged),
+            "links": dict(self.links),
+            "images": dict(self.images),
+            "errors": self.errors,
+        }
+
+
+def records_from_document(data: dict):
+    """
+    Flattens a ``test-data.json`` document into import records. Entries
+    that are not objects are passed on as they are, for ``clean_record``
+    to report.
+    """
+    if not isinstance(data, dict):
+        raise CatalogImportError("expected a JSON object")
+
+    def entries(parent, key):
+        value = parent.get(key)
+        return value if isinstance(value, list) else []
+
+    for kind, key in (
+        ("ingredient", "ingredients"),
+        ("product_size", "product_sizes"),
+        ("dough_type", "dough_types"),
+    ):
+        for record in entries(data, key):
+            yield {"type": kind, **record} if isinstance(record, dict) else record
+
+    # Like test.py, products of a document get every dough type in it.
+    dough_types = [
+        record.get("name")
+        for record in entries(data, "dough_types")
+        if isinstance(record, dict)
+    ]
+    for category in entries(data, "categories"):
+        if not isinstance(category, dict):
+            yield category
+            continue
+        yield {
+            "type": "category",
+            "name": category.get("name"),
+            "product_sizes": category.get("product_sizes", []),
+        }
+        for record in entries(category, "products"):
+            if not isinstance(record, dict):
+                yield record
+                continue
+            yield {
+                "type": "product",
+                "category": category.get("name"),
+                "dough_types": dough_types,
+                **record,
+            }
+
+
+def read_records(stream, name: str):
+    """Records from a ``.jsonl`` stream (line by line) or a JSON document."""
+    if os.path.splitext(name)[1].lower() in (".jsonl", ".ndjson"):
+        return _read_lines(stream)
+    try:
+        data = json.load(stream)
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise CatalogImportError(f"invalid JSON: {exc}")
+    return records_from_document(data)
+
+
+def _read_lines(stream):
+    for number, line in enumerate(stream, 1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode()
+            if not line.strip():
+                continue
+            yield json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise CatalogImportError(f"line {number}: {exc}")
+
+
+def _price(value) -> Decimal:
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise InvalidRecord(f"invalid price {value!r}")
+    try:
+        price = Decimal(str(value).strip())
+    except ArithmeticError:
+        raise InvalidRecord(f"invalid price {value!r}")
+    if not price.is_finite() or abs(price) > MAX_PRICE:
+        raise InvalidRecord(f"invalid price {value!r}")
+    return price.quantize(CENT)
+
+
+def _count(key, value) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise InvalidRecord(f"invalid {key} {value!r}")
+    return value
+
+
+def _names(key, value) -> list[str]:
+    if not isinstance(value, list) or not all(
+        isinstance(name, str) for name in value
+    ):
+        raise InvalidRecord(f"{key} must be a list of names")
+    return value
+
+
+def clean_record(record) -> dict:
+    """
+    Checks a record before it is buffered and returns it with its price as
+    a Decimal; raises InvalidRecord with the reason otherwise.
+    """
+    if not isinstance(record, dict):
+        raise InvalidRecord("not an object")
+    kind = record.get("type")
+    if kind not in KINDS:
+        raise InvalidRecord(f"unknown type {kind!r}")
+    if not isinstance(record.get("name"), str) or not record["name"]:
+        raise InvalidRecord("no name")
+
+    record = dict(record)
+    for key, kinds in REQUIRED.items():
+        if kind in kinds and record.get(key) is None:
+            raise InvalidRecord(f"no {key}")
+
+    model, fields = KINDS[kind]
+    for field, key in fields.items():
+        if key not in record:
+            continue
+        if field == "price":
+            record[key] = _price(record[key])
+        else:
+            record[key] = _count(key, record[key])
+    if kind == "product" and "category" in record:
+        if not isinstance(record["category"], str):
+            raise InvalidRecord(f"invalid category {record['category']!r}")
+    for key in NAME_LISTS:
+        if key in record:
+            _names(key, record[key])
+    if record.get("imageUrl") and not isinstance(record["imageUrl"], str):
+        raise InvalidRecord(f"invalid imageUrl {record['imageUrl']!r}")
+    return record
+
+
+def fetch_image(url: str) -> bytes:
+    response = requests.get(url, timeout=settings.CATALOG_IMPORT_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _touch(rows, fields) -> list[str]:
+    """Sets ``updated_at`` by hand: bulk_update() skips auto_now."""
+    now = timezone.now()
+    for row in rows:
+        row.updated_at = now
+    return [*fields, "updated_at"]
+
+
+def _stored_digest(storage, name: str) -> str | None:
+    try:
+        with storage.open(name) as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
+    except OSError:
+        return None
+
+
+class CatalogImporter:
+    """
+    ``progress(stage, done)`` is called after every applied batch with the
+    number of records (or images) of that stage handled so far.
+    """
+
+    def __init__(
+        self,
+        batch_size: int | None = None,
+        image_workers: int | None = None,
+        dry_run: bool = False,
+        fetch=fetch_image,
+        progress=None,
+    ):
+        self.batch_size = batch_size or settings.CATALOG_IMPORT_BATCH_SIZE
+        self.image_workers = image_workers or settings.CATALOG_IMPORT_IMAGE_WORKERS
+        self.dry_run = dry_run
+        self.fetch = fetch
+        self.progress = progress or (lambda stage, done: None)
+
+        self.summary = ImportSummary(dry_run=dry_run)
+        self.pending = {kind: [] for kind in ORDER}
+        self.done = collections.Counter()
+        self.ids = {model: {} for model, fields in KINDS.values()}
+        # model -> pks of rows written or relinked, stamped before commit
+        self.touched = collections.defaultdict(set)
+        # (model, pk, name, url, current image name) per row with an image URL
+        self.images = []
+
+    def run(self, records) -> ImportSummary:
+        with transaction.atomic():
+            for record in records:
+                try:
+                    record = clean_record(record)
+                except InvalidRecord as exc:
+                    self.summary.errors.append(
+                        f"skipped record {record!r:.80}: {exc}"
+                    )
+                    continue
+                kind = record["type"]
+                # Rows this record may refer to must be written first.
+                for earlier in ORDER[: ORDER.index(kind)]:
+                    self._flush(earlier)
+                self.pending[kind].append(record)
+                if len(self.pending[kind]) >= self.batch_size:
+                    self._flush(kind)
+            for kind in ORDER:
+                self._flush(kind)
+
+            if self.dry_run:
+                transaction.set_rollback(True)
+            else:
+                stamp(self.touched, self.batch_size)
+                transaction.on_commit(invalidate_catalog)
+
+        if self.dry_run:
+            self.summary.images["pending"] = len(self.images)
+        else:
+            self._store_images()
+        return self.summary
+
+    # Rows
+
+    def _values(self, kind, record) -> dict:
+        model, fields = KINDS[kind]
+        values = {}
+        for field, key in fields.items():
+            if key in record:
+                values[field] = record[key]
+        if kind == "product" and "category" in record:
+            category = self._resolve(Category, [record["category"]])
+            if category:
+                values["category_id"] = category[record["category"]]
+        return values
+
+    def _flush(self, kind) -> None:
+        records = self.pending[kind]
+        if not records:
+            return
+        self.pending[kind] = []
+        model, fields = KINDS[kind]
+
+        # A name repeated within a batch: the last record wins.
+        by_name = {record["name"]: record for record in records}
+        existing = {}
+        for row in model.objects.filter(name__in=by_name).order_by("-pk"):
+            existing[row.name] = row  # duplicates in the table: lowest pk wins
+
+        created, changed, update_fields = [], [], set()
+        for name, record in by_name.items():
+            values = self._values(kind, record)
+            row = existing.get(name)
+            if row is None:
+                created.append(model(name=name, **values))
+                continue
+            diff = {
+                field: value
+                for field, value in values.items()
+                if getattr(row, field) != value
+            }
+            if diff:
+                for field, value in diff.items():
+                    setattr(row, field, value)
+                update_fields |= diff.keys()
+                changed.append(row)
+            else:
+                self.summary.unchanged[kind] += 1
+
+        model.objects.bulk_create(created)
+        if changed:
+            # updated_at is set by stamp() at the end of the transaction.
+            model.objects.bulk_update(changed, sorted(update_fields))
+        self.touched[model].update(row.pk for row in [*created, *changed])
+        if created:
+            self.summary.created[kind] += len(created)
+        if changed:
+            self.summary.updated[kind] += len(changed)
+
+        rows = {row.name: row for row in [*existing.values(), *created]}
+        self.ids[model].update((name, row.pk) for name, row in rows.items())
+
+        if kind == "category":
+            self._link_sizes(by_name, rows)
+        elif kind == "product":
+            self._link_products(by_name, rows)
+        if kind in ("ingredient", "product"):
+            for name, record in by_name.items():
+                if record.get("imageUrl"):
+                    row = rows[name]
+                    self.images.append(
+                        (model, row.pk, name, record["imageUrl"], row.image.name)
+                    )
+
+        self.done[kind] += len(records)
+        self.progress(kind, self.done[kind])
+
+    def _resolve(self, model, names) -> dict[str, int]:
+        """name -> pk for ``names``, reporting the ones that do not exist."""
+        known = self.ids[model]
+        missing = {name for name in names if name not in known}
+        if missing:
+            for pk, name in (
+                model.objects.filter(name__in=missing)
+                .order_by("-pk")
+                .values_list("pk", "name")
+            ):
+                known[name] = pk
+            for name in sorted(missing - known.keys()):
+                self.summary.errors.append(f"unknown {model.__name__} {name!r}")
+                known[name] = None
+        return {name: known[name] for name in names if known[name] is not None}
+
+    def _replace_links(self, model, owner, target, wanted) -> None:
+        """Makes the (owner, target) pairs of ``wanted``'s owners exactly ``wanted``."""
+        wanted = set(wanted)
+        owners = {owner_id for owner_id, target_id in wanted}
+        have = {
+            (owner_id, target_id): pk
+            for pk, owner_id, target_id in model.objects.filter(
+                **{f"{owner}__in": owners}
+            ).values_list("pk", owner, target)
+        }
+        stale = [pk for pair, pk in have.items() if pair not in wanted]
+        added = [model(**{owner: o, target: t}) for o, t in wanted - have.keys()]
+
+        if stale:
+            model.objects.filter(pk__in=stale).delete()
+        # ignore_conflicts: the dough-type links are unique per pair.
+        model.objects.bulk_create(added, ignore_conflicts=True)
+        if stale or added:
+            # bulk_create() sends no signals; touch the owners for the delta sync.
+            owner_model = model._meta.get_field(owner.removesuffix("_id")).related_model
+            self.touched[owner_model].update(o for o, t in have.keys() ^ wanted)
+        if stale or added:
+            self.summary.links[model._meta.model_name] += len(stale) + len(added)
+
+    def _link_sizes(self, records, rows) -> None:
+        wanted = []
+        for name, record in records.items():
+            if "product_sizes" in record:
+                sizes = self._resolve(ProductSize, record["product_sizes"])
+                wanted += [(rows[name].pk, pk) for pk in sizes.values()]
+        if wanted:
+            self._replace_links(
+                CategoryProductSize, "category_id", "product_size_id", wanted
+            )
+
+    def _link_products(self, records, rows) -> None:
+        DoughLink = Product.dough_types.through
+        dough, ingredients = [], []
+        for name, record in records.items():
+            pk = rows[name].pk
+            if "dough_types" in record:
+                found = self._resolve(DoughType, record["dough_types"])
+                dough += [(pk, dough_pk) for dough_pk in found.values()]
+            if "ingredients" in record:
+                found = self._resolve(Ingredient, record["ingredients"])
+                ingredients += [(pk, ingredient_pk) for ingredient_pk in found.values()]
+        if dough:
+            self._replace_links(DoughLink, "product_id", "doughtype_id", dough)
+        if ingredients:
+            self._replace_links(
+                ProductIngredient, "product_id", "ingredient_id", ingredients
+            )
+
+    # Images
+
+    def _store_image(self, job):
+        model, pk, name, url, current = job
+        field = model._meta.get_field("image")
+        try:
+            content = self.fetch(url)
+        except Exception as exc:
+            logger.warning("Fetching %s failed: %r", url, exc)
+            return job, None, f"{url}: {exc}"
+
+        if current and _stored_digest(field.storage, current) == _digest(content):
+            return job, current, None
+
+        filename = os.path.basename(urlparse(url).path) or "image"
+        stored = field.storage.save(
+            field.generate_filename(model(pk=pk, name=name), filename),
+            ContentFile(content),
+        )
+        return job, stored, None
+
+    def _store_images(self) -> None:
+        done = 0
+        with ThreadPoolExecutor(self.image_workers, "catalog-images") as pool:
+            for start in range(0, len(self.images), self.batch_size):
+                batch = self.images[start : start + self.batch_size]
+                changed = collections.defaultdict(list)
+                for job, stored, error in pool.map(self._store_image, batch):
+                    model, pk, name, url, current = job
+                    if error:
+                        self.summary.images["failed"] += 1
+                        self.summary.errors.append(error)
+                    elif stored == current:
+                        self.summary.images["unchanged"] += 1
+                    else:
+                        self.summary.images["stored"] += 1
+                        changed[model].append(model(pk=pk, image=stored))
+
+                for model, rows in changed.items():
+                    model.objects.bulk_update(rows, _touch(rows, ["image"]))
+                if changed:
+                    transaction.on_commit(invalidate_catalog)
+
+                done += len(batch)
+                self.progress("images", done)
+
+
+def import_catalog(records, **options) -> ImportSummary:
+    return CatalogImporter(**options).run(records)
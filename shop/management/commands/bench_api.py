@@ -0,0 +1,220 @@
+import datetime
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone
+
+from shop.models import Product
+from shop.seeding import seed_catalog
+from user.models import AccessToken, RefreshToken, User
+
+# Queries allowed for one warm request; the run fails when one goes over.
+QUERY_BUDGETS = {
+    "home": 0,
+    "products": 3,
+    "products_filtered": 3,
+    "product": 3,
+    "me": 0,
+    "refresh": 3,
+}
+
+BENCH_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench",
+    }
+}
+
+
+def over_budget(results) -> list[dict]:
+    return [row for row in results if not row["within_budget"]]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the API endpoints in-process against generated catalogs "
+        "in a throwaway test database; writes p50/p95, throughput and query "
+        "counts as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="10,1000,100000",
+            help="comma-separated catalog sizes (products)",
+        )
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument("--output", help="write results to this JSON file")
+        parser.add_argument("--compare", help="JSON results of a previous run")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",") if size]
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.bench(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "iterations": options["iterations"],
+            },
+            "results": results,
+        }
+        self._print(results, options.get("compare"))
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                json.dump(report, stream, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        over = over_budget(results)
+        if over:
+            raise CommandError(
+                "Query budget exceeded: "
+                + ", ".join(
+                    f"{row['endpoint']}@{row['size']} "
+                    f"({row['queries']} > {row['budget']})"
+                    for row in over
+                )
+            )
+
+    def bench(self, sizes, options) -> list[dict]:
+        """
+        Result rows for each catalog size. Flushes the database it runs
+        on: handle() calls it inside a throwaway test database.
+        """
+        # A private cache: the run clears it and must not touch a shared one.
+        with override_settings(CACHES=BENCH_CACHES):
+            return [
+                row for size in sizes for row in self._bench_catalog(size, options)
+            ]
+
+    def _clients(self):
+        user = User.objects.create_user(email="bench@example.com")
+        expires = timezone.now() + datetime.timedelta(days=1)
+        access = AccessToken.objects.create(
+            user=user, device_id="bench", expires_at=expires
+        )
+        refresh = RefreshToken.objects.create(
+            user=user, device_id="bench", expires_at=expires
+        )
+
+        host = {"HTTP_HOST": settings.ALLOWED_HOSTS[0]}
+        anonymous = Client(**host)
+        authenticated = Client(HTTP_AUTHORIZATION=f"Bearer {access.token}", **host)
+        refreshing = Client(**host)
+        refreshing.cookies["refresh"] = refresh.token
+        return anonymous, authenticated, refreshing
+
+    def _bench_catalog(self, size, options):
+        call_command("flush", interactive=False, verbosity=0)
+        cache.clear()
+
+        started = time.perf_counter()
+        seed_catalog(products=size)
+        self.stdout.write(
+            f"Seeded {size} products in {time.perf_counter() - started:.1f}s"
+        )
+
+        anonymous, authenticated, refreshing = self._clients()
+        product = Product.objects.order_by("pk")[size // 2]
+        endpoints = {
+            "home": lambda: anonymous.get("/api/home/"),
+            "products": lambda: anonymous.get("/api/products/"),
+            "products_filtered": lambda: anonymous.get(
+                "/api/products/?dough_type=1&ordering=price"
+            ),
+            "product": lambda: anonymous.get(f"/api/product/{product.pk}/"),
+            "me": lambda: authenticated.get("/api/auth/me/"),
+            "refresh": lambda: refreshing.post("/api/auth/refresh/"),
+        }
+        return [
+            self._bench_endpoint(name, request, size, options)
+            for name, request in endpoints.items()
+        ]
+
+    def _bench_endpoint(self, name, request, size, options):
+        cache.clear()
+        started = time.perf_counter()
+        response = request()
+        first = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f"{name}: HTTP {response.status_code}")
+
+        for _ in range(options["warmup"]):
+            request()
+
+        with CaptureQueriesContext(connection) as captured:
+            request()
+        # Read now: every request starts by clearing connection.queries.
+        queries = len(captured)
+
+        timings = []
+        for _ in range(options["iterations"]):
+            started = time.perf_counter()
+            request()
+            timings.append(time.perf_counter() - started)
+
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        return {
+            "endpoint": name,
+            "size": size,
+            "first_ms": round(first * 1000, 3),
+            "p50_ms": round(cuts[49] * 1000, 3),
+            "p95_ms": round(cuts[94] * 1000, 3),
+            "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+            "rps": round(len(timings) / sum(timings), 1),
+            "bytes": len(response.content),
+            "queries": queries,
+            "budget": QUERY_BUDGETS[name],
+            "within_budget": queries <= QUERY_BUDGETS[name],
+        }
+
+    def _print(self, results, compare_path):
+        previous = {}
+        if compare_path:
+            with open(compare_path, encoding="utf-8") as stream:
+                for row in json.load(stream)["results"]:
+                    previous[(row["endpoint"], row["size"])] = row
+
+        self.stdout.write(
+            f"{'endpoint':<18} {'size':>7} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'req/s':>9} {'queries':>8}" + ("  p50 vs previous" if previous else "")
+        )
+        for row in results:
+            line = (
+                f"{row['endpoint']:<18} {row['size']:>7} {row['p50_ms']:>9} "
+                f"{row['p95_ms']:>9} {row['rps']:>9} "
+                f"{row['queries']:>4}/{row['budget']:<3}"
+            )
+            before = previous.get((row["endpoint"], row["size"]))
+            if before and before["p50_ms"]:
+                change = (row["p50_ms"] - before["p50_ms"]) / before["p50_ms"]
+                line += f"  {change:+.1%}"
+            if not row["within_budget"]:
+                line += "  OVER BUDGET"
+            self.stdout.write(line)
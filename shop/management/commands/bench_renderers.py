@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from gemma.renderers import FastJSONRenderer, orjson
+from shop.catalog import build_home_payload
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = "Compares the stock and orjson JSON renderers on the home payload"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def _measure(self, label, renderer, payload, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            size = len(renderer.render(payload))
+        elapsed = (time.perf_counter() - started) / repeat
+        self.stdout.write(
+            f"  {label:<10} {elapsed * 1000:9.3f} ms/op  {size / elapsed / 2**20:8.1f} MiB/s"
+        )
+        return elapsed
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("orjson is not installed: both renderers are the same")
+
+        factory = APIRequestFactory(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        payloads = {
+            "home": build_home_payload(Request(factory.get("/api/home/"))),
+            # raw rows keep Decimal and datetime objects for the encoder
+            "rows": list(Product.objects.values()),
+        }
+
+        for name, payload in payloads.items():
+            self.stdout.write(name)
+            stock = self._measure("drf", JSONRenderer(), payload, options["repeat"])
+            fast = self._measure("fast", FastJSONRenderer(), payload, options["repeat"])
+            self.stdout.write(self.style.SUCCESS(f"  speedup    {stock / fast:9.2f}x"))
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from shop.catalog import build_home_payload, listing_queryset, serialize_listing
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = "Compares DRF and compiled catalog serializers on the current database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=200)
+
+    def _measure(self, label, func, repeat):
+        func()  # warm-up: version stamp, facet index, compiled plans
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - started) / repeat
+        self.stdout.write(f"  {label:<10} {elapsed * 1000:9.2f} ms/op")
+        return elapsed
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        factory = APIRequestFactory(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        request = Request(factory.get("/api/home/?dough_type=1"))
+        request_all = Request(factory.get("/api/products/"))
+
+        def products():
+            page = list(listing_queryset(Product)[: options["page_size"]])
+            return serialize_listing(Product, page, {"request": request_all})
+
+        for name, func in (
+            ("home", lambda: build_home_payload(request)),
+            (f"products[{options['page_size']}]", products),
+        ):
+            self.stdout.write(name)
+            timings = {}
+            for label, compiled in (("drf", False), ("compiled", True)):
+                with override_settings(CATALOG_COMPILED_SERIALIZERS=compiled):
+                    timings[label] = self._measure(label, func, repeat)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"  speedup    {timings['drf'] / timings['compiled']:9.2f}x"
+                )
+            )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from shop.exports import DATASETS, FORMATS, export
+
+
+class Command(BaseCommand):
+    help = "Streams products or orders as JSONL or CSV to a file or stdout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=list(DATASETS))
+        parser.add_argument("--format", choices=list(FORMATS), default="jsonl")
+        parser.add_argument("--output", help="file to write (default: stdout)")
+        parser.add_argument("--chunk-size", type=int)
+
+    def handle(self, *args, **options):
+        lines = export(options["dataset"], options["format"], options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "wb") as stream:
+                stream.writelines(lines)
+            return
+
+        for line in lines:
+            self.stdout.write(line.decode(), ending="")
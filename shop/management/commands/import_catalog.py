@@ -0,0 +1,65 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.importer import CatalogImportError, import_catalog, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports a catalog from a test-data.json shaped document or a JSONL "
+        "file of records ('-' reads JSONL from stdin)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--image-workers", type=int)
+
+    def progress(self, stage, done):
+        self.stdout.write(f"  {stage:<14} {done:>8}")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        import_options = {
+            "dry_run": options["dry_run"],
+            "batch_size": options["batch_size"],
+            "image_workers": options["image_workers"],
+            "progress": self.progress,
+        }
+
+        try:
+            if options["path"] == "-":
+                summary = import_catalog(
+                    read_records(sys.stdin, "stdin.jsonl"), **import_options
+                )
+            else:
+                with open(options["path"], encoding="utf-8") as stream:
+                    summary = import_catalog(
+                        read_records(stream, options["path"]), **import_options
+                    )
+        except CatalogImportError as exc:
+            raise CommandError(exc)
+
+        for label, counts in (
+            ("created", summary.created),
+            ("updated", summary.updated),
+            ("unchanged", summary.unchanged),
+            ("links", summary.links),
+            ("images", summary.images),
+        ):
+            for name, count in sorted(counts.items()):
+                self.stdout.write(f"{label:<10} {name:<28} {count:>8}")
+        for error in summary.errors:
+            self.stderr.write(error)
+
+        elapsed = time.perf_counter() - started
+        verb = "Would import" if summary.dry_run else "Imported"
+        self.stdout.write(
+            f"{verb} {sum(summary.created.values())} new and "
+            f"{sum(summary.updated.values())} changed rows, "
+            f"{sum(summary.links.values())} link changes in {elapsed:.2f}s"
+            + (" (dry run, nothing written)" if summary.dry_run else "")
+        )
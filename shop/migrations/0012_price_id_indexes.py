@@ -0,0 +1,25 @@
+# Generated by Django 6.1.2 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0011_alter_categoryproductsize_category"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(
+                fields=["price", "id"], name="shop_ingred_price_d79a33_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["price", "id"], name="shop_produc_price_5e650a_idx"
+            ),
+        ),
+    ]
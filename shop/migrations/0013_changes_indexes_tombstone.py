@@ -0,0 +1,67 @@
+# Generated by Django 6.1.2 on 2026-10-18 13:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0012_price_id_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=32)),
+                ("object_id", models.PositiveBigIntegerField()),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["updated_at", "id"], name="shop_catego_updated_e53e60_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="doughtype",
+            index=models.Index(
+                fields=["updated_at", "id"], name="shop_dought_updated_1eb0ba_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(
+                fields=["updated_at", "id"], name="shop_ingred_updated_73a149_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["updated_at", "id"], name="shop_produc_updated_685cd9_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsize",
+            index=models.Index(
+                fields=["updated_at", "id"], name="shop_produc_updated_567cb7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(
+                fields=["deleted_at", "id"], name="shop_tombst_deleted_2ddb89_idx"
+            ),
+        ),
+    ]
@@ -31,6 +31,12 @@ class Ingredient(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["price", "id"]),
+            models.Index(fields=["updated_at", "id"]),
+        ]
+
 
 class DoughType(models.Model):
     name = models.CharField("name", null=False, blank=True, db_index=True)
@@ -40,6 +46,11 @@ class DoughType(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at", "id"]),
+        ]
+
 
 class ProductSize(models.Model):
     name = models.CharField("name", null=False, blank=True, db_index=True)
@@ -49,6 +60,11 @@ class ProductSize(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at", "id"]),
+        ]
+
 
 class Category(models.Model):
     name = models.CharField("name", null=False, blank=True, db_index=True)
@@ -56,6 +72,11 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at", "id"]),
+        ]
+
     def __str__(self):
         return str(self.name)
 
@@ -97,6 +118,12 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["price", "id"]),
+            models.Index(fields=["updated_at", "id"]),
+        ]
+
     def __str__(self):
         return str(self.name)
 
@@ -158,3 +185,16 @@ class Order(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+
+class Tombstone(models.Model):
+    """A deleted catalog row, reported by the delta sync (shop.changes)"""
+
+    model = models.CharField(max_length=32)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at", "id"]),
+        ]
@@ -0,0 +1,140 @@
+"""
+# shop/pagination.py
+
+Keyset (cursor) pagination for the catalog lists. Pages are selected by
+``WHERE (price, id) > (last_price, last_id)`` on an indexed key instead of
+OFFSET, so deep pages cost the same as the first and rows inserted between
+requests neither repeat nor shift results.
+"""
+
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only cursor pagination on ``(id)`` or ``(price, id)``"""
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering_query_param = "ordering"
+    orderings = {
+        "id": ("id",),
+        "price": ("price", "id"),
+    }
+    # Key field -> parser of its cursor value
+    key_types = {"id": int, "price": Decimal}
+    default_ordering = "id"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self):
+        self.page_size = settings.CATALOG_PAGE_SIZE
+        self.max_page_size = settings.CATALOG_MAX_PAGE_SIZE
+
+    def encode_cursor(self, ordering: str, row) -> str:
+        # Pages hold model instances or ``values()`` rows.
+        get = row.get if isinstance(row, dict) else row.__getattribute__
+        key = [str(get(field)) for field in self.orderings[ordering]]
+        raw = json.dumps({"o": ordering, "k": key}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request) -> tuple[str, list] | None:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            cursor = json.loads(raw)
+            ordering, key = cursor["o"], cursor["k"]
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if (
+            ordering not in self.orderings
+            or not isinstance(key, list)
+            or len(key) != len(self.orderings[ordering])
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            key = [
+                self.key_types[field](str(value))
+                for field, value in zip(self.orderings[ordering], key)
+            ]
+        except (ValueError, InvalidOperation):
+            raise NotFound(self.invalid_cursor_message)
+        if any(isinstance(value, Decimal) and not value.is_finite() for value in key):
+            raise NotFound(self.invalid_cursor_message)
+        return ordering, key
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request) -> str:
+        ordering = request.query_params.get(
+            self.ordering_query_param, self.default_ordering
+        )
+        return ordering if ordering in self.orderings else self.default_ordering
+
+    def _after(self, fields, key) -> Q:
+        """Row-value comparison ``(f1, f2, ...) > (k1, k2, ...)`` spelled out in Q."""
+        condition = Q()
+        for i, field in enumerate(fields):
+            step = Q(**{f"{field}__gt": key[i]})
+            for previous, value in zip(fields[:i], key[:i]):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        # A cursor pins the ordering it was issued for.
+        self.ordering = cursor[0] if cursor else self.get_ordering(request)
+        fields = self.orderings[self.ordering]
+
+        queryset = queryset.order_by(*fields)
+        if cursor:
+            queryset = queryset.filter(self._after(fields, cursor[1]))
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(self.ordering, self.page[-1])
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_data(self, data, **extra) -> dict:
+        return {"next": self.get_next_link(), "results": data, **extra}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,239 @@
+"""
+# shop/seeding.py
+
+Deterministic catalog generator for benchmarks and local development.
+The same ``seed`` always produces the same rows; everything is written
+with ``bulk_create`` in batches, so 100k products take seconds.
+
+Placeholder images are rendered locally with Pillow, in a process pool,
+and shared between rows: a catalog uses a fixed number of image files
+however many products it has.
+"""
+
+import io
+import random
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageDraw
+
+from .models import (
+    CartProduct,
+    Category,
+    CategoryProductSize,
+    DoughType,
+    Ingredient,
+    Product,
+    ProductIngredient,
+    ProductSize,
+    Tombstone,
+)
+from .changes import SOURCES, stamp
+from .versioning import invalidate_catalog
+
+DOUGH_TYPES = [("тонкое", 1), ("традиционное", 2)]
+PRODUCT_SIZES = [("Маленькая", 25), ("Средняя", 30), ("Большая", 35)]
+
+PLACEHOLDER_SIZE = 256
+
+
+def render_placeholder(kind: str, n: int, seed: int = 0) -> bytes:
+    """A WEBP square in a colour derived from (kind, n, seed), numbered."""
+    rng = random.Random(f"{seed}:{kind}:{n}")
+    colour = tuple(rng.randrange(64, 224) for _ in range(3))
+    image = Image.new("RGB", (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), colour)
+    draw = ImageDraw.Draw(image)
+    margin = PLACEHOLDER_SIZE // 8
+    draw.ellipse(
+        (margin, margin, PLACEHOLDER_SIZE - margin, PLACEHOLDER_SIZE - margin),
+        fill=tuple(255 - c for c in colour),
+    )
+    draw.text((margin, margin), f"{kind} {n}", fill=(0, 0, 0))
+
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=70)
+    return buffer.getvalue()
+
+
+def placeholder_name(kind: str, n: int, seed: int = 0) -> str:
+    return f"content/placeholders/{kind}-{seed}-{n}.webp"
+
+
+def generate_placeholders(
+    count: int, seed: int = 0, processes: int | None = None
+) -> dict[str, list[str]]:
+    """
+    Renders ``count`` placeholders per kind (product, ingredient) into
+    the default storage, skipping files that already exist, and returns
+    their storage names.
+    """
+    names = {}
+    missing = []
+    for kind in ("product", "ingredient"):
+        names[kind] = [placeholder_name(kind, n, seed) for n in range(count)]
+        missing += [
+            (kind, n)
+            for n, name in enumerate(names[kind])
+            if not default_storage.exists(name)
+        ]
+
+    if missing:
+        kinds, numbers = zip(*missing)
+        with ProcessPoolExecutor(processes) as pool:
+            rendered = pool.map(
+                render_placeholder,
+                kinds,
+                numbers,
+                [seed] * len(missing),
+                chunksize=max(1, len(missing) // 32),
+            )
+            for (kind, n), content in zip(missing, rendered):
+                default_storage.save(
+                    placeholder_name(kind, n, seed), ContentFile(content)
+                )
+    return names
+
+
+def placeholder_images(names: dict[str, list[str]]):
+    """An ``image`` callback for seed_catalog() cycling through ``names``."""
+
+    def image(kind: str, i: int) -> str | None:
+        return names[kind][i % len(names[kind])] if names[kind] else None
+
+    return image
+
+
+def clear_catalog() -> None:
+    """
+    Deletes the whole catalog with one raw DELETE per table. Model deletes
+    would collect every row and send a signal for each; tombstones are
+    written in bulk, last, and the catalog is invalidated once instead.
+    Cart lines keep their rows with the references nulled, as SET_NULL
+    would.
+    """
+    with transaction.atomic():
+        deleted = {
+            model: list(model.objects.values_list("pk", flat=True))
+            for model, columns in SOURCES.values()
+        }
+        CartProduct.objects.update(product=None, product_size=None, dough_type=None)
+        # Referencing tables first, so no foreign key is left dangling.
+        with connection.cursor() as cursor:
+            for model in (
+                Product.dough_types.through,
+                ProductIngredient,
+                Product,
+                CategoryProductSize,
+                Category,
+                Ingredient,
+                DoughType,
+                ProductSize,
+            ):
+                table = connection.ops.quote_name(model._meta.db_table)
+                cursor.execute(f"DELETE FROM {table}")
+        # Written just before commit, for the CATALOG_CHANGES_LAG window.
+        Tombstone.objects.bulk_create(
+            (
+                Tombstone(model=model._meta.model_name, object_id=pk)
+                for model, pks in deleted.items()
+                for pk in pks
+            ),
+            batch_size=2000,
+        )
+        transaction.on_commit(invalidate_catalog)
+
+
+def seed_catalog(
+    products: int,
+    categories: int | None = None,
+    ingredients: int = 30,
+    seed: int = 0,
+    batch_size: int = 2000,
+    image=None,
+) -> dict[str, int]:
+    """
+    Adds a generated catalog of ``products`` products. ``image(kind, i)``
+    may return a storage name for each product/ingredient image; without
+    it rows have no image. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    categories = categories or max(1, min(20, products // 50 or 1))
+
+    with transaction.atomic():
+        dough_types = DoughType.objects.bulk_create(
+            DoughType(name=name, value=value, order=value)
+            for name, value in DOUGH_TYPES
+        )
+        sizes = ProductSize.objects.bulk_create(
+            ProductSize(name=name, size=size, order=i)
+            for i, (name, size) in enumerate(PRODUCT_SIZES, start=1)
+        )
+        ingredient_rows = Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f"Ингредиент {i}",
+                price=Decimal(rng.randrange(20, 200)),
+                image=image("ingredient", i) if image else None,
+            )
+            for i in range(ingredients)
+        )
+        category_rows = Category.objects.bulk_create(
+            Category(name=f"Категория {i}") for i in range(categories)
+        )
+        CategoryProductSize.objects.bulk_create(
+            CategoryProductSize(category=category, product_size=size)
+            for i, category in enumerate(category_rows)
+            for size in sizes[: i % len(sizes) + 1]
+        )
+
+        product_rows = Product.objects.bulk_create(
+            (
+                Product(
+                    name=f"Продукт {i}",
+                    price=Decimal(rng.randrange(19900, 99900)) / 100,
+                    category=category_rows[i % categories],
+                    image=image("product", i) if image else None,
+                )
+                for i in range(products)
+            ),
+            batch_size=batch_size,
+        )
+
+        links = []
+        dough_links = []
+        DoughLink = Product.dough_types.through
+        for product in product_rows:
+            for ingredient in rng.sample(ingredient_rows, min(4, len(ingredient_rows))):
+                links.append(
+                    ProductIngredient(
+                        product=product, ingredient=ingredient, is_default=True
+                    )
+                )
+            for dough_type in dough_types[: rng.randint(1, len(dough_types))]:
+                dough_links.append(DoughLink(product=product, doughtype=dough_type))
+        ProductIngredient.objects.bulk_create(links, batch_size=batch_size)
+        DoughLink.objects.bulk_create(dough_links, batch_size=batch_size)
+
+        stamp(
+            {
+                model: [row.pk for row in rows]
+                for model, rows in (
+                    (DoughType, dough_types),
+                    (ProductSize, sizes),
+                    (Ingredient, ingredient_rows),
+                    (Category, category_rows),
+                    (Product, product_rows),
+                )
+            },
+            batch_size,
+        )
+        transaction.on_commit(invalidate_catalog)
+
+    return {
+        "categories": len(category_rows),
+        "products": len(product_rows),
+        "ingredients": len(ingredient_rows),
+        "product_ingredients": len(links),
+    }
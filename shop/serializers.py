@@ -1,7 +1,7 @@
-from django.db.models import Q
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from .catalog import filter_products, parse_product_filters
 from .models import Cart, Category, DoughType, Ingredient, Product, ProductSize
 
 
@@ -33,10 +33,31 @@ class DoughTypeSerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
+    """
+    Context keys:
+    - ``fields``: set of field names to emit, all when absent
+    - ``expand``: relations rendered as nested objects rather than names;
+      when absent, everything is expanded unless ``minimal`` is set
+    """
+
     image = serializers.SerializerMethodField()
     ingredients = serializers.SerializerMethodField()
     dough_types = serializers.SerializerMethodField()
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        fields = self.context.get("fields")
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def _expanded(self, name) -> bool:
+        expand = self.context.get("expand")
+        if expand is None:
+            return not self.context.get("minimal")
+        return name in expand
+
     def get_image(self, obj) -> str | None:
         request = self.context.get("request")
         if request is None:
@@ -45,7 +66,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(IngredientSerializer(many=True))
     def get_ingredients(self, obj):
-        if self.context.get("minimal"):
+        if not self._expanded("ingredients"):
             return [pi.ingredient.name for pi in obj.product_ingredient.all()]
         serializer = IngredientSerializer(
             [pi.ingredient for pi in obj.product_ingredient.all()],
@@ -59,7 +80,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(DoughTypeSerializer(many=True))
     def get_dough_types(self, obj):
-        if self.context.get("minimal"):
+        if not self._expanded("dough_types"):
             return [str(dt.name) for dt in obj.dough_types.all()]
 
         dough_type_serializer = DoughTypeSerializer(
@@ -84,41 +105,23 @@ class CategorySerializer(serializers.ModelSerializer):
 
     @extend_schema_field(ProductSerializer(many=True))
     def get_products(self, obj):
-        request = self.context.get("request")
-
-        filters_list = Q()
-        qs = obj.products.all()
-
-        dough_types = request.query_params.getlist("dough_type")
-        if dough_types:
-            filters_list &= Q(dough_types__in=map(int, dough_types))
-
-        product_sizes = request.query_params.getlist("product_size")
-        if product_sizes:
-            filters_list &= Q(
-                category__category_product_size__product_size_id__in=map(
-                    int, product_sizes
-                )
-            )
-
-        ingredients = request.query_params.getlist("ingredient")
-        if ingredients:
-            filters_list &= Q(
-                product_ingredient__ingredient_id__in=map(int, ingredients)
+        if "product_ids" in self.context:
+            # Assembled by shop.catalog: products are prefetched and the
+            # filters are already resolved to a set of ids for all categories.
+            product_ids = self.context["product_ids"]
+            products = [
+                product
+                for product in obj.products.all()
+                if product_ids is None or product.pk in product_ids
+            ]
+        else:
+            request = self.context.get("request")
+            products = filter_products(
+                obj.products.all(), parse_product_filters(request.query_params)
             )
 
-        min_price = request.query_params.get("min_price")
-        if min_price:
-            filters_list &= Q(price__gte=min_price)
-
-        max_price = request.query_params.get("max_price")
-        if max_price:
-            filters_list &= Q(price__lte=max_price)
-
-        qs = qs.filter(filters_list)
-
         serializer = ProductSerializer(
-            qs.distinct(),
+            products,
             many=True,
             context={
                 **self.context,
@@ -152,7 +155,38 @@ class CartSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "updated_at", "created_at")
 
 
+class FacetCountSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    count = serializers.IntegerField()
+
+
+class PriceBucketSerializer(serializers.Serializer):
+    min = serializers.DecimalField(max_digits=10, decimal_places=2)
+    max = serializers.DecimalField(max_digits=10, decimal_places=2)
+    count = serializers.IntegerField()
+
+
+class FacetsSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    dough_type = FacetCountSerializer(many=True)
+    product_size = FacetCountSerializer(many=True)
+    ingredient = FacetCountSerializer(many=True)
+    price = PriceBucketSerializer(many=True)
+
+
 class HomeResponseSerializer(serializers.Serializer):
     categories = CategorySerializer(many=True)
     ingredients = IngredientSerializer(many=True)
     dought_tyoes = DoughTypeSerializer(many=True)
+    facets = FacetsSerializer()
+
+
+class ProductListResponseSerializer(serializers.Serializer):
+    next = serializers.URLField(allow_null=True)
+    results = ProductSerializer(many=True)
+    facets = FacetsSerializer()
+
+
+class IngredientListResponseSerializer(serializers.Serializer):
+    next = serializers.URLField(allow_null=True)
+    results = IngredientSerializer(many=True)
@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Category, Product, Tombstone
+from .versioning import invalidate_catalog
+
+
+def catalog_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_catalog)
+
+
+def record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(model=sender._meta.model_name, object_id=instance.pk)
+
+
+def touch(model, pks) -> None:
+    """Bumps ``updated_at`` of rows whose links changed, for the delta sync."""
+    if pks:
+        model.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+
+
+def product_link_changed(sender, instance, **kwargs):
+    touch(Product, [instance.product_id])
+
+
+def category_link_changed(sender, instance, **kwargs):
+    touch(Category, [instance.category_id])
+
+
+def dough_types_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            touch(Product, [instance.pk])
+    elif action in ("post_add", "post_remove"):
+        touch(Product, pk_set)
+    elif action == "pre_clear":
+        touch(Product, list(instance.product_set.values_list("pk", flat=True)))
+
+
+def dough_type_deleted(sender, instance, **kwargs):
+    # The through rows go with a plain DELETE, without m2m_changed.
+    touch(Product, list(instance.product_set.values_list("pk", flat=True)))
+
+
+def category_deleted(sender, instance, **kwargs):
+    # SET_NULL empties Product.category with a plain UPDATE.
+    touch(Product, list(instance.products.values_list("pk", flat=True)))
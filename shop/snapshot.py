@@ -0,0 +1,29 @@
+"""
+# shop/snapshot.py
+
+The materialized ``/api/home/`` snapshot.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+
+from .catalog import build_home_payload
+from .versioning import catalog_version
+
+HOME_SNAPSHOT_KEY = "shop:home:{version}:{origin}"
+
+
+def get_home_snapshot(request) -> bytes:
+    """Encoded unfiltered home payload for the request's origin."""
+    origin = hashlib.sha1(request.build_absolute_uri("/").encode()).hexdigest()
+    key = HOME_SNAPSHOT_KEY.format(version=catalog_version(), origin=origin)
+
+    snapshot = cache.get(key)
+    if snapshot is None:
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        snapshot = renderer.render(build_home_payload(request))
+        cache.set(key, snapshot, settings.CATALOG_SNAPSHOT_TIMEOUT)
+    return snapshot
@@ -0,0 +1,27 @@
+"""
+# shop/tasks.py
+
+Background tasks of the shop app, run by ``manage.py runworker``.
+"""
+
+from django.core.files.storage import default_storage
+from django.tasks import task
+
+from .changes import purge_tombstones
+from .importer import import_catalog, read_records
+
+
+@task
+def import_catalog_file(name: str, dry_run: bool = False) -> dict:
+    """Imports an uploaded catalog file from the default storage, then deletes it."""
+    try:
+        with default_storage.open(name, "rb") as stream:
+            summary = import_catalog(read_records(stream, name), dry_run=dry_run)
+    finally:
+        default_storage.delete(name)
+    return summary.as_dict()
+
+
+@task
+def purge_catalog_tombstones() -> int:
+    return purge_tombstones()
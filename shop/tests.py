@@ -1,3 +1,1036 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import gzip
+import io
+import json
+import tempfile
+import uuid
+from unittest import mock, skipIf
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict, StreamingHttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from gemma import metrics, middleware
+from gemma.renderers import FastJSONParser, FastJSONRenderer
+from tasks.worker import Worker
+from user.models import User
+
+from .changes import catalog_changes, purge_tombstones
+from .management.commands import bench_api
+from .catalog import build_home_payload, filter_products, parse_product_filters
+from .facets import get_facet_index
+from . import exports, importer, seeding, views
+from .models import (
+    Cart,
+    CartProduct,
+    Category,
+    CategoryProductSize,
+    DoughType,
+    Ingredient,
+    Order,
+    Product,
+    ProductIngredient,
+    ProductSize,
+    Tombstone,
+)
+from .serializers import CategorySerializer
+from .versioning import catalog_last_modified
+
+
+def seed_catalog(categories: int, products_per_category: int):
+    dough_types = [
+        DoughType.objects.create(name=name, value=i, order=i)
+        for i, name in enumerate(["thin", "classic"], start=1)
+    ]
+    sizes = [
+        ProductSize.objects.create(name=name, size=size, order=i)
+        for i, (name, size) in enumerate([("S", 25), ("M", 30), ("L", 35)], start=1)
+    ]
+    ingredients = [
+        Ingredient.objects.create(
+            name=f"ingredient {i}",
+            price=i,
+            image=f"content/ingredient-{i}/image.webp" if i % 2 else None,
+        )
+        for i in range(6)
+    ]
+
+    for c in range(categories):
+        category = Category.objects.create(name=f"category {c}")
+        for size in sizes[: c % len(sizes) + 1]:
+            CategoryProductSize.objects.create(category=category, product_size=size)
+
+        for p in range(products_per_category):
+            product = Product.objects.create(
+                name=f"product {c}-{p}",
+                price=10 + p,
+                category=category,
+                image=f"content/product-{c}-{p}/image.webp",
+            )
+            product.dough_types.set(dough_types[: p % 2 + 1])
+            for ingredient in ingredients[p % 3 : p % 3 + 3]:
+                ProductIngredient.objects.create(product=product, ingredient=ingredient)
+
+
+class HomeViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _home_queries(self, query=""):
+        request = Request(APIRequestFactory().get(f"/api/home/{query}"))
+        build_home_payload(request)  # warm the version stamp and facet index
+        with CaptureQueriesContext(connection) as ctx:
+            build_home_payload(request)
+        return len(ctx.captured_queries)
+
+    def test_query_budget_is_flat(self):
+        seed_catalog(categories=2, products_per_category=2)
+        small = self._home_queries()
+        small_filtered = self._home_queries("?dough_type=1&ingredient=2")
+
+        seed_catalog(categories=6, products_per_category=15)
+        cache.clear()
+        self.assertEqual(self._home_queries(), small)
+        self.assertEqual(
+            self._home_queries("?dough_type=1&ingredient=2"), small_filtered
+        )
+        self.assertLessEqual(small_filtered, 7)
+
+    def test_filtered_request_reads_only_matching_products(self):
+        seed_catalog(categories=2, products_per_category=3)
+        for compiled in (True, False):
+            with self.settings(CATALOG_COMPILED_SERIALIZERS=compiled):
+                self._home_queries("?ingredient=404")
+                request = Request(APIRequestFactory().get("/api/home/?ingredient=404"))
+                with CaptureQueriesContext(connection) as ctx:
+                    payload = build_home_payload(request)
+
+            self.assertTrue(all(not c["products"] for c in payload["category"]))
+            product_queries = [
+                query["sql"]
+                for query in ctx.captured_queries
+                if '"shop_product"' in query["sql"]
+                or "shop_productingredient" in query["sql"]
+            ]
+            self.assertEqual(product_queries, [], compiled)
+
+    def test_matches_per_category_serializers(self):
+        seed_catalog(categories=3, products_per_category=4)
+
+        for query in (
+            "",
+            "?dough_type=2",
+            "?product_size=3",
+            "?ingredient=1&ingredient=5",
+            "?min_price=11&max_price=12",
+        ):
+            request = Request(APIRequestFactory().get(f"/api/home/{query}"))
+            expected = CategorySerializer(
+                Category.objects.all(), many=True, context={"request": request}
+            ).data
+
+            response = self.client.get(f"/api/home/{query}")
+            self.assertEqual(response.json()["category"], expected, query)
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get("/api/home/?dough_type=thin")
+        self.assertEqual(response.status_code, 400)
+
+
+class FacetIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_catalog(categories=3, products_per_category=6)
+
+    def test_resolve_matches_sql_filters(self):
+        for query in (
+            {"dough_type": ["1"]},
+            {"dough_type": ["1", "2"], "ingredient": ["3"]},
+            {"product_size": ["2"], "max_price": "13"},
+            {"ingredient": ["0", "5"], "min_price": "11.50"},
+            {"product_size": ["3"], "dough_type": ["2"], "ingredient": ["4"]},
+            {"dough_type": ["404"]},
+        ):
+            filters = parse_product_filters(QueryDict(urlencode(query, doseq=True)))
+            expected = set(
+                filter_products(Product.objects.all(), filters).values_list(
+                    "id", flat=True
+                )
+            )
+            self.assertEqual(get_facet_index().resolve(filters), expected, query)
+
+    def test_index_follows_catalog_version(self):
+        index = get_facet_index()
+        self.assertIs(get_facet_index(), index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="new", price=1)
+
+        self.assertIsNot(get_facet_index(), index)
+        self.assertEqual(len(get_facet_index().product_ids), 19)
+
+
+class HomeSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        seed_catalog(categories=2, products_per_category=3)
+
+    def test_unfiltered_request_is_served_from_snapshot(self):
+        first = self.client.get("/api/home/")
+
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/home/")
+
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second["Content-Type"], "application/json")
+
+    def test_snapshot_is_rebuilt_on_catalog_change(self):
+        self.client.get("/api/home/")
+
+        product = Product.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.price = 99
+            product.save()
+
+        data = self.client.get("/api/home/").json()
+        products = [p for c in data["category"] for p in c["products"]]
+        self.assertIn("99.00", [p["price"] for p in products])
+
+    def test_snapshot_is_rebuilt_on_dough_type_change(self):
+        self.client.get("/api/home/")
+
+        product = Product.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.dough_types.clear()
+
+        data = self.client.get("/api/home/").json()
+        served = next(
+            p for c in data["category"] for p in c["products"] if p["id"] == product.pk
+        )
+        self.assertEqual(served["dough_types"], [])
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        seed_catalog(categories=3, products_per_category=6)
+
+    def _expected_count(self, query: dict) -> int:
+        filters = parse_product_filters(QueryDict(urlencode(query, doseq=True)))
+        return filter_products(Product.objects.all(), filters).count()
+
+    def test_counts_honour_filters(self):
+        query = {"product_size": ["2"], "max_price": "14"}
+        facets = self.client.get("/api/home/", query).json()["facets"]
+
+        self.assertEqual(facets["total"], self._expected_count(query))
+        for facet in ("dough_type", "ingredient"):
+            for value in facets[facet]:
+                self.assertEqual(
+                    value["count"],
+                    self._expected_count({**query, facet: [value["id"]]}),
+                    (facet, value),
+                )
+        self.assertEqual(sum(b["count"] for b in facets["price"]), facets["total"])
+
+    def test_products_response_has_facets(self):
+        data = self.client.get("/api/products/", {"dough_type": "2"}).json()
+
+        self.assertEqual(
+            len(data["results"]), self._expected_count({"dough_type": "2"})
+        )
+        self.assertEqual(data["facets"]["total"], len(data["results"]))
+        self.assertEqual(data["facets"]["price"][0]["min"], "10.00")
+        self.assertEqual(data["facets"]["price"][-1]["max"], "15.00")
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        seed_catalog(categories=2, products_per_category=3)
+
+    def test_matching_etag_is_not_modified(self):
+        for path in ("/api/home/", "/api/products/", "/api/ingredients/"):
+            etag = self.client.get(path)["ETag"]
+
+            with self.assertNumQueries(0):
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, path)
+            self.assertEqual(response.content, b"")
+            self.assertEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_query(self):
+        product = Product.objects.first()
+        etag = self.client.get(f"/api/product/{product.pk}/")["ETag"]
+        other = self.client.get("/api/home/?dough_type=1")["ETag"]
+        self.assertNotEqual(etag, other)
+
+    def test_catalog_change_invalidates_validators(self):
+        first = self.client.get("/api/home/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.first().delete()
+
+        response = self.client.get("/api/home/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+    def test_last_modified_comes_from_the_database(self):
+        before = catalog_last_modified()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.first().delete()
+
+        # A process with its own cache sees the deletion through its tombstone.
+        cache.clear()
+        after = catalog_last_modified()
+        self.assertGreater(after, before)
+        self.assertEqual(after, Tombstone.objects.get().deleted_at)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get("/api/ingredients/")["Last-Modified"]
+        response = self.client.get(
+            "/api/ingredients/", HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        seed_catalog(categories=3, products_per_category=6)
+
+    def _walk(self, url):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids += [row["id"] for row in data["results"]]
+            url = data["next"]
+        return ids
+
+    def test_walks_every_product_once_in_price_order(self):
+        ids = self._walk("/api/products/?ordering=price&page_size=4")
+
+        expected = list(
+            Product.objects.order_by("price", "pk").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_inserts_between_pages_do_not_shift_results(self):
+        first = self.client.get("/api/ingredients/?page_size=3").json()
+        Ingredient.objects.create(name="early", price=0)
+
+        rest = self._walk(first["next"])
+        seen = [row["id"] for row in first["results"]] + rest
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(seen, sorted(seen))
+
+    def test_page_size_is_capped(self):
+        with self.settings(CATALOG_MAX_PAGE_SIZE=5):
+            data = self.client.get("/api/products/?page_size=1000").json()
+        self.assertEqual(len(data["results"]), 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/products/?cursor=bm9wZQ")
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_key(self):
+        for key in (["abc", 1], ["NaN", 1], ["Infinity", 1], ["1", "x"], "ab"):
+            raw = json.dumps({"o": "price", "k": key}).encode()
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            for url in ("/api/products/", "/api/ingredients/"):
+                with self.subTest(key=key, url=url):
+                    response = self.client.get(url, {"cursor": cursor})
+                    self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        seed_catalog(categories=2, products_per_category=3)
+        self.client.get("/api/products/")  # warm the version stamp and facet index
+
+    def test_fields_limit_output_and_prefetches(self):
+        with CaptureQueriesContext(connection) as full:
+            self.client.get("/api/products/")
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client.get("/api/products/?fields=id,name,price,image")
+
+        for row in response.json()["results"]:
+            self.assertEqual(set(row), {"id", "name", "price", "image"})
+        self.assertEqual(len(full) - len(sparse), 2)
+
+    def test_expand_controls_nesting(self):
+        data = self.client.get("/api/home/?expand=ingredients").json()
+        product = data["category"][0]["products"][0]
+        self.assertIsInstance(product["ingredients"][0], dict)
+        self.assertIsInstance(product["dough_types"][0], str)
+
+        product_id = product["id"]
+        data = self.client.get(f"/api/product/{product_id}/?expand=").json()
+        self.assertIsInstance(data["ingredients"][0], str)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/api/products/?fields=id,secret")
+        self.assertEqual(response.status_code, 400)
+
+
+class CompiledSerializerTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        seed_catalog(categories=3, products_per_category=5)
+        Product.objects.create(name="без категории", price="7.5", image="x.png")
+
+    def _content(self, path, compiled):
+        cache.clear()
+        with self.settings(CATALOG_COMPILED_SERIALIZERS=compiled):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return response.content
+
+    def test_output_is_byte_identical(self):
+        product = Product.objects.first()
+        for path in (
+            "/api/home/",
+            "/api/home/?dough_type=1&min_price=11",
+            "/api/home/?ingredient=404",
+            "/api/home/?fields=id,name,ingredients&expand=ingredients",
+            "/api/products/",
+            "/api/products/?ordering=price&page_size=4",
+            "/api/products/?fields=id,price,image,category&expand=",
+            "/api/products/?expand=dough_types&ingredient=2",
+            f"/api/product/{product.pk}/",
+            f"/api/product/{product.pk}/?fields=dough_types&expand=",
+            "/api/ingredients/",
+        ):
+            self.assertEqual(
+                self._content(path, compiled=True),
+                self._content(path, compiled=False),
+                path,
+            )
+
+    def test_missing_product(self):
+        response = self.client.get("/api/product/999999/")
+        self.assertEqual(response.status_code, 404)
+
+
+class FastJSONRendererTests(TestCase):
+    def _payload(self):
+        seed_catalog(categories=2, products_per_category=3)
+        request = Request(APIRequestFactory().get("/api/home/"))
+        return {
+            "home": build_home_payload(request),
+            "rows": list(Product.objects.values()),
+            "uuid": uuid.UUID(int=7),
+            "naive": datetime.datetime(2025, 1, 2, 3, 4, 5, 600),
+            "text": "Пицца\u2028line",
+            1: None,
+        }
+
+    def test_matches_drf_renderer(self):
+        payload = self._payload()
+        self.assertEqual(
+            FastJSONRenderer().render(payload), JSONRenderer().render(payload)
+        )
+
+    def test_falls_back_without_orjson(self):
+        payload = self._payload()
+        with mock.patch("gemma.renderers.orjson", None):
+            rendered = FastJSONRenderer().render(payload)
+            parsed = FastJSONParser().parse(io.BytesIO(rendered))
+        self.assertEqual(rendered, JSONRenderer().render(payload))
+        self.assertEqual(parsed["text"], payload["text"])
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b"{nope"))
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        seed_catalog(categories=3, products_per_category=5)
+
+    def test_gzip_variant_is_compressed_once(self):
+        plain = self.client.get("/api/home/").content
+
+        with mock.patch("gemma.middleware.gzip.compress", wraps=gzip.compress) as spy:
+            for _ in range(2):
+                response = self.client.get("/api/home/", HTTP_ACCEPT_ENCODING="gzip")
+                self.assertEqual(response["Content-Encoding"], "gzip")
+                self.assertEqual(gzip.decompress(response.content), plain)
+        self.assertEqual(spy.call_count, 1)
+
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn("Accept-Encoding", response["Vary"])
+        not_modified = self.client.get(
+            "/api/home/",
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    @skipIf(middleware.brotli is None, "brotli is not installed")
+    def test_brotli_is_preferred(self):
+        plain = self.client.get("/api/products/").content
+        response = self.client.get(
+            "/api/products/", HTTP_ACCEPT_ENCODING="gzip, br;q=0.5"
+        )
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(middleware.brotli.decompress(response.content), plain)
+
+        response = self.client.get("/api/products/", HTTP_ACCEPT_ENCODING="br;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_small_and_streaming_responses_are_skipped(self):
+        with self.settings(COMPRESSION_MIN_SIZE=10**7):
+            response = self.client.get("/api/home/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        streaming = StreamingHttpResponse(
+            [b"x" * 5000], content_type="application/json"
+        )
+        response = middleware.CompressionMiddleware(lambda r: streaming)(request)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+@override_settings(PERF_SAMPLE_RATE=1.0, PERF_SERVER_TIMING=True)
+class TimingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.client = APIClient()
+        seed_catalog(categories=2, products_per_category=3)
+
+    def test_server_timing_and_histograms(self):
+        response = self.client.get("/api/products/")
+
+        timing = response["Server-Timing"]
+        self.assertIn("app;dur=", timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn("render;dur=", timing)
+
+        self.client.get("/api/products/")
+        row = metrics.report()["GET /api/products/"]
+        self.assertEqual(row["count"], 2)
+        self.assertEqual(sum(row["histogram"].values()), 2)
+        self.assertGreater(row["db_queries"], 0)
+        self.assertGreater(row["bytes"], 0)
+        self.assertIsNotNone(row["p95_ms"])
+
+    def test_unsampled_requests_are_not_recorded(self):
+        with self.settings(PERF_SAMPLE_RATE=0.0):
+            response = self.client.get("/api/home/")
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.assertEqual(metrics.report(), {})
+
+    def test_server_timing_header_can_be_turned_off(self):
+        with self.settings(PERF_SERVER_TIMING=False):
+            response = self.client.get("/api/home/")
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.assertIn("GET /api/home/", metrics.report())
+
+    def test_staff_endpoint_and_command(self):
+        self.client.get("/api/home/")
+
+        user = User.objects.create_user(email="user@example.com")
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get("/api/perf/").status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get("/api/perf/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("GET /api/home/", response.json())
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command("perf_stats", stdout=out, stderr=err)
+        self.assertIn("GET /api/home/", out.getvalue())
+        self.assertIn("REDIS_URL", err.getvalue())
+
+
+class SeedingTests(TestCase):
+    def test_generated_catalog_is_deterministic(self):
+        counts = seeding.seed_catalog(products=120, seed=7)
+        self.assertEqual(counts["products"], 120)
+        self.assertEqual(Product.objects.count(), 120)
+        self.assertEqual(ProductIngredient.objects.count(), 480)
+        self.assertTrue(all(p.dough_types.exists() for p in Product.objects.all()))
+
+        first = list(Product.objects.order_by("pk").values_list("name", "price"))
+        Product.objects.all().delete()
+        seeding.seed_catalog(products=120, seed=7)
+        second = list(Product.objects.order_by("pk").values_list("name", "price"))
+        self.assertEqual(first, second)
+
+    def test_catalog_is_usable_by_the_api(self):
+        seeding.seed_catalog(products=30)
+        response = APIClient().get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 30)
+
+    def test_command_renders_shared_placeholders(self):
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            call_command(
+                "seed_catalog", products=10, images=2, processes=1, stdout=io.StringIO()
+            )
+            names = set(Product.objects.values_list("image", flat=True))
+            self.assertEqual(len(names), 2)
+            with Product.objects.first().image.open() as image:
+                self.assertEqual(image.read(4), b"RIFF")
+
+            CartProduct.objects.create(
+                cart=Cart.objects.create(total=0),
+                product=Product.objects.first(),
+                quantity=1,
+            )
+            call_command(
+                "seed_catalog",
+                products=5,
+                images=0,
+                replace=True,
+                stdout=io.StringIO(),
+            )
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertIsNone(CartProduct.objects.get().product)
+
+
+CATALOG_DOCUMENT = {
+    "ingredients": [
+        {"name": "Mozzarella", "price": 2, "imageUrl": "https://img/mozzarella.webp"},
+        {"name": "Basil", "price": 1, "imageUrl": ""},
+    ],
+    "product_sizes": [
+        {"name": "Piccola", "value": 20, "sortOrder": 1},
+        {"name": "Grande", "value": 35, "sortOrder": 2},
+    ],
+    "dough_types": [{"name": "Tradizionale", "value": 1, "sortOrder": 1}],
+    "categories": [
+        {
+            "name": "Pizze",
+            "product_sizes": ["Piccola", "Grande"],
+            "products": [
+                {"name": "Margherita", "price": 8.5, "imageUrl": "https://img/m.webp"},
+                {"name": "Marinara", "price": 7, "imageUrl": ""},
+            ],
+        }
+    ],
+}
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media.name))
+        self.images = {"https://img/mozzarella.webp": b"m1", "https://img/m.webp": b"p1"}
+
+    def run_import(self, records, **options):
+        return importer.import_catalog(records, fetch=self.images.__getitem__, **options)
+
+    def test_document_import_is_idempotent(self):
+        records = list(importer.records_from_document(CATALOG_DOCUMENT))
+        summary = self.run_import(records)
+        self.assertEqual(summary.created["product"], 2)
+        self.assertEqual(summary.images["stored"], 2)
+        self.assertEqual(summary.errors, [])
+
+        margherita = Product.objects.get(name="Margherita")
+        self.assertEqual(str(margherita.price), "8.50")
+        self.assertEqual(margherita.category.name, "Pizze")
+        self.assertEqual(margherita.dough_types.count(), 1)
+        self.assertEqual(CategoryProductSize.objects.count(), 2)
+        image = margherita.image.name
+
+        summary = self.run_import(records)
+        self.assertEqual(sum(summary.created.values()), 0)
+        self.assertEqual(sum(summary.updated.values()), 0)
+        self.assertEqual(summary.images["unchanged"], 2)
+        self.assertEqual(Product.objects.get(name="Margherita").image.name, image)
+
+        self.images["https://img/m.webp"] = b"p2"
+        records[-2] = {**records[-2], "price": 9}
+        summary = self.run_import(records)
+        self.assertEqual(summary.updated["product"], 1)
+        self.assertEqual(summary.images["stored"], 1)
+        margherita = Product.objects.get(name="Margherita")
+        self.assertEqual(str(margherita.price), "9.00")
+        self.assertNotEqual(margherita.image.name, image)
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_jsonl_links_are_replaced(self):
+        self.run_import(importer.records_from_document(CATALOG_DOCUMENT))
+        lines = io.StringIO(
+            '{"type": "product", "name": "Margherita", "ingredients": ["Basil"]}\n'
+            "\n"
+            '{"type": "product", "name": "Marinara", "ingredients": ["Nope"]}\n'
+        )
+        summary = self.run_import(importer.read_records(lines, "menu.jsonl"))
+
+        margherita = Product.objects.get(name="Margherita")
+        self.assertEqual(
+            [link.ingredient.name for link in margherita.product_ingredient.all()],
+            ["Basil"],
+        )
+        self.assertEqual(summary.errors, ["unknown Ingredient 'Nope'"])
+
+        self.run_import(
+            [{"type": "product", "name": "Margherita", "ingredients": ["Mozzarella"]}]
+        )
+        self.assertEqual(
+            [link.ingredient.name for link in margherita.product_ingredient.all()],
+            ["Mozzarella"],
+        )
+
+    def test_rows_are_stamped_just_before_commit(self):
+        self.images.clear()
+        marks = []
+        self.run_import(
+            importer.records_from_document(CATALOG_DOCUMENT),
+            batch_size=1,
+            progress=lambda stage, done: marks.append((stage, timezone.now())),
+        )
+
+        stamps = {
+            updated_at
+            for model in (Ingredient, ProductSize, DoughType, Category, Product)
+            for updated_at in model.objects.values_list("updated_at", flat=True)
+        }
+        self.assertEqual(len(stamps), 1)
+        last_batch = max(at for stage, at in marks if stage != "images")
+        self.assertGreaterEqual(stamps.pop(), last_batch)
+
+    def test_invalid_records_are_skipped(self):
+        lines = io.StringIO(
+            '{"type": "ingredient", "name": "Basil", "price": 1}\n'
+            '{"type": "ingredient", "name": "Salt", "price": "abc"}\n'
+            '{"type": "ingredient", "name": "Oil", "price": null}\n'
+            '{"type": "product", "name": "Rossa", "price": "NaN"}\n'
+            '{"type": "product_size", "name": "Media"}\n'
+            '{"type": "dough_type", "name": "Integrale", "value": -1}\n'
+            '["ingredient", "Pepper"]\n'
+            '{"type": "product", "name": "Bianca", "ingredients": "Basil"}\n'
+        )
+        summary = self.run_import(importer.read_records(lines, "menu.jsonl"))
+
+        self.assertEqual(summary.created, {"ingredient": 1})
+        self.assertEqual(len(summary.errors), 7)
+        self.assertIn("invalid price 'abc'", summary.errors[0])
+        self.assertIn("invalid price None", summary.errors[1])
+        self.assertIn("no value", summary.errors[3])
+        self.assertIn("not an object", summary.errors[5])
+        self.assertEqual(
+            list(Ingredient.objects.values_list("name", flat=True)), ["Basil"]
+        )
+
+        with self.assertRaises(importer.CatalogImportError):
+            self.run_import(importer.read_records(io.StringIO("{nope\n"), "a.jsonl"))
+        with self.assertRaises(importer.CatalogImportError):
+            self.run_import(importer.read_records(io.StringIO("[1, 2]"), "a.json"))
+
+    def test_dry_run_writes_nothing(self):
+        out = io.StringIO()
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as file:
+            json.dump(CATALOG_DOCUMENT, file)
+            file.flush()
+            call_command("import_catalog", file.name, dry_run=True, stdout=out)
+
+        self.assertIn("Would import", out.getvalue())
+        self.assertIn("product", out.getvalue())
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_admin_endpoint(self):
+        client = APIClient()
+        staff = User.objects.create_user(email="staff@example.com", is_staff=True)
+        document = json.dumps(
+            {**CATALOG_DOCUMENT, "ingredients": [{"name": "Basil", "price": 1}]}
+        ).encode()
+
+        response = client.post("/api/catalog/import/", {})
+        self.assertIn(response.status_code, (401, 403))
+
+        client.force_authenticate(staff)
+        upload = SimpleUploadedFile("menu.json", document)
+        response = client.post("/api/catalog/import/", {"file": upload, "dry_run": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"]["product"], 2)
+        self.assertFalse(Product.objects.exists())
+
+        upload = SimpleUploadedFile(
+            "menu.jsonl",
+            b'{"type": "ingredient", "name": "Salt", "price": "abc"}\n'
+            b'{"type": "product_size", "name": "Media"}\n'
+            b"42\n",
+        )
+        response = client.post("/api/catalog/import/", {"file": upload, "dry_run": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["errors"]), 3)
+
+        upload = SimpleUploadedFile("menu.json", document)
+        response = client.post("/api/catalog/import/", {"file": upload})
+        self.assertEqual(response.status_code, 202)
+        task_id = response.json()["task_id"]
+
+        Worker().run_pending()
+        response = client.get(f"/api/catalog/import/{task_id}/")
+        self.assertEqual(response.json()["status"], "SUCCESSFUL")
+        self.assertEqual(response.json()["summary"]["created"]["product"], 2)
+        self.assertEqual(Product.objects.count(), 2)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        seed_catalog(categories=2, products_per_category=3)
+        self.user = User.objects.create_user(email="buyer@example.com")
+        cart = Cart.objects.create(user=self.user, total=30)
+        for product in Product.objects.order_by("pk")[:2]:
+            CartProduct.objects.create(
+                cart=cart,
+                product=product,
+                quantity=2,
+                product_size=ProductSize.objects.first(),
+            )
+        Order.objects.create(
+            user=self.user, cart=cart, total=30, full_name="A", address="B", comment=""
+        )
+        Order.objects.create(total=0, full_name="C", address="D", comment="")
+
+    def test_rows_prefetch_per_chunk(self):
+        # One cursor over the products, then ingredients and dough types
+        # for each chunk of four.
+        with self.assertNumQueries(5):
+            rows = list(exports.product_rows(chunk_size=4))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]["dough_types"], ["thin"])
+        self.assertEqual(
+            [i["name"] for i in rows[0]["ingredients"]],
+            ["ingredient 0", "ingredient 1", "ingredient 2"],
+        )
+
+        with self.assertNumQueries(3):
+            orders = list(exports.order_rows())
+        self.assertEqual([len(order["lines"]) for order in orders], [2, 0])
+        self.assertEqual(orders[0]["user_email"], "buyer@example.com")
+
+    def test_endpoints_stream_jsonl_and_csv(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get("/api/export/products.jsonl").status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = client.get("/api/export/products.jsonl")
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment", response["Content-Disposition"])
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(json.loads(lines[0])["name"], "product 0-0")
+
+        response = client.get("/api/export/orders.csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], exports.ORDER_COLUMNS + exports.ORDER_LINE_COLUMNS)
+        # two lines of the first order, one empty line for the second
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][-1], "2")
+
+        self.assertEqual(client.get("/api/export/users.csv").status_code, 404)
+
+    def test_csv_cells_are_not_read_as_formulas(self):
+        Order.objects.filter(full_name="C").update(
+            full_name="=HYPERLINK(\"http://x\")", address="@SUM(A1)", comment="-2+3"
+        )
+        Product.objects.filter(pk=Product.objects.order_by("pk")[0].pk).update(
+            name="+cmd"
+        )
+        content = b"".join(exports.export("orders", "csv")).decode()
+        row = list(csv.reader(io.StringIO(content)))[-1]
+        self.assertEqual(row[5:8], ["'=HYPERLINK(\"http://x\")", "'@SUM(A1)", "'-2+3"])
+
+        content = b"".join(exports.export("products", "csv")).decode()
+        self.assertEqual(list(csv.reader(io.StringIO(content)))[1][1], "'+cmd")
+
+    def test_asgi_requests_get_an_async_stream(self):
+        self.user.is_staff = True
+        self.user.save()
+        request = AsyncRequestFactory().get("/api/export/orders.csv")
+        force_authenticate(request, self.user)
+        response = views.ExportView.as_view()(
+            request, dataset="orders", file_format="csv"
+        )
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return [line async for line in response.streaming_content]
+
+        self.assertEqual(async_to_sync(read)(), list(exports.export("orders", "csv")))
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("export_data", "products", format="csv", stdout=out)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[1][rows[0].index("dough_types")], "thin")
+
+
+@override_settings(CATALOG_CHANGES_LAG=0)
+class CatalogChangesTests(TestCase):
+    def setUp(self):
+        seed_catalog(categories=2, products_per_category=3)
+        self.client = APIClient()
+
+    def poll(self, since=None):
+        params = {"since": since} if since else {}
+        response = self.client.get("/api/catalog/changes/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def changed_ids(self, data, key):
+        return [row["id"] for row in data["changes"][key]]
+
+    def test_full_sync_then_nothing(self):
+        data = self.poll()
+        self.assertEqual(len(data["changes"]["products"]), 6)
+        self.assertEqual(len(data["changes"]["categories"]), 2)
+        product = data["changes"]["products"][0]
+        self.assertEqual(product["dough_types"], [1])
+        self.assertEqual(len(product["ingredients"]), 3)
+        self.assertFalse(data["has_more"])
+
+        data = self.poll(data["cursor"])
+        self.assertEqual(sum(map(len, data["changes"].values())), 0)
+        self.assertEqual(sum(map(len, data["deleted"].values())), 0)
+
+    def test_changes_and_tombstones(self):
+        cursor = self.poll()["cursor"]
+        product = Product.objects.order_by("pk").first()
+        product.price = 99
+        product.save()
+        other = Product.objects.order_by("pk")[1]
+        other.dough_types.clear()
+        ingredient = Ingredient.objects.get(name="ingredient 5")
+        ingredient_id = ingredient.pk
+        ingredient.delete()
+        size_link = CategoryProductSize.objects.order_by("pk").first()
+        size_link.delete()
+
+        data = self.poll(cursor)
+        changed = set(self.changed_ids(data, "products"))
+        # price change, dough types cleared, and every product that used
+        # the deleted ingredient
+        self.assertTrue({product.pk, other.pk} <= changed)
+        self.assertEqual(data["changes"]["products"][0]["price"], "99.00")
+        self.assertEqual(data["deleted"]["ingredients"], [ingredient_id])
+        self.assertEqual(self.changed_ids(data, "categories"), [size_link.category_id])
+        self.assertEqual(data["changes"]["categories"][0]["product_sizes"], [])
+
+        data = self.poll(data["cursor"])
+        self.assertEqual(sum(map(len, data["changes"].values())), 0)
+
+    def test_deleted_dough_type_and_category_touch_their_products(self):
+        cursor = self.poll()["cursor"]
+        dough_type = DoughType.objects.order_by("pk").first()
+        with_dough = set(dough_type.product_set.values_list("pk", flat=True))
+        category = Category.objects.order_by("pk").last()
+        in_category = set(category.products.values_list("pk", flat=True))
+        dough_type_id = dough_type.pk
+        dough_type.delete()
+        category.delete()
+
+        data = self.poll(cursor)
+        self.assertTrue(with_dough)
+        self.assertEqual(
+            set(self.changed_ids(data, "products")), with_dough | in_category
+        )
+        for product in data["changes"]["products"]:
+            self.assertNotIn(dough_type_id, product["dough_types"])
+            if product["id"] in in_category:
+                self.assertIsNone(product["category_id"])
+
+    def test_pages_do_not_repeat(self):
+        seen = []
+        with self.settings(CATALOG_CHANGES_LIMIT=4):
+            data = catalog_changes()
+            seen += self.changed_ids(data, "products")
+            self.assertTrue(data["has_more"])
+            data = catalog_changes(data["cursor"])
+            seen += self.changed_ids(data, "products")
+            self.assertFalse(data["has_more"])
+        self.assertEqual(seen, sorted(Product.objects.values_list("pk", flat=True)))
+
+    def test_seeded_rows_share_one_stamp(self):
+        seeding.seed_catalog(products=50, ingredients=5, batch_size=7)
+        self.assertEqual(
+            Product.objects.filter(name__startswith="Продукт")
+            .values("updated_at")
+            .distinct()
+            .count(),
+            1,
+        )
+
+    def test_clear_catalog_leaves_tombstones(self):
+        cursor = self.poll()["cursor"]
+        seeding.clear_catalog()
+        data = self.poll(cursor)
+        self.assertEqual(len(data["deleted"]["products"]), 6)
+        self.assertEqual(len(data["deleted"]["categories"]), 2)
+
+    def test_bad_and_expired_cursors(self):
+        response = self.client.get("/api/catalog/changes/", {"since": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+        positions = json.loads(base64.urlsafe_b64decode(self.poll()["cursor"] + "=="))
+        for at in ("2026-01-01T00:00:00", "yesterday"):
+            tampered = {key: [at, pk] for key, (_, pk) in positions.items()}
+            since = base64.urlsafe_b64encode(json.dumps(tampered).encode()).decode()
+            response = self.client.get("/api/catalog/changes/", {"since": since})
+            self.assertEqual(response.status_code, 400, at)
+
+        cursor = self.poll()["cursor"]
+        with self.settings(CATALOG_TOMBSTONE_RETENTION=0):
+            response = self.client.get("/api/catalog/changes/", {"since": cursor})
+            self.assertEqual(response.status_code, 410)
+
+            Product.objects.first().delete()
+            self.assertEqual(purge_tombstones(), 1)
+
+
+class BenchApiTests(TransactionTestCase):
+    def test_tiny_catalog_is_within_the_query_budgets(self):
+        # The command creates its own test database; here its helpers run
+        # in the one of the test run.
+        command = bench_api.Command(stdout=io.StringIO())
+        results = command.bench([5], {"iterations": 2, "warmup": 1})
+
+        self.assertEqual(
+            {row["endpoint"] for row in results}, set(bench_api.QUERY_BUDGETS)
+        )
+        self.assertEqual(bench_api.over_budget(results), [])
@@ -12,5 +12,11 @@ urlpatterns = [
     path('products/', views.ProductsView.as_view()),
     path('product/<int:pk>/', views.ProductView.as_view()),
 
-    path('ingredients/', views.IngredientsView.as_view())
+    path('ingredients/', views.IngredientsView.as_view()),
+
+    path('catalog/changes/', views.CatalogChangesView.as_view()),
+    path('catalog/import/', views.CatalogImportView.as_view()),
+    path('catalog/import/<str:task_id>/', views.CatalogImportView.as_view()),
+
+    path('export/<str:dataset>.<str:file_format>', views.ExportView.as_view()),
 ]
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+# shop/versioning.py
+
+Catalog version stamp shared by the snapshot, the facet index and the
+conditional GET headers.
+"""
+
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import (
+    Category,
+    CategoryProductSize,
+    DoughType,
+    Ingredient,
+    Product,
+    ProductIngredient,
+    ProductSize,
+    Tombstone,
+)
+
+CATALOG_MODELS = (
+    Category,
+    Product,
+    Ingredient,
+    DoughType,
+    ProductSize,
+    CategoryProductSize,
+    ProductIngredient,
+    Product.dough_types.through,
+)
+
+STAMP_KEY = "shop:catalog:stamp"
+GENERATION_KEY = "shop:catalog:generation"
+
+
+def _fingerprint() -> list:
+    parts = []
+    for model in CATALOG_MODELS:
+        aggregates = {"count": Count("pk"), "max_id": Max("pk")}
+        if any(field.name == "updated_at" for field in model._meta.fields):
+            aggregates["updated_at"] = Max("updated_at")
+        parts.append(model.objects.aggregate(**aggregates))
+    # Deletions leave no updated_at behind, their tombstones do.
+    parts.append(
+        Tombstone.objects.aggregate(max_id=Max("pk"), updated_at=Max("deleted_at"))
+    )
+    return parts
+
+
+def catalog_stamp() -> tuple[str, datetime.datetime | None]:
+    """Returns ``(version, last_modified)`` of the catalog as a whole."""
+    stamp = cache.get(STAMP_KEY)
+    if stamp is None:
+        generation = cache.get_or_set(GENERATION_KEY, 0, timeout=None)
+        fingerprint = _fingerprint()
+        version = hashlib.sha1(repr((fingerprint, generation)).encode()).hexdigest()
+        modified = [
+            part["updated_at"] for part in fingerprint if part.get("updated_at")
+        ]
+        stamp = (version[:16], max(modified, default=None))
+        cache.set(STAMP_KEY, stamp, settings.CATALOG_VERSION_TTL)
+    return stamp
+
+
+def catalog_version() -> str:
+    """Returns a stamp that changes whenever a catalog row changes."""
+    return catalog_stamp()[0]
+
+
+def catalog_last_modified() -> datetime.datetime | None:
+    return catalog_stamp()[1]
+
+
+def invalidate_catalog():
+    """Drops the version stamp so every snapshot keyed by it goes stale."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+    cache.delete(STAMP_KEY)
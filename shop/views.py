@@ -1,107 +1,191 @@
-from django.shortcuts import get_object_or_404
+import os
+
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.tasks import TaskResultStatus
+from django.tasks.exceptions import TaskResultDoesNotExist
+from django.utils import timezone
+from django.utils.crypto import get_random_string
 from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
     extend_schema,
 )
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_202_ACCEPTED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+    HTTP_410_GONE,
+)
 from rest_framework.views import APIView
 
-from .models import Category, DoughType, Ingredient, Product
+from .catalog import (
+    build_home_payload,
+    facet_counts,
+    filtered_product_ids,
+    listing_queryset,
+    parse_product_fields,
+    parse_product_filters,
+    serialize_listing,
+    serialize_product,
+)
+from .changes import CursorExpired, InvalidCursor, catalog_changes
+from .conditional import catalog_conditional
+from .exports import DATASETS, FORMATS, aexport, export
+from .importer import CatalogImportError, import_catalog, read_records
+from .models import Ingredient, Product
 from .serializers import (
-    CategorySerializer,
-    DoughTypeSerializer,
     HomeResponseSerializer,
+    IngredientListResponseSerializer,
     IngredientSerializer,
+    ProductListResponseSerializer,
     ProductSerializer,
 )
+from .pagination import KeysetPagination
+from .snapshot import get_home_snapshot
+from .tasks import import_catalog_file
+
+PRODUCT_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        name="dough_type",
+        description="ID типа теста. Можно передать несколько значений",
+        required=False,
+        type=OpenApiTypes.INT,
+        many=True,
+        location=OpenApiParameter.QUERY,
+        # examples=[1, 2],
+    ),
+    OpenApiParameter(
+        name="product_size",
+        description="ID размера продукта. Можно передать несколько значений",
+        required=False,
+        type=OpenApiTypes.INT,
+        many=True,
+        location=OpenApiParameter.QUERY,
+        # examples=[1, 3],
+    ),
+    OpenApiParameter(
+        name="ingredient",
+        description="ID ингредиента. Можно передать несколько значений",
+        required=False,
+        type=OpenApiTypes.INT,
+        many=True,
+        location=OpenApiParameter.QUERY,
+        # examples=[4, 7],
+    ),
+    OpenApiParameter(
+        name="min_price",
+        description="Минимальная цена",
+        required=False,
+        type=OpenApiTypes.NUMBER,
+        location=OpenApiParameter.QUERY,
+        # examples=100,
+    ),
+    OpenApiParameter(
+        name="max_price",
+        description="Максимальная цена",
+        required=False,
+        type=OpenApiTypes.NUMBER,
+        location=OpenApiParameter.QUERY,
+        # examples=500,
+    ),
+]
+
+PAGINATION_PARAMETERS = [
+    OpenApiParameter(
+        name="cursor",
+        description="Курсор следующей страницы из поля next",
+        required=False,
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+    ),
+    OpenApiParameter(
+        name="page_size",
+        description="Размер страницы (ограничен сервером)",
+        required=False,
+        type=OpenApiTypes.INT,
+        location=OpenApiParameter.QUERY,
+    ),
+    OpenApiParameter(
+        name="ordering",
+        description="Сортировка: id или price",
+        required=False,
+        type=OpenApiTypes.STR,
+        enum=["id", "price"],
+        location=OpenApiParameter.QUERY,
+    ),
+]
+
+FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        name="fields",
+        description="Поля продукта через запятую, например id,name,price,image",
+        required=False,
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+    ),
+    OpenApiParameter(
+        name="expand",
+        description="Связи продукта, раскрываемые в объекты: ingredients, dough_types",
+        required=False,
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+    ),
+]
 
 
 @extend_schema(
     responses=HomeResponseSerializer,
-    parameters=[
-        OpenApiParameter(
-            name="dough_type",
-            description="ID типа теста. Можно передать несколько значений",
-            required=False,
-            type=OpenApiTypes.INT,
-            many=True,
-            location=OpenApiParameter.QUERY,
-            # examples=[1, 2],
-        ),
-        OpenApiParameter(
-            name="product_size",
-            description="ID размера продукта. Можно передать несколько значений",
-            required=False,
-            type=OpenApiTypes.INT,
-            many=True,
-            location=OpenApiParameter.QUERY,
-            # examples=[1, 3],
-        ),
-        OpenApiParameter(
-            name="ingredient",
-            description="ID ингредиента. Можно передать несколько значений",
-            required=False,
-            type=OpenApiTypes.INT,
-            many=True,
-            location=OpenApiParameter.QUERY,
-            # examples=[4, 7],
-        ),
-        OpenApiParameter(
-            name="min_price",
-            description="Минимальная цена",
-            required=False,
-            type=OpenApiTypes.NUMBER,
-            location=OpenApiParameter.QUERY,
-            # examples=100,
-        ),
-        OpenApiParameter(
-            name="max_price",
-            description="Максимальная цена",
-            required=False,
-            type=OpenApiTypes.NUMBER,
-            location=OpenApiParameter.QUERY,
-            # examples=500,
-        ),
-    ],
+    parameters=PRODUCT_FILTER_PARAMETERS + FIELDS_PARAMETERS,
 )
 class HomeView(APIView):
     permission_classes = [AllowAny]
 
+    @catalog_conditional
     def get(self, request: Request) -> Response:
-        category_serializer = CategorySerializer(
-            Category.objects.all(), many=True, context={"request": request}
-        )
-        ingredients_serializer = IngredientSerializer(
-            Ingredient.objects.all(), many=True, context={"request": request}
-        )
-        dought_tyoes_serializer = DoughTypeSerializer(
-            DoughType.objects.all(), many=True, context={"request": request}
-        )
+        if not request.query_params:
+            return HttpResponse(
+                get_home_snapshot(request), content_type="application/json"
+            )
 
-        return Response(
-            {
-                "category": category_serializer.data,
-                "ingredients": ingredients_serializer.data,
-                "dought_tyoes": dought_tyoes_serializer.data,
-            },
-            status=HTTP_200_OK,
-        )
+        return Response(build_home_payload(request), status=HTTP_200_OK)
 
 
-@extend_schema(responses=ProductSerializer)
+@extend_schema(
+    responses=ProductListResponseSerializer,
+    parameters=PRODUCT_FILTER_PARAMETERS + PAGINATION_PARAMETERS + FIELDS_PARAMETERS,
+)
 class ProductsView(APIView):
     serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
     permission_classes = [AllowAny]
 
+    @catalog_conditional
     def get(self, request: Request) -> Response:
-        serializer = self.serializer_class(
-            Product.objects.all(), many=True, context={"request": request}
+        filters = parse_product_filters(request.query_params)
+        product_ids = filtered_product_ids(filters)
+
+        product_fields = parse_product_fields(request.query_params)
+
+        products = listing_queryset(Product, product_fields["fields"])
+        if product_ids is not None:
+            products = products.filter(pk__in=sorted(product_ids))
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(products, request, view=self)
+        data = serialize_listing(
+            Product, page, context={"request": request, **product_fields}
+        )
+        return Response(
+            paginator.get_paginated_data(data, facets=facet_counts(filters)),
+            status=HTTP_200_OK,
         )
-        return Response(serializer.data, status=HTTP_200_OK)
 
     def post(self, request: Request) -> Response:
         serializer = self.serializer_class(data=request.data)
@@ -110,15 +194,16 @@ class ProductsView(APIView):
         return Response(serializer.data)
 
 
-@extend_schema(responses=ProductSerializer)
+@extend_schema(responses=ProductSerializer, parameters=FIELDS_PARAMETERS)
 class ProductView(APIView):
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
 
+    @catalog_conditional
     def get(self, request: Request, pk: int) -> Response:
-        product = get_object_or_404(Product, id=pk)
-        serializer = self.serializer_class(product, context={"request": request})
-        return Response(serializer.data, status=HTTP_200_OK)
+        product_fields = parse_product_fields(request.query_params)
+        data = serialize_product(pk, context={"request": request, **product_fields})
+        return Response(data, status=HTTP_200_OK)
 
     # def post(self, request: Request) -> Response:
     #     serializer = self.serializer_class(data=request.data)
@@ -127,13 +212,115 @@ class ProductView(APIView):
     #     return Response(serializer.data)
 
 
-@extend_schema(responses=IngredientSerializer)
+@extend_schema(
+    responses=IngredientListResponseSerializer, parameters=PAGINATION_PARAMETERS
+)
 class IngredientsView(APIView):
     serializer_class = IngredientSerializer
+    pagination_class = KeysetPagination
     permission_classes = [AllowAny]
 
+    @catalog_conditional
     def get(self, request: Request) -> Response:
-        serializer = self.serializer_class(
-            Ingredient.objects.all(), many=True, context={"request": request}
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            listing_queryset(Ingredient), request, view=self
         )
-        return Response(serializer.data, status=HTTP_200_OK)
+        data = serialize_listing(Ingredient, page, context={"request": request})
+        return Response(paginator.get_paginated_data(data), status=HTTP_200_OK)
+
+
+class CatalogImportView(APIView):
+    """
+    POST /catalog/import/ (staff only), multipart ``file``: a
+    ``test-data.json`` shaped document or a ``.jsonl`` file of records.
+    With ``dry_run`` the summary of what would change comes back at once;
+    otherwise the file is imported by a background task and
+    GET /catalog/import/<task_id>/ reports its status and summary.
+    """
+
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request: Request) -> Response:
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "Missing file"}, status=HTTP_400_BAD_REQUEST)
+
+        if request.data.get("dry_run") in ("1", "true", "True"):
+            try:
+                summary = import_catalog(
+                    read_records(upload, upload.name), dry_run=True
+                )
+            except CatalogImportError as exc:
+                return Response({"detail": str(exc)}, status=HTTP_400_BAD_REQUEST)
+            return Response(summary.as_dict(), status=HTTP_200_OK)
+
+        name = default_storage.save(
+            f"imports/{get_random_string(12)}-{os.path.basename(upload.name)}", upload
+        )
+        result = import_catalog_file.enqueue(name)
+        return Response(
+            {"task_id": result.id, "status": result.status},
+            status=HTTP_202_ACCEPTED,
+        )
+
+    def get(self, request: Request, task_id: str) -> Response:
+        try:
+            result = import_catalog_file.get_result(task_id)
+        except TaskResultDoesNotExist:
+            return Response({"detail": "Not found"}, status=HTTP_404_NOT_FOUND)
+
+        data = {"task_id": result.id, "status": result.status}
+        if result.status == TaskResultStatus.SUCCESSFUL:
+            data["summary"] = result.return_value
+        elif result.errors:
+            data["error"] = result.errors[-1].traceback.strip().splitlines()[-1]
+        return Response(data, status=HTTP_200_OK)
+
+
+class ExportView(APIView):
+    """
+    GET /export/<products|orders>.<jsonl|csv> (staff only). The file is
+    streamed as it is read from the database, in EXPORT_CHUNK_SIZE chunks;
+    under ASGI through an async iterator, which Django doesn't buffer.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request, dataset: str, file_format: str):
+        if dataset not in DATASETS or file_format not in FORMATS:
+            raise Http404
+
+        stream = aexport if isinstance(request._request, ASGIRequest) else export
+        response = StreamingHttpResponse(
+            stream(dataset, file_format), content_type=FORMATS[file_format]
+        )
+        filename = f"{dataset}-{timezone.now():%Y%m%d-%H%M%S}.{file_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class CatalogChangesView(APIView):
+    """
+    GET /catalog/changes/?since=<cursor>
+
+    Catalog rows changed and ids deleted since the cursor, and the cursor
+    to poll with next; without ``since``, the whole catalog. Call again
+    at once while ``has_more`` is true. 410 means the cursor is too old
+    to be answered and the client has to sync from scratch.
+    """
+
+    permission_classes = [AllowAny]
+
+    def get(self, request: Request) -> Response:
+        try:
+            data = catalog_changes(request.query_params.get("since"), request=request)
+        except InvalidCursor:
+            return Response({"detail": "Invalid cursor"}, status=HTTP_400_BAD_REQUEST)
+        except CursorExpired:
+            return Response(
+                {"detail": "Cursor expired, sync again without since"},
+                status=HTTP_410_GONE,
+            )
+        return Response(data, status=HTTP_200_OK)
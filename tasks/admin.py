@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import QueuedTask, RecurringTask
+
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "queue_name", "status", "priority", "run_after", "enqueued_at")
+    list_filter = ("status", "queue_name")
+    search_fields = ("id", "name")
+
+
+@admin.register(RecurringTask)
+class RecurringTaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "next_run_at")
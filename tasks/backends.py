@@ -0,0 +1,95 @@
+"""
+# tasks/backends.py
+
+Database backend for ``django.tasks``. Enqueued tasks are rows of
+``QueuedTask``; ``manage.py runworker`` claims and runs them.
+
+    @task(queue_name="mail")
+    def send_digest(user_id): ...
+
+    send_digest.enqueue(user.pk)
+    send_digest.using(run_after=timezone.now() + timedelta(hours=1)).enqueue(user.pk)
+"""
+
+import dataclasses
+import threading
+from typing import Any
+
+from django.db import transaction
+from django.tasks import TaskResult, TaskResultStatus
+from django.tasks.backends.base import BaseTaskBackend
+from django.tasks.base import TaskError
+from django.tasks.exceptions import TaskResultDoesNotExist
+from django.tasks.signals import task_enqueued
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.json import normalize_json
+from django.utils.module_loading import import_string
+
+from .models import QueuedTask
+
+# Set when a task is committed, so workers in this process start at once.
+task_available = threading.Event()
+
+
+def load_task(name: str):
+    """The ``Task`` registered under a module path."""
+    return import_string(name)
+
+
+@dataclasses.dataclass(frozen=True, slots=True, kw_only=True)
+class DatabaseTaskResult(TaskResult):
+    """``TaskResult`` that takes the stored return value in its constructor"""
+
+    _return_value: Any | None = None
+
+
+def to_result(row: QueuedTask, task=None) -> TaskResult:
+    task = task or load_task(row.name)
+    return DatabaseTaskResult(
+        task=task,
+        id=row.id,
+        status=TaskResultStatus(row.status),
+        enqueued_at=row.enqueued_at,
+        started_at=row.started_at,
+        finished_at=row.finished_at,
+        last_attempted_at=row.last_attempted_at,
+        args=row.args,
+        kwargs=row.kwargs,
+        backend=task.backend,
+        errors=[TaskError(**error) for error in row.errors],
+        worker_ids=list(row.worker_ids),
+        _return_value=row.return_value,
+    )
+
+
+class DatabaseBackend(BaseTaskBackend):
+    supports_defer = True
+    supports_get_result = True
+    supports_priority = True
+
+    def enqueue(self, task, args, kwargs):
+        self.validate_task(task)
+
+        row = QueuedTask.objects.create(
+            id=get_random_string(32),
+            name=task.module_path,
+            args=normalize_json(list(args)),
+            kwargs=normalize_json(kwargs),
+            queue_name=task.queue_name,
+            priority=task.priority,
+            takes_context=task.takes_context,
+            run_after=task.run_after or timezone.now(),
+        )
+        transaction.on_commit(task_available.set)
+
+        result = to_result(row, task)
+        task_enqueued.send(type(self), task_result=result)
+        return result
+
+    def get_result(self, result_id):
+        try:
+            row = QueuedTask.objects.get(pk=result_id)
+        except QueuedTask.DoesNotExist:
+            raise TaskResultDoesNotExist(result_id)
+        return to_result(row)
@@ -0,0 +1,60 @@
+import multiprocessing
+import threading
+
+from django.core.management.base import BaseCommand
+
+from tasks.worker import Worker, enqueue_recurring, run_threads, run_worker_process
+
+
+class Command(BaseCommand):
+    help = "Runs queued tasks (tasks.backends.DatabaseBackend)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queue",
+            action="append",
+            default=[],
+            dest="queues",
+            help="only run tasks from this queue (repeatable)",
+        )
+        parser.add_argument("--threads", type=int, default=1)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="worker processes, each running --threads threads",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="run due tasks, then exit"
+        )
+
+    def handle(self, *args, **options):
+        queues = options["queues"]
+
+        if options["once"]:
+            enqueue_recurring()
+            ran = Worker(queues).run_pending()
+            self.stdout.write(f"Ran {ran} tasks")
+            return
+
+        self.stdout.write(
+            f"Starting {options['processes']} x {options['threads']} workers "
+            f"on {', '.join(queues) or 'all queues'}"
+        )
+        if options["processes"] <= 1:
+            run_threads(queues, options["threads"], threading.Event())
+            return
+
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=run_worker_process, args=(queues, options["threads"]))
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from tasks.worker import queue_depth
+
+
+class Command(BaseCommand):
+    help = "Shows the number of unfinished tasks per queue"
+
+    def handle(self, *args, **options):
+        depth = queue_depth()
+        if not depth:
+            self.stdout.write("No unfinished tasks")
+            return
+
+        self.stdout.write(f"{'queue':<20} {'ready':>8} {'scheduled':>10} {'running':>8}")
+        for queue, counts in sorted(depth.items()):
+            self.stdout.write(
+                f"{queue:<20} {counts['ready']:>8} {counts['scheduled']:>10} "
+                f"{counts['running']:>8}"
+            )
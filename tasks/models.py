@@ -0,0 +1,56 @@
+# tasks/models.py
+
+from django.db import models
+from django.tasks import TaskResultStatus
+from django.utils import timezone
+
+
+class QueuedTask(models.Model):
+    """One enqueued run of a task and, once finished, its result"""
+
+    id = models.CharField(max_length=32, primary_key=True)
+    name = models.CharField(max_length=255)  # module path of the Task
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+
+    queue_name = models.CharField(max_length=64, default="default")
+    priority = models.SmallIntegerField(default=0)
+    takes_context = models.BooleanField(default=False)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    status = models.CharField(
+        max_length=10,
+        choices=TaskResultStatus.choices,
+        default=TaskResultStatus.READY,
+    )
+    worker_ids = models.JSONField(default=list)
+    errors = models.JSONField(default=list)
+    return_value = models.JSONField(null=True, blank=True)
+
+    enqueued_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_attempted_at = models.DateTimeField(null=True, blank=True)
+    # A RUNNING row whose lease ran out (its worker died) is claimed again.
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "queue_name", "-priority", "run_after"],
+                name="tasks_ready_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.status}]"
+
+
+class RecurringTask(models.Model):
+    """Next due time of an entry of TASK_SCHEDULE, shared by all workers"""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    next_run_at = models.DateTimeField()
+
+    def __str__(self):
+        return str(self.name)
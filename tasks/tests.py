@@ -0,0 +1,145 @@
+import datetime
+import io
+
+from django.core.management import call_command
+from django.tasks import TaskResultStatus, task
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import QueuedTask
+from .worker import Worker, enqueue_recurring, queue_depth
+
+calls = []
+
+
+@task
+def add(a, b):
+    return a + b
+
+
+@task(priority=10)
+def urgent():
+    calls.append("urgent")
+
+
+@task
+def routine():
+    calls.append("routine")
+
+
+@task(queue_name="mail")
+def send():
+    calls.append("send")
+
+
+@task
+def broken():
+    raise RuntimeError("boom")
+
+
+@task(takes_context=True)
+def attempt(context):
+    return context.attempt
+
+
+class TaskRunnerTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_stores_the_task_until_a_worker_runs_it(self):
+        result = add.enqueue(2, 3)
+        self.assertEqual(result.status, TaskResultStatus.READY)
+        self.assertEqual(QueuedTask.objects.get(pk=result.id).name, add.module_path)
+
+        self.assertEqual(Worker().run_pending(), 1)
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.SUCCESSFUL)
+        self.assertEqual(result.return_value, 5)
+        self.assertEqual(result.attempts, 1)
+
+    def test_claimed_task_is_not_claimed_again(self):
+        add.enqueue(1, 1)
+        first, second = Worker(), Worker()
+
+        row = first.claim()
+        self.assertIsNotNone(row)
+        self.assertIsNone(second.claim())
+
+    def test_task_of_a_dead_worker_is_claimed_after_its_lease(self):
+        result = add.enqueue(1, 2)
+        first, second = Worker(), Worker()
+        self.assertIsNotNone(first.claim())
+
+        QueuedTask.objects.filter(pk=result.id).update(
+            lease_expires_at=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        row = second.claim()
+        self.assertEqual(row.pk, result.id)
+        self.assertIsNone(first.claim())
+
+        second.execute(row)
+        result.refresh()
+        self.assertEqual(result.return_value, 3)
+        self.assertEqual(result.worker_ids, [second.worker_id])
+
+    def test_priority_and_queues(self):
+        routine.enqueue()
+        urgent.enqueue()
+        send.enqueue()
+
+        Worker(queues=["default"]).run_pending()
+        self.assertEqual(calls, ["urgent", "routine"])
+
+        Worker(queues=["mail"]).run_pending()
+        self.assertEqual(calls[-1], "send")
+
+    def test_failures_are_recorded(self):
+        result = broken.enqueue()
+        Worker().run_pending()
+
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.FAILED)
+        self.assertEqual(result.errors[0].exception_class, RuntimeError)
+        self.assertIn("boom", result.errors[0].traceback)
+
+    def test_context(self):
+        result = attempt.enqueue()
+        Worker().run_pending()
+        result.refresh()
+        self.assertEqual(result.return_value, 1)
+
+    def test_scheduled_task_waits_for_run_after(self):
+        later = timezone.now() + datetime.timedelta(hours=1)
+        add.using(run_after=later).enqueue(1, 2)
+
+        self.assertEqual(Worker().run_pending(), 0)
+        self.assertEqual(
+            queue_depth(), {"default": {"ready": 0, "scheduled": 1, "running": 0}}
+        )
+
+        QueuedTask.objects.update(run_after=timezone.now())
+        self.assertEqual(Worker().run_pending(), 1)
+        self.assertEqual(queue_depth(), {})
+
+    @override_settings(
+        TASK_SCHEDULE={"routine": {"task": "tasks.tests.routine", "interval": 60}}
+    )
+    def test_recurring_task_is_enqueued_once_per_interval(self):
+        now = timezone.now()
+        self.assertEqual(enqueue_recurring(now), ["routine"])
+        self.assertEqual(enqueue_recurring(now), [])
+        self.assertEqual(enqueue_recurring(now + datetime.timedelta(seconds=30)), [])
+        self.assertEqual(
+            enqueue_recurring(now + datetime.timedelta(seconds=60)), ["routine"]
+        )
+        self.assertEqual(QueuedTask.objects.count(), 2)
+
+    @override_settings(TASK_SCHEDULE={})
+    def test_commands(self):
+        add.enqueue(1, 2)
+        out = io.StringIO()
+        call_command("taskqueue", stdout=out)
+        self.assertIn("default", out.getvalue())
+
+        call_command("runworker", "--once", stdout=out)
+        self.assertIn("Ran 1 tasks", out.getvalue())
@@ -0,0 +1,218 @@
+"""
+# tasks/worker.py
+
+Claims and runs ``QueuedTask`` rows. A row is claimed with
+
+    UPDATE ... SET status = 'RUNNING' WHERE id = %s AND status = 'READY'
+
+and only the worker whose UPDATE changed the row runs it, so any number
+of threads and processes can share a queue on SQLite and PostgreSQL.
+A claim holds the row for TASK_LEASE seconds; a RUNNING row whose lease
+ran out, because its worker died, is claimed again like a READY one.
+Recurring tasks from ``TASK_SCHEDULE`` are enqueued the same way: the
+worker that moves ``next_run_at`` forward is the one that enqueues.
+"""
+
+import datetime
+import logging
+import threading
+import time
+from traceback import format_exception
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Q
+from django.tasks import TaskContext, TaskResultStatus
+from django.tasks.signals import task_finished, task_started
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.json import normalize_json
+
+from .backends import load_task, task_available, to_result
+from .models import QueuedTask, RecurringTask
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_recurring(now=None) -> list[str]:
+    """Enqueues the TASK_SCHEDULE entries that are due; returns their names."""
+    now = now or timezone.now()
+    enqueued = []
+    for name, entry in settings.TASK_SCHEDULE.items():
+        RecurringTask.objects.get_or_create(name=name, defaults={"next_run_at": now})
+        interval = datetime.timedelta(seconds=entry["interval"])
+        claimed = RecurringTask.objects.filter(
+            name=name, next_run_at__lte=now
+        ).update(next_run_at=now + interval)
+        if claimed:
+            load_task(entry["task"]).enqueue(
+                *entry.get("args", ()), **entry.get("kwargs", {})
+            )
+            enqueued.append(name)
+    return enqueued
+
+
+def queue_depth() -> dict[str, dict[str, int]]:
+    """Unfinished tasks per queue: ready now, scheduled for later, running."""
+    now = timezone.now()
+    depth = {}
+    unfinished = QueuedTask.objects.filter(
+        status__in=[TaskResultStatus.READY, TaskResultStatus.RUNNING]
+    )
+    rows = unfinished.values("queue_name", "status").annotate(count=Count("pk"))
+    scheduled = dict(
+        unfinished.filter(status=TaskResultStatus.READY, run_after__gt=now)
+        .values_list("queue_name")
+        .annotate(count=Count("pk"))
+    )
+    for row in rows:
+        queue = depth.setdefault(
+            row["queue_name"], {"ready": 0, "scheduled": 0, "running": 0}
+        )
+        if row["status"] == TaskResultStatus.RUNNING:
+            queue["running"] = row["count"]
+        else:
+            queue["scheduled"] = scheduled.get(row["queue_name"], 0)
+            queue["ready"] = row["count"] - queue["scheduled"]
+    return depth
+
+
+class Worker:
+    """Runs due tasks from ``queues`` (all queues when empty)"""
+
+    def __init__(self, queues=(), worker_id=None):
+        self.queues = list(queues)
+        self.worker_id = worker_id or get_random_string(32)
+
+    def _due(self):
+        now = timezone.now()
+        due = QueuedTask.objects.filter(
+            Q(status=TaskResultStatus.READY, run_after__lte=now)
+            | Q(status=TaskResultStatus.RUNNING, lease_expires_at__lte=now)
+        )
+        if self.queues:
+            due = due.filter(queue_name__in=self.queues)
+        return due
+
+    def claim(self) -> QueuedTask | None:
+        """Claims the most urgent due task, or returns None."""
+        candidates = self._due().order_by("-priority", "run_after", "enqueued_at")
+        for pk in candidates.values_list("pk", flat=True)[:10]:
+            now = timezone.now()
+            # The due condition is re-checked by the UPDATE, so of two
+            # workers racing for a row only one wins it.
+            claimed = self._due().filter(pk=pk).update(
+                status=TaskResultStatus.RUNNING,
+                started_at=now,
+                last_attempted_at=now,
+                lease_expires_at=now
+                + datetime.timedelta(seconds=settings.TASK_LEASE),
+            )
+            if claimed:
+                row = QueuedTask.objects.get(pk=pk)
+                row.worker_ids.append(self.worker_id)
+                return row
+        return None
+
+    def execute(self, row: QueuedTask) -> QueuedTask:
+        try:
+            task = load_task(row.name)
+        except (ImportError, ValueError) as exc:
+            return self._finish(row, None, exc)
+
+        result = to_result(row, task)
+        task_started.send(type(task.get_backend()), task_result=result)
+
+        exc = value = None
+        try:
+            if row.takes_context:
+                context = TaskContext(task_result=result)
+                value = task.call(context, *row.args, **row.kwargs)
+            else:
+                value = task.call(*row.args, **row.kwargs)
+            value = normalize_json(value)
+        except KeyboardInterrupt:
+            raise
+        except BaseException as e:
+            exc = e
+
+        row = self._finish(row, value, exc)
+        task_finished.send(type(task.get_backend()), task_result=to_result(row, task))
+        return row
+
+    def _finish(self, row, value, exc) -> QueuedTask:
+        row.finished_at = timezone.now()
+        if exc is None:
+            row.status = TaskResultStatus.SUCCESSFUL
+            row.return_value = value
+        else:
+            logger.error("Task %s (%s) failed: %r", row.name, row.pk, exc)
+            row.status = TaskResultStatus.FAILED
+            row.errors.append(
+                {
+                    "exception_class_path": (
+                        f"{type(exc).__module__}.{type(exc).__qualname__}"
+                    ),
+                    "traceback": "".join(format_exception(exc)),
+                }
+            )
+        row.save(
+            update_fields=[
+                "status", "return_value", "errors", "worker_ids", "finished_at"
+            ]
+        )
+        return row
+
+    def run_pending(self, limit: int | None = None) -> int:
+        """Runs due tasks until none are left (or ``limit`` ran)."""
+        ran = 0
+        while limit is None or ran < limit:
+            row = self.claim()
+            if row is None:
+                break
+            self.execute(row)
+            ran += 1
+        return ran
+
+    def run(self, stop: threading.Event, schedule: bool = True) -> None:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                if schedule:
+                    enqueue_recurring()
+                ran = self.run_pending()
+            except Exception:
+                logger.exception("Task worker %s failed", self.worker_id)
+                ran = 0
+            if not ran:
+                task_available.wait(settings.TASK_POLL_INTERVAL)
+                task_available.clear()
+        close_old_connections()
+
+
+def run_worker_process(queues, threads: int) -> None:
+    """Entry point of a ``runworker --processes`` child."""
+    import django
+
+    django.setup()
+    stop = threading.Event()
+    run_threads(queues, threads, stop)
+
+
+def run_threads(queues, threads: int, stop: threading.Event) -> None:
+    workers = [
+        threading.Thread(
+            target=Worker(queues).run, args=(stop,), name=f"task-worker-{i}"
+        )
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        task_available.set()
+    for worker in workers:
+        worker.join()
@@ -25,7 +25,7 @@ log "🔄 Обновление кода из Git..."
 run_or_fail "Git pull" git pull
 
 log "🔄 Синхронизация uv..."
-run_or_fail "uv sync" uv sync
+run_or_fail "uv sync" uv sync --extra fast
 
 log "🛠️ Применение миграций..."
 run_or_fail "Миграции Django" uv run manage.py migrate
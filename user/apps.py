@@ -1,5 +1,5 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class UserConfig(AppConfig):
@@ -7,6 +7,13 @@ class UserConfig(AppConfig):
     name = 'user'
 
     def ready(self):
-        from .signals import create_default_roles
+        from .models import AccessToken, RefreshToken, User
+        from .signals import create_default_roles, token_changed, user_changed
 
         post_migrate.connect(create_default_roles)
+
+        for model in (AccessToken, RefreshToken):
+            post_save.connect(token_changed, sender=model)
+            post_delete.connect(token_changed, sender=model)
+        post_save.connect(user_changed, sender=User)
+        post_delete.connect(user_changed, sender=User)
@@ -1,3 +1,6 @@
+import copy
+import datetime
+
 import jwt
 from channels.db import database_sync_to_async
 from django.conf import settings
@@ -5,14 +8,48 @@ from django.contrib.auth import get_user_model
 from django.db.models.fields import NullBooleanField
 from rest_framework import authentication, exceptions
 
+from . import revocation
+from .cache import TTLCache
 from .models import AccessToken, RefreshToken
 
 User = get_user_model()
 
+# Per-worker caches, dropped entry by entry from the post_save/post_delete
+# handlers in user.signals. Other workers rely on the TTL.
+_users = TTLCache(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL)
+_tokens = {
+    AccessToken: TTLCache(settings.JWT_TOKEN_CACHE_SIZE, settings.JWT_TOKEN_CACHE_TTL),
+    RefreshToken: TTLCache(settings.JWT_TOKEN_CACHE_SIZE, settings.JWT_TOKEN_CACHE_TTL),
+}
+
+
+def forget_token(model, token_id) -> None:
+    _tokens[model].pop(token_id)
+
+
+def forget_user(user_id) -> None:
+    _users.pop(user_id)
+    for tokens in _tokens.values():
+        tokens.discard(lambda token: token.user_id == user_id)
+
+
+def cache_stats() -> dict:
+    """Size and hit/miss counters of this worker's authentication caches."""
+    return {
+        "users": _users.stats(),
+        "access_tokens": _tokens[AccessToken].stats(),
+        "refresh_tokens": _tokens[RefreshToken].stats(),
+    }
+
 
 class JWTAuthentication(authentication.BaseAuthentication):
     """
     Custom JWT authentication for both Access and Refresh tokens
+
+    With ``JWT_STATELESS_ACCESS_TOKENS`` an access token is accepted on its
+    signed claims alone: the signature and ``exp`` are checked, the id is
+    looked up in the revocation denylist and the user comes from a
+    short-lived per-worker cache. Refresh tokens always hit the database.
     """
 
     keyword = "Bearer"
@@ -32,17 +69,12 @@ class JWTAuthentication(authentication.BaseAuthentication):
         if not token:
             return None
 
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed("Token expired")
-        except jwt.InvalidTokenError:
-            raise exceptions.AuthenticationFailed("Invalid token")
-
         payload = self._decode_token(token)
         token_type = payload.get("type", token_type)
 
-        if token_type == "access":
+        if token_type == "access" and settings.JWT_STATELESS_ACCESS_TOKENS:
+            token_obj = self._get_stateless_access_token(payload)
+        elif token_type == "access":
             token_obj = self._get_access_token(payload)
         else:
             token_obj = self._get_refresh_token(payload)
@@ -75,19 +107,76 @@ class JWTAuthentication(authentication.BaseAuthentication):
             raise exceptions.AuthenticationFailed("Invalid token")
         return payload
 
+    def _get_cached_token(self, model, payload):
+        """
+        Token row with its user, from the per-worker cache when possible.
+        Returns a copy so ``request.user`` changes never reach the cache;
+        ``is_valid()`` still compares the cached ``expires_at`` with now.
+
+        Rows are rotated in place (``AccessToken.rotate``) and other workers
+        don't see the eviction, so a cached row that has expired or is older
+        than the token's ``exp`` is read again.
+        """
+        token_id, user_id = payload.get("id"), payload.get("user_id")
+        tokens = _tokens[model]
+
+        token = tokens.get(token_id)
+        if (
+            token is None
+            or token.user_id != user_id
+            or not token.is_valid()
+            or int(token.expires_at.timestamp()) < payload.get("exp", 0)
+        ):
+            token = model.objects.select_related("user").get(
+                id=token_id, user_id=user_id
+            )
+            tokens.set(token_id, token)
+
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token
+
     def _get_access_token(self, payload) -> AccessToken|exceptions.AuthenticationFailed:
         try:
-            return AccessToken.objects.select_related("user").get(
-                id=payload.get("id"), user_id=payload.get("user_id")
-            )
+            return self._get_cached_token(AccessToken, payload)
         except AccessToken.DoesNotExist:
             raise exceptions.AuthenticationFailed("Access token not found")
 
+    def _get_stateless_access_token(self, payload) -> AccessToken:
+        """Unsaved ``AccessToken`` rebuilt from the claims, no database access."""
+        token_id = payload.get("id")
+        user_id = payload.get("user_id")
+        exp = payload.get("exp")
+        if token_id is None or user_id is None or exp is None:
+            raise exceptions.AuthenticationFailed("Invalid token")
+
+        if revocation.is_revoked(token_id):
+            raise exceptions.AuthenticationFailed("Access token not found")
+
+        return AccessToken(
+            id=token_id,
+            user=self._get_user(user_id),
+            device_id=payload.get("device_id"),
+            expires_at=datetime.datetime.fromtimestamp(exp, tz=datetime.timezone.utc),
+        )
+
+    def _get_user(self, user_id) -> User:
+        user = _users.get(user_id)
+        if user is None:
+            try:
+                user = User.objects.get(pk=user_id)
+            except User.DoesNotExist:
+                raise exceptions.AuthenticationFailed("User not found")
+            _users.set(user_id, user)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("User inactive or deleted")
+        # Views may modify request.user; keep the cached instance pristine.
+        return copy.copy(user)
+
     def _get_refresh_token(self, payload) -> RefreshToken|exceptions.AuthenticationFailed:
         try:
-            return RefreshToken.objects.select_related("user").get(
-                id=payload.get("id"), user_id=payload.get("user_id")
-            )
+            return self._get_cached_token(RefreshToken, payload)
         except RefreshToken.DoesNotExist:
             raise exceptions.AuthenticationFailed("Refresh token not found")
 
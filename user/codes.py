@@ -0,0 +1,208 @@
+"""
+# user/codes.py
+
+Login code stores. ``get_code_store()`` returns the one named by
+``VERIFICATION_CODE_STORE``:
+
+- ``CacheCodeStore`` keeps codes in the cache with a native TTL and
+  consumes them with a single atomic delete. Issued and consumed codes
+  are buffered in memory and written to ``VerificationCode`` by a thread
+  of each web process when ``VERIFICATION_CODE_AUDIT`` is set.
+- ``DatabaseCodeStore`` keeps them in ``VerificationCode`` rows.
+
+The cache store needs a cache shared by all processes (Redis) when the
+site runs more than one.
+"""
+
+import collections
+import datetime
+import functools
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.module_loading import import_string
+
+from .models import VerificationCode
+
+logger = logging.getLogger(__name__)
+
+
+def generate_code() -> str:
+    return get_random_string(6, allowed_chars="0123456789")
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(":".join(parts).encode()).hexdigest()
+
+
+class CacheCodeStore:
+    """
+    One key per issued code, ``vcode:<hash(type, target, code)>``, plus a
+    pointer to the current code of each target so a new code replaces the
+    previous one. Deleting the code key is the check-and-consume: only
+    the caller whose delete removed it gets ``True``.
+    """
+
+    def _current_key(self, target, type_) -> str:
+        return f"vcode:current:{_digest(type_, target)}"
+
+    def _attempts_key(self, target, type_) -> str:
+        return f"vcode:attempts:{_digest(type_, target)}"
+
+    def _code_key(self, target, type_, code) -> str:
+        return f"vcode:{_digest(type_, target, code)}"
+
+    def issue(self, target: str, type_: str) -> str:
+        ttl = settings.VERIFICATION_CODE_TTL
+        code = generate_code()
+
+        previous = cache.get(self._current_key(target, type_))
+        if previous is not None:
+            cache.delete(self._code_key(target, type_, previous))
+        cache.set_many(
+            {
+                self._code_key(target, type_, code): 1,
+                self._current_key(target, type_): code,
+            },
+            ttl,
+        )
+        cache.delete(self._attempts_key(target, type_))
+
+        audit("issued", target, type_, code)
+        return code
+
+    def consume(self, target: str, type_: str, code: str) -> bool:
+        if cache.delete(self._code_key(target, type_, code)):
+            cache.delete_many(
+                [self._current_key(target, type_), self._attempts_key(target, type_)]
+            )
+            audit("consumed", target, type_, code)
+            return True
+
+        # Too many wrong guesses burn the current code.
+        attempts_key = self._attempts_key(target, type_)
+        cache.add(attempts_key, 0, settings.VERIFICATION_CODE_TTL)
+        try:
+            attempts = cache.incr(attempts_key)
+        except ValueError:
+            attempts = 1
+        if attempts >= settings.VERIFICATION_CODE_MAX_ATTEMPTS:
+            current = cache.get(self._current_key(target, type_))
+            if current is not None:
+                cache.delete(self._code_key(target, type_, current))
+        return False
+
+
+class DatabaseCodeStore:
+    """
+    Codes as ``VerificationCode`` rows, consumed by a conditional UPDATE.
+    A wrong guess counts against every live code of the target; a code
+    with VERIFICATION_CODE_MAX_ATTEMPTS wrong guesses is burnt.
+    """
+
+    def issue(self, target: str, type_: str) -> str:
+        return VerificationCode.objects.create(target=target, type=type_).code
+
+    def consume(self, target: str, type_: str, code: str) -> bool:
+        max_attempts = settings.VERIFICATION_CODE_MAX_ATTEMPTS
+        since = timezone.now() - datetime.timedelta(
+            seconds=settings.VERIFICATION_CODE_TTL
+        )
+        live = VerificationCode.objects.filter(
+            target=target, type=type_, is_used=False, created_at__gte=since
+        )
+        if live.filter(code=code, attempts__lt=max_attempts).update(is_used=True):
+            return True
+
+        live.update(attempts=F("attempts") + 1)
+        live.filter(attempts__gte=max_attempts).update(is_used=True)
+        return False
+
+
+@functools.cache
+def _load_store(path: str):
+    return import_string(path)()
+
+
+def get_code_store():
+    return _load_store(settings.VERIFICATION_CODE_STORE)
+
+
+# Audit sink: events wait here until the audit thread (or flush_audit())
+# writes them. The deque drops the oldest events if nothing drains it.
+_events = collections.deque(maxlen=10_000)
+_audit_worker = None
+
+
+def audit(event: str, target: str, type_: str, code: str) -> None:
+    if settings.VERIFICATION_CODE_AUDIT:
+        _events.append((event, target, type_, code, timezone.now()))
+
+
+def flush_audit() -> int:
+    """
+    Writes buffered events: one bulk INSERT and UPDATE for the issued
+    codes, one UPDATE per consumed code.
+    """
+    events = []
+    while _events:
+        try:
+            events.append(_events.popleft())
+        except IndexError:
+            break
+    if not events:
+        return 0
+
+    issued, issued_at = [], []
+    for event, target, type_, code, at in events:
+        if event == "issued":
+            # bulk_create skips VerificationCode.save(), which would
+            # generate a different code.
+            issued.append(VerificationCode(target=target, type=type_, code=code))
+            issued_at.append(at)
+    VerificationCode.objects.bulk_create(issued)
+    # bulk_create() stamps the auto_now fields with the current time;
+    # bulk_update() writes what it is given, the time of the event.
+    for row, at in zip(issued, issued_at):
+        row.created_at = row.updates_at = at
+    VerificationCode.objects.bulk_update(issued, ["created_at", "updates_at"])
+
+    for event, target, type_, code, at in events:
+        if event == "consumed":
+            VerificationCode.objects.filter(
+                target=target, type=type_, code=code, is_used=False
+            ).update(is_used=True, updates_at=at)
+    return len(events)
+
+
+def _run(stop: threading.Event) -> None:
+    while not stop.wait(settings.VERIFICATION_CODE_AUDIT_INTERVAL):
+        close_old_connections()
+        try:
+            flush_audit()
+        except Exception:
+            logger.exception("Writing verification code audit failed")
+
+
+def start_audit_worker() -> threading.Event | None:
+    """
+    Flushes the audit buffer of this process every
+    VERIFICATION_CODE_AUDIT_INTERVAL seconds, in a daemon thread. The buffer
+    is per process, so this cannot be a scheduled task.
+    """
+    global _audit_worker
+    if not settings.VERIFICATION_CODE_AUDIT or _audit_worker is not None:
+        return None
+
+    _audit_worker = threading.Event()
+    threading.Thread(
+        target=_run, args=(_audit_worker,), name="code-audit", daemon=True
+    ).start()
+    return _audit_worker
@@ -0,0 +1,150 @@
+"""
+# user/mail.py
+
+Outbound email queue. Views only insert an ``OutboundEmail`` row and
+enqueue the ``send_queued_mail`` task when it commits; the task worker
+claims due rows in batches, renders them, and sends each batch over a
+single SMTP connection. Failed messages are retried with exponential
+backoff up to ``MAIL_QUEUE_MAX_ATTEMPTS`` times, by the same task run
+from TASK_SCHEDULE. The context (e.g. a login code) is cleared once a
+message is sent or given up on; the row itself is kept for a while.
+"""
+
+import datetime
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .utils import login_code_message
+
+logger = logging.getLogger(__name__)
+
+# kind -> builder(to, connection=..., **context) returning an EmailMessage
+BUILDERS = {
+    "login_code": lambda to, connection, code: login_code_message(
+        to, code, connection=connection
+    ),
+}
+
+def enqueue(kind: str, to: str, **context) -> OutboundEmail:
+    if kind not in BUILDERS:
+        raise ValueError(f"Unknown email kind '{kind}'")
+    from .tasks import send_queued_mail  # user.tasks imports this module
+
+    email = OutboundEmail.objects.create(kind=kind, to=to, context=context)
+    transaction.on_commit(send_queued_mail.enqueue)
+    return email
+
+
+def enqueue_login_code(email: str, code: str) -> OutboundEmail:
+    return enqueue("login_code", email, code=code)
+
+
+def claim(batch_size: int) -> list[OutboundEmail]:
+    """
+    Marks up to ``batch_size`` due messages as SENDING for this worker.
+    Messages whose lease ran out (a worker died mid-batch) are due again.
+    """
+    now = timezone.now()
+    due = OutboundEmail.objects.filter(
+        Q(status=OutboundEmail.PENDING) | Q(status=OutboundEmail.SENDING),
+        next_attempt_at__lte=now,
+    )
+    ids = list(
+        due.order_by("next_attempt_at", "pk").values_list("pk", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+
+    batch = uuid.uuid4().hex
+    # The status/lease condition is re-checked by the UPDATE, so two workers
+    # racing for the same rows can't both win them.
+    due.filter(pk__in=ids).update(
+        status=OutboundEmail.SENDING,
+        batch=batch,
+        next_attempt_at=now + datetime.timedelta(seconds=settings.MAIL_QUEUE_LEASE),
+    )
+    return list(OutboundEmail.objects.filter(batch=batch).order_by("pk"))
+
+
+def _backoff(attempts: int) -> datetime.timedelta:
+    delay = settings.MAIL_QUEUE_RETRY_DELAY * 2 ** (attempts - 1)
+    return datetime.timedelta(seconds=delay)
+
+
+def _failed(email: OutboundEmail, error: str) -> str:
+    """Schedules a retry, or gives up after the last attempt."""
+    email.attempts += 1
+    email.last_error = error
+    if email.attempts >= settings.MAIL_QUEUE_MAX_ATTEMPTS:
+        email.status = OutboundEmail.FAILED
+        email.context = {}
+    else:
+        email.status = OutboundEmail.PENDING
+        email.next_attempt_at = timezone.now() + _backoff(email.attempts)
+    email.save(
+        update_fields=["attempts", "last_error", "status", "next_attempt_at", "context"]
+    )
+    return "failed" if email.status == OutboundEmail.FAILED else "retry"
+
+
+def send_batch(emails: list[OutboundEmail]) -> dict[str, int]:
+    counts = {"sent": 0, "retry": 0, "failed": 0}
+    if not emails:
+        return counts
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Mail connection failed: %s", exc)
+        for email in emails:
+            counts[_failed(email, f"connection: {exc}")] += 1
+        return counts
+
+    try:
+        for email in emails:
+            try:
+                message = BUILDERS[email.kind](
+                    email.to, connection=connection, **email.context
+                )
+                message.send()
+            except Exception as exc:
+                counts[_failed(email, str(exc))] += 1
+                continue
+
+            email.attempts += 1
+            email.status = OutboundEmail.SENT
+            email.sent_at = timezone.now()
+            email.last_error = ""
+            email.context = {}
+            email.save(
+                update_fields=["attempts", "status", "sent_at", "last_error", "context"]
+            )
+            counts["sent"] += 1
+    finally:
+        connection.close()
+    return counts
+
+
+def send_pending(
+    batch_size: int | None = None, max_batches: int | None = None
+) -> dict[str, int]:
+    """Sends due messages batch by batch until none are left."""
+    batch_size = batch_size or settings.MAIL_QUEUE_BATCH_SIZE
+    totals = {"sent": 0, "retry": 0, "failed": 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        emails = claim(batch_size)
+        if not emails:
+            break
+        for name, count in send_batch(emails).items():
+            totals[name] += count
+        batches += 1
+    return totals
@@ -0,0 +1,50 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = "Creates users from a JSONL file, one JSON object per line ('-' for stdin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def _rows(self, stream):
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise CommandError(f"line {number}: {exc}")
+            if not isinstance(row, dict):
+                raise CommandError(f"line {number}: expected a JSON object")
+            if not row.get("email") or not isinstance(row["email"], str):
+                raise CommandError(f"line {number}: email must be set")
+            yield row
+
+    def handle(self, *args, **options):
+        before = User.objects.count()
+        started = time.perf_counter()
+
+        if options["path"] == "-":
+            submitted = User.objects.bulk_import(
+                self._rows(sys.stdin), batch_size=options["batch_size"]
+            )
+        else:
+            with open(options["path"], encoding="utf-8") as stream:
+                submitted = User.objects.bulk_import(
+                    self._rows(stream), batch_size=options["batch_size"]
+                )
+
+        created = User.objects.count() - before
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Created {created} of {submitted} users in {elapsed:.2f}s "
+            f"({submitted - created} skipped)"
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from user.purge import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Deletes expired access/refresh tokens and old verification codes in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--max-rows", type=int, default=None, help="stop after this many rows"
+        )
+
+    def handle(self, *args, **options):
+        result = purge_expired(
+            batch_size=options["batch_size"], max_rows=options["max_rows"]
+        )
+        for name, deleted in result.deleted.items():
+            self.stdout.write(f"  {name:<20} {deleted:>8}")
+        self.stdout.write(
+            f"Deleted {result.total} rows in {result.elapsed:.2f}s "
+            f"({result.rate:.0f} rows/s)"
+        )
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from user.mail import send_pending
+
+
+class Command(BaseCommand):
+    help = "Sends due messages from the outbound mail queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--loop", action="store_true", help="keep polling the queue"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            counts = send_pending(batch_size=options["batch_size"])
+            if any(counts.values()):
+                self.stdout.write(
+                    f"sent={counts['sent']} retry={counts['retry']} failed={counts['failed']}"
+                )
+            if not options["loop"]:
+                break
+            time.sleep(settings.MAIL_QUEUE_POLL_INTERVAL)
@@ -1,3 +1,5 @@
+from itertools import islice
+
 from django.contrib.auth.base_user import BaseUserManager
 from django.utils.crypto import get_random_string
 
@@ -20,4 +22,35 @@ class UserManager(BaseUserManager):
     def create_superuser(self, email, username=None, avatar=None, **extra_fields):
         extra_fields.setdefault("is_staff", True)
         extra_fields.setdefault("is_superuser", True)
-        return self.create_user(email, username=username, avatar=avatar, **extra_fields)
\ No newline at end of file
+        return self.create_user(email, username=username, avatar=avatar, **extra_fields)
+
+    IMPORT_FIELDS = (
+        "email",
+        "username",
+        "phone",
+        "provider",
+        "is_active",
+        "is_guest",
+    )
+
+    def bulk_import(self, rows, batch_size=1000) -> int:
+        """
+        Creates users from an iterable of dicts with ``bulk_create``, one
+        INSERT per ``batch_size`` rows. ``rows`` is consumed lazily, so a
+        generator over a large file stays within one batch of memory.
+        Rows whose email, phone or uid already exists are skipped.
+        Returns the number of rows submitted.
+        """
+        rows = iter(rows)
+        submitted = 0
+        while batch := list(islice(rows, batch_size)):
+            users = []
+            for row in batch:
+                fields = {key: row[key] for key in self.IMPORT_FIELDS if key in row}
+                if not fields.get("email"):
+                    raise ValueError("Email must be set")
+                fields["email"] = self.normalize_email(fields["email"])
+                users.append(self.model(**fields))
+            self.bulk_create(users, ignore_conflicts=True)
+            submitted += len(users)
+        return submitted
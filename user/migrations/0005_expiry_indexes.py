@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0004_role_verificationcode_alter_contact_unique_together_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="accesstoken",
+            index=models.Index(
+                fields=["expires_at"], name="user_access_expires_a2ab64_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="refreshtoken",
+            index=models.Index(
+                fields=["expires_at"], name="user_refres_expires_b3c6b9_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="verificationcode",
+            index=models.Index(
+                fields=["created_at"], name="user_verifi_created_ce6a97_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.1.2 on 2026-10-18 13:32
+
+import user.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0006_outboundemail"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="uid",
+            field=models.CharField(
+                default=user.models.generate_uid, max_length=64, unique=True
+            ),
+        ),
+    ]
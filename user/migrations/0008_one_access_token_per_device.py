@@ -0,0 +1,35 @@
+# Generated by Django 6.1.2 on 2026-10-18 13:33
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_device_tokens(apps, schema_editor):
+    """Keeps the newest access token of each (user, device_id)."""
+    AccessToken = apps.get_model("user", "AccessToken")
+    newest = (
+        AccessToken.objects.filter(device_id__isnull=False)
+        .values("user_id", "device_id")
+        .annotate(keep=Max("pk"))
+        .values_list("keep", flat=True)
+    )
+    AccessToken.objects.filter(device_id__isnull=False).exclude(
+        pk__in=list(newest)
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0007_uid_default"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_device_tokens, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="accesstoken",
+            constraint=models.UniqueConstraint(
+                fields=("user", "device_id"), name="unique_access_token_per_device"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-18 14:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0008_one_access_token_per_device"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="verificationcode",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
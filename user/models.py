@@ -1,6 +1,5 @@
 # user/models.py
 
-import hashlib
 import secrets
 
 import jwt
@@ -11,12 +10,18 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 from django.db import models
+from django.db.models.signals import post_save
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 
 from user.managers import UserManager
 
 
+def generate_uid() -> str:
+    """Random public id, assigned before the INSERT so it needs no pk."""
+    return secrets.token_hex(8)
+
+
 class Role(models.Model):
     name = models.CharField(max_length=32, unique=True)
 
@@ -32,7 +37,7 @@ class User(AbstractBaseUser, PermissionsMixin):
         ("google", "Google"),
     ]
 
-    uid = models.CharField(max_length=64, unique=True)
+    uid = models.CharField(max_length=64, unique=True, default=generate_uid)
 
     username = models.CharField(max_length=150, blank=True, null=True)
     email = models.EmailField(unique=True, null=True, blank=True)
@@ -59,12 +64,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = []
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-
         if not self.uid:
-            base_str = f"{self.pk}-{self.username or ''}-{self.email}"
-            self.uid = hashlib.sha256(base_str.encode()).hexdigest()[:8]
-            super().save(update_fields=["uid"])
+            self.uid = generate_uid()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return str(self.uid)
@@ -84,6 +86,8 @@ class VerificationCode(models.Model):
     code = models.CharField(max_length=6, editable=False)
 
     is_used = models.BooleanField(default=False)
+    # Wrong guesses while this code was live
+    attempts = models.PositiveSmallIntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updates_at = models.DateTimeField(auto_now=True)
@@ -91,6 +95,7 @@ class VerificationCode(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["target", "type"]),
+            models.Index(fields=["created_at"]),
         ]
 
     def _generate_code(self) -> str:
@@ -148,6 +153,60 @@ class AccessToken(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "device_id"], name="unique_access_token_per_device"
+            ),
+        ]
+
+    @classmethod
+    def rotate(cls, user, device_id, expires_at, user_agent=None, ip_address=None):
+        """
+        Issues the access token of a device with one upsert: the device's
+        row is created or has its expiry moved, so there is at most one
+        live row per ``(user, device_id)``. Tokens without a device_id are
+        one more device of the user: NULLs never conflict on the unique
+        constraint, so that row is looked up and saved instead.
+        """
+        if device_id is None:
+            token = (
+                cls.objects.filter(user=user, device_id__isnull=True)
+                .order_by("pk")
+                .first()
+            ) or cls(user=user)
+            token.expires_at = expires_at
+            token.user_agent = user_agent
+            token.ip_address = ip_address
+            token.save()
+            return token
+
+        token = cls(
+            user=user,
+            device_id=device_id,
+            expires_at=expires_at,
+            user_agent=user_agent,
+            ip_address=ip_address,
+        )
+        cls.objects.bulk_create(
+            [token],
+            update_conflicts=True,
+            unique_fields=["user", "device_id"],
+            update_fields=["expires_at", "user_agent", "ip_address"],
+        )
+        if token.pk is None:  # backends that can't return ids from upserts
+            token.pk = cls.objects.values_list("pk", flat=True).get(
+                user=user, device_id=device_id
+            )
+        # bulk_create sends no signals; cached copies of the row must go.
+        post_save.send(
+            sender=cls, instance=token, created=False, update_fields=None, raw=False
+        )
+        return token
+
     @property
     def token(self):
         return self._generate_jwt_token()
@@ -186,6 +245,11 @@ class RefreshToken(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"]),
+        ]
+
     @property
     def token(self):
         return self._generate_jwt_token()
@@ -208,3 +272,41 @@ class RefreshToken(models.Model):
     def is_valid(self):
         """Determines whether the token has expired"""
         return self.expires_at > timezone.now()
+
+
+class OutboundEmail(models.Model):
+    """Queued outgoing email, rendered and sent by user.mail"""
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+
+    kind = models.CharField(max_length=32)
+    to = models.EmailField()
+    context = models.JSONField(default=dict)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Earliest next attempt; while SENDING it is the end of the worker's lease.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    batch = models.CharField(max_length=32, blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} -> {self.to} ({self.status})"
@@ -0,0 +1,92 @@
+"""
+# user/purge.py
+
+Deletes expired tokens, old verification codes, delivered queued mail and
+finished background tasks in small batches. Each batch is its own short transaction, so the purge
+never holds write locks for long and can run next to live traffic.
+"""
+
+import dataclasses
+import datetime
+import time
+
+from django.conf import settings
+from django.tasks import TaskResultStatus
+from django.utils import timezone
+
+from tasks.models import QueuedTask
+
+from .models import AccessToken, OutboundEmail, RefreshToken, VerificationCode
+
+
+@dataclasses.dataclass
+class PurgeResult:
+    deleted: dict[str, int]
+    elapsed: float
+
+    @property
+    def total(self) -> int:
+        return sum(self.deleted.values())
+
+    @property
+    def rate(self) -> float:
+        """Rows deleted per second."""
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+
+def expired_querysets(now=None) -> dict:
+    now = now or timezone.now()
+    codes_before = now - datetime.timedelta(
+        seconds=settings.PURGE_VERIFICATION_CODES_AFTER
+    )
+    emails_before = now - datetime.timedelta(
+        seconds=settings.PURGE_OUTBOUND_EMAILS_AFTER
+    )
+    tasks_before = now - datetime.timedelta(seconds=settings.PURGE_FINISHED_TASKS_AFTER)
+    return {
+        "access_tokens": AccessToken.objects.filter(expires_at__lte=now),
+        "refresh_tokens": RefreshToken.objects.filter(expires_at__lte=now),
+        "verification_codes": VerificationCode.objects.filter(
+            created_at__lt=codes_before
+        ),
+        "outbound_emails": OutboundEmail.objects.filter(
+            status__in=[OutboundEmail.SENT, OutboundEmail.FAILED],
+            created_at__lt=emails_before,
+        ),
+        "finished_tasks": QueuedTask.objects.filter(
+            status__in=[TaskResultStatus.SUCCESSFUL, TaskResultStatus.FAILED],
+            finished_at__lt=tasks_before,
+        ),
+    }
+
+
+def _purge_queryset(queryset, batch_size: int, limit: int | None) -> int:
+    deleted = 0
+    while limit is None or deleted < limit:
+        size = batch_size if limit is None else min(batch_size, limit - deleted)
+        pks = list(queryset.order_by("pk").values_list("pk", flat=True)[:size])
+        if not pks:
+            break
+        queryset.model.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        if len(pks) < size:
+            break
+    return deleted
+
+
+def purge_expired(batch_size: int | None = None, max_rows: int | None = None) -> PurgeResult:
+    """
+    Deletes expired rows, ``batch_size`` primary keys at a time. ``max_rows``
+    caps the rows deleted by this run across all tables.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    started = time.perf_counter()
+
+    deleted = {}
+    remaining = max_rows
+    for name, queryset in expired_querysets().items():
+        deleted[name] = _purge_queryset(queryset, batch_size, remaining)
+        if remaining is not None:
+            remaining -= deleted[name]
+
+    return PurgeResult(deleted=deleted, elapsed=time.perf_counter() - started)
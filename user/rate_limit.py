@@ -1,7 +1,109 @@
 # user/rate_limit.py
-from django.utils import timezone
-from django.http import JsonResponse
-from .models import VerificationCode
+"""
+Sliding-window rate limiting on top of Django's cache.
+
+Each key keeps one counter per fixed window; the rate is estimated from
+the current window plus the previous one weighted by how much of it
+still overlaps the sliding window. A check is one atomic ``incr`` and one
+``get`` whatever the traffic, so bursts cost no more than normal load.
+"""
+
+import math
+import time
+
+from django.core.cache import cache
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class RateLimiter:
+    """At most ``limit`` accepted hits per ``period`` seconds for each key"""
+
+    def __init__(self, scope: str, limit: int, period: int):
+        self.scope = scope
+        self.limit = limit
+        self.period = period
+
+    def _key(self, key: str, window: int) -> str:
+        return f"ratelimit:{self.scope}:{key}:{window}"
+
+    def hit(self, key: str, now: float | None = None) -> tuple[bool, int]:
+        """
+        Counts a hit for ``key``. Returns ``(allowed, retry_after)``;
+        rejected hits are not counted.
+        """
+        now = time.time() if now is None else now
+        window = int(now // self.period)
+        elapsed = now - window * self.period
+        current_key = self._key(key, window)
+
+        cache.add(current_key, 0, timeout=self.period * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:  # expired between add() and incr()
+            cache.set(current_key, 1, timeout=self.period * 2)
+            current = 1
+        previous = cache.get(self._key(key, window - 1), 0)
+
+        weight = 1 - elapsed / self.period
+        if previous * weight + current <= self.limit:
+            return True, 0
+
+        cache.decr(current_key)
+        return False, self._retry_after(current - 1, previous, elapsed)
+
+    def _retry_after(self, current: int, previous: int, elapsed: float) -> int:
+        """Seconds until one more hit fits under the limit."""
+        if current >= self.limit:
+            # Wait for the next window, where this one becomes ``previous``.
+            overlap = self.period * (1 - (self.limit - 1) / current)
+            wait = self.period - elapsed + max(0.0, overlap)
+        else:
+            needed = self.period * (1 - (self.limit - current - 1) / previous)
+            wait = needed - elapsed
+        return max(1, math.ceil(wait))
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    ``SimpleRateThrottle`` backed by :class:`RateLimiter` instead of a
+    cached list of timestamps. Rates come from ``DEFAULT_THROTTLE_RATES``.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        limiter = RateLimiter(self.scope, self.num_requests, self.duration)
+        allowed, self.retry_after = limiter.hit(key)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class LoginCodeIPThrottle(SlidingWindowRateThrottle):
+    """Login code requests per client IP"""
+
+    scope = "login_code_ip"
+
+    def get_cache_key(self, request, view):
+        return self.get_ident(request)
+
+
+class LoginCodeTargetThrottle(SlidingWindowRateThrottle):
+    """Login code requests per email address"""
+
+    scope = "login_code_target"
+
+    def get_cache_key(self, request, view):
+        email = request.data.get("email")
+        if not isinstance(email, str) or not email:
+            return None
+        return email.strip().lower()
 
 
 class VerificationCodeRateLimitMixin:
@@ -9,15 +111,6 @@ class VerificationCodeRateLimitMixin:
     RATE_PERIOD = 60
 
     def check_rate_limit(self, target: str, type_: str):
-        since = timezone.now() - timezone.timedelta(seconds=self.RATE_PERIOD)
-
-        count = VerificationCode.objects.filter(
-            target=target,
-            type=type_,
-            created_at__gte=since,
-        ).count()
-
-        if count >= self.RATE_LIMIT:
-            return False
-
-        return True
+        limiter = RateLimiter("verification_code", self.RATE_LIMIT, self.RATE_PERIOD)
+        allowed, _ = limiter.hit(f"{type_}:{target}")
+        return allowed
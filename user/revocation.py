@@ -0,0 +1,94 @@
+"""
+# user/revocation.py
+
+Denylist of revoked access tokens. Stateless verification (see
+``user.auth``) never reads the ``AccessToken`` table, so deleting a row is
+not enough to log a device out: the token id is also recorded here until
+the JWT would have expired on its own.
+
+The list lives in the shared cache as ``{token_id: exp}``. Each worker
+keeps a copy and re-reads it at most every ``JWT_REVOCATION_REFRESH``
+seconds, which bounds how long a revoked token can still be accepted.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+DENYLIST_KEY = "user:revoked_access_tokens"
+LOCK_KEY = "user:revoked_access_tokens:lock"
+
+_local = {"tokens": {}, "fetched_at": None}
+_lock = threading.Lock()
+
+
+def _load() -> dict[int, int]:
+    with _lock:
+        fetched_at = _local["fetched_at"]
+        now = time.monotonic()
+        if fetched_at is None or now - fetched_at >= settings.JWT_REVOCATION_REFRESH:
+            _local["tokens"] = cache.get(DENYLIST_KEY) or {}
+            _local["fetched_at"] = now
+        return _local["tokens"]
+
+
+def is_revoked(token_id) -> bool:
+    return token_id in _load()
+
+
+def _acquire() -> bool:
+    # Revocations are rare; a short spin keeps concurrent writers from
+    # overwriting each other's entries.
+    for _ in range(50):
+        if cache.add(LOCK_KEY, 1, timeout=5):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def deny(tokens) -> None:
+    """Adds ``(token_id, expires_at)`` pairs to the denylist."""
+    tokens = [(token_id, int(expires_at.timestamp())) for token_id, expires_at in tokens]
+    if not tokens:
+        return
+
+    now = int(timezone.now().timestamp())
+    locked = _acquire()
+    try:
+        denylist = {
+            token_id: exp
+            for token_id, exp in (cache.get(DENYLIST_KEY) or {}).items()
+            if exp > now
+        }
+        denylist.update((token_id, exp) for token_id, exp in tokens if exp > now)
+        timeout = max(denylist.values(), default=now) - now + 1
+        cache.set(DENYLIST_KEY, denylist, timeout)
+    finally:
+        if locked:
+            cache.delete(LOCK_KEY)
+
+    with _lock:
+        _local["tokens"] = denylist
+        _local["fetched_at"] = time.monotonic()
+
+
+def revoke_access_tokens(queryset) -> int:
+    """Deletes the access tokens in ``queryset`` and denylists their ids."""
+    tokens = list(queryset.values_list("id", "expires_at"))
+    if not tokens:
+        return 0
+    deleted, _ = queryset.model.objects.filter(
+        pk__in=[token_id for token_id, _ in tokens]
+    ).delete()
+    deny(tokens)
+    return deleted
+
+
+def reset() -> None:
+    """Forgets this worker's copy of the denylist."""
+    with _lock:
+        _local["tokens"] = {}
+        _local["fetched_at"] = None
@@ -7,7 +7,9 @@ import datetime
 from django.utils import timezone
 from rest_framework import serializers
 
-from .models import User, AccessToken, RefreshToken, VerificationCode
+from .codes import get_code_store
+from .models import User, AccessToken, RefreshToken
+from .revocation import revoke_access_tokens
 
 
 class RequestCodeSerializer(serializers.Serializer):
@@ -16,18 +18,10 @@ class RequestCodeSerializer(serializers.Serializer):
     email = serializers.CharField(max_length=255, required=True)
 
     def create(self, validated_data):
+        # Request rates are limited by the view's throttles (user.rate_limit).
         email = validated_data["email"]
-        now = timezone.now()
-
-        recent_count = VerificationCode.objects.filter(
-            email=email, created_at__gte=now - datetime.timedelta(minutes=1)
-        ).count()
-
-        if recent_count >= 10:
-            raise serializers.ValidationError("Too many requests. Try again later.")
-
-        login_code = VerificationCode.create_with_code(email=email)
-        return {"email": email, "code": login_code.code}
+        code = get_code_store().issue(email, "email")
+        return {"email": email, "code": code}
 
     def update(self, instance, validated_data):
         raise serializers.ValidationError("Update operation is not supported!")
@@ -45,23 +39,8 @@ class EnterCodeSerializer(serializers.Serializer):
         if not email or not code:
             raise serializers.ValidationError("Требуется адрес электронной почты и код")
 
-        record = (
-            VerificationCode.objects.filter(email=email, is_used=False)
-            .order_by("-created_at")
-            .first()
-        )
-
-        if not record:
-            raise serializers.ValidationError("Код не найден или уже использован")
-
-        if record.is_expired():
-            raise serializers.ValidationError("Срок действия кода истёк")
-
-        if not record.check_code(code):
-            raise serializers.ValidationError("Неверный код.")
-
-        record.is_used = True
-        record.save(update_fields=["is_used"])
+        if not get_code_store().consume(email, "email", code):
+            raise serializers.ValidationError("Неверный код или срок его действия истёк")
 
         return data
 
@@ -73,7 +52,7 @@ class EnterCodeSerializer(serializers.Serializer):
             email=email, defaults={"username": email.split("@")[0], "is_active": True}
         )
 
-        AccessToken.objects.filter(user=user, device_id=device_id).delete()
+        revoke_access_tokens(AccessToken.objects.filter(user=user, device_id=device_id))
         RefreshToken.objects.filter(user=user, device_id=device_id).delete()
 
         now = timezone.now()
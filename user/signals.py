@@ -1,6 +1,15 @@
+from . import auth
 from .models import Role
 
 def create_default_roles(sender, **kwargs):
     roles = ["admin", "user", "moderator"]
     for role in roles:
         Role.objects.get_or_create(name=role)
+
+
+def token_changed(sender, instance, **kwargs):
+    auth.forget_token(sender, instance.pk)
+
+
+def user_changed(sender, instance, **kwargs):
+    auth.forget_user(instance.pk)
@@ -0,0 +1,34 @@
+"""
+# user/tasks.py
+
+Background tasks of the user app, run by ``manage.py runworker``; the
+periodic ones are listed in TASK_SCHEDULE.
+"""
+
+import logging
+
+from django.conf import settings
+from django.tasks import task
+
+from .mail import send_pending
+from .purge import purge_expired
+
+logger = logging.getLogger(__name__)
+
+
+@task
+def purge_expired_rows() -> dict[str, int]:
+    result = purge_expired(max_rows=settings.PURGE_MAX_ROWS)
+    if result.total:
+        logger.info(
+            "Purged %s rows (%s) at %.0f rows/s",
+            result.total,
+            ", ".join(f"{k}={v}" for k, v in result.deleted.items()),
+            result.rate,
+        )
+    return result.deleted
+
+
+@task(queue_name="mail")
+def send_queued_mail() -> dict[str, int]:
+    return send_pending()
@@ -1,3 +1,602 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocMemEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.tasks import TaskResultStatus
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from tasks.models import QueuedTask
+from tasks.worker import Worker
+
+from . import auth, codes, purge, revocation
+from .mail import enqueue_login_code, send_pending
+from .models import AccessToken, OutboundEmail, RefreshToken, User, VerificationCode
+from .rate_limit import RateLimiter
+
+
+def issue_access_token(user, device_id="device", hours=1) -> AccessToken:
+    return AccessToken.objects.create(
+        user=user,
+        device_id=device_id,
+        expires_at=timezone.now() + datetime.timedelta(hours=hours),
+    )
+
+
+def reset_auth_caches():
+    cache.clear()
+    revocation.reset()
+    auth._users.clear()
+    for tokens in auth._tokens.values():
+        tokens.clear()
+
+
+@override_settings(JWT_STATELESS_ACCESS_TOKENS=True)
+class StatelessAccessTokenTests(TestCase):
+    def setUp(self):
+        reset_auth_caches()
+        self.user = User.objects.create_user(email="user@example.com")
+        self.token = issue_access_token(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.token}")
+
+    def test_hot_path_does_not_touch_the_database(self):
+        self.client.get("/api/auth/me/")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["email"], "user@example.com")
+
+    def test_expired_token_is_rejected(self):
+        token = issue_access_token(self.user, device_id="expired", hours=-1)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.token}")
+
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+    def test_deleted_device_is_revoked(self):
+        other = issue_access_token(self.user, device_id="other")
+
+        response = self.client.delete(f"/api/auth/devices/{other.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(AccessToken.objects.filter(pk=other.pk).exists())
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {other.token}")
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+    def test_logout_others_revokes_every_other_device(self):
+        others = [issue_access_token(self.user, device_id=f"d{i}") for i in range(3)]
+
+        response = self.client.post(
+            "/api/auth/devices/logout_others/", {"device_id": "device"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        for token in others:
+            self.assertTrue(revocation.is_revoked(token.pk))
+        self.assertFalse(revocation.is_revoked(self.token.pk))
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+
+    def test_other_workers_pick_up_revocations_after_refresh(self):
+        revocation.is_revoked(self.token.pk)
+        # Another worker revokes the token through the shared cache.
+        cache.set(revocation.DENYLIST_KEY, {self.token.pk: 2**40})
+
+        with override_settings(JWT_REVOCATION_REFRESH=60):
+            self.assertFalse(revocation.is_revoked(self.token.pk))
+        with override_settings(JWT_REVOCATION_REFRESH=0):
+            self.assertTrue(revocation.is_revoked(self.token.pk))
+
+    def test_inactive_user_is_rejected(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+    @override_settings(JWT_STATELESS_ACCESS_TOKENS=False)
+    def test_database_mode_checks_the_token_row(self):
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+
+        AccessToken.objects.filter(pk=self.token.pk).delete()
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+
+@override_settings(JWT_STATELESS_ACCESS_TOKENS=False)
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        reset_auth_caches()
+        self.user = User.objects.create_user(email="user@example.com")
+        self.token = issue_access_token(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.token}")
+
+    def test_repeated_requests_are_served_from_the_cache(self):
+        self.client.get("/api/auth/me/")
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.status_code, 200)
+
+        stats = auth.cache_stats()["access_tokens"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_deleting_the_token_invalidates_it(self):
+        self.client.get("/api/auth/me/")
+        AccessToken.objects.get(pk=self.token.pk).delete()
+
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+    def test_saving_the_user_invalidates_their_tokens(self):
+        self.client.get("/api/auth/me/")
+        self.user.username = "renamed"
+        self.user.save()
+
+        response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.json()["username"], "renamed")
+        self.assertEqual(auth.cache_stats()["access_tokens"]["misses"], 2)
+
+    def test_cached_expiry_is_checked_on_every_request(self):
+        self.client.get("/api/auth/me/")
+        expired = timezone.now() - datetime.timedelta(seconds=1)
+        auth._tokens[AccessToken].get(self.token.pk).expires_at = expired
+        AccessToken.objects.filter(pk=self.token.pk).update(expires_at=expired)
+
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+    def test_request_user_changes_do_not_leak_into_the_cache(self):
+        token = auth.JWTAuthentication()._get_access_token(
+            {"id": self.token.pk, "user_id": self.user.pk}
+        )
+        token.user.username = "mutated"
+
+        cached = auth._tokens[AccessToken].get(self.token.pk)
+        self.assertNotEqual(cached.user.username, "mutated")
+
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        reset_auth_caches()
+        self.user = User.objects.create_user(email="user@example.com")
+        self.live = issue_access_token(self.user)
+        for i in range(7):
+            issue_access_token(self.user, device_id=f"old{i}", hours=-1)
+
+    def test_deletes_only_expired_rows_in_batches(self):
+        result = purge.purge_expired(batch_size=3)
+
+        self.assertEqual(result.deleted["access_tokens"], 7)
+        self.assertEqual(
+            list(AccessToken.objects.values_list("pk", flat=True)), [self.live.pk]
+        )
+        self.assertGreaterEqual(result.rate, 0)
+
+    def test_max_rows_caps_a_run(self):
+        result = purge.purge_expired(batch_size=2, max_rows=5)
+
+        self.assertEqual(result.total, 5)
+        self.assertEqual(AccessToken.objects.count(), 3)
+
+    def test_old_verification_codes_are_purged(self):
+        code = VerificationCode.objects.create(target="user@example.com", type="email")
+        VerificationCode.objects.filter(pk=code.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=1)
+        )
+        fresh = VerificationCode.objects.create(target="user@example.com", type="email")
+
+        purge.purge_expired()
+        self.assertEqual(
+            list(VerificationCode.objects.values_list("pk", flat=True)), [fresh.pk]
+        )
+
+    def test_finished_tasks_are_purged(self):
+        old = QueuedTask.objects.create(
+            id="old",
+            name="user.tasks.send_queued_mail",
+            status=TaskResultStatus.SUCCESSFUL,
+            finished_at=timezone.now() - datetime.timedelta(days=8),
+        )
+        QueuedTask.objects.create(id="ready", name="user.tasks.send_queued_mail")
+
+        result = purge.purge_expired()
+        self.assertEqual(result.deleted["finished_tasks"], 1)
+        self.assertFalse(QueuedTask.objects.filter(pk=old.pk).exists())
+        self.assertTrue(QueuedTask.objects.filter(pk="ready").exists())
+
+    def test_command_reports_rate(self):
+        out = io.StringIO()
+        call_command("purge_expired", "--batch-size", "2", stdout=out)
+        self.assertIn("Deleted 7 rows", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+
+
+class RateLimiterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.limiter = RateLimiter("test", limit=4, period=60)
+
+    def test_limit_within_a_window(self):
+        results = [self.limiter.hit("key", now=600 + i)[0] for i in range(5)]
+        self.assertEqual(results, [True] * 4 + [False])
+        self.assertTrue(self.limiter.hit("other", now=605)[0])
+
+    def test_previous_window_slides_out(self):
+        for i in range(4):
+            self.limiter.hit("key", now=650 + i)
+
+        # 5s into the next window 11/12 of the previous one still counts.
+        allowed, retry_after = self.limiter.hit("key", now=665)
+        self.assertFalse(allowed)
+        self.assertEqual(retry_after, 10)
+        self.assertFalse(self.limiter.hit("key", now=674)[0])
+        self.assertTrue(self.limiter.hit("key", now=675)[0])
+
+    def test_retry_after_points_at_the_first_allowed_second(self):
+        for i in range(4):
+            self.limiter.hit("key", now=610 + i)
+
+        allowed, retry_after = self.limiter.hit("key", now=620)
+        self.assertFalse(allowed)
+        self.assertEqual(retry_after, 55)
+        self.assertFalse(self.limiter.hit("key", now=620 + retry_after - 1)[0])
+        self.assertTrue(self.limiter.hit("key", now=620 + retry_after)[0])
+
+
+class RequestCodeThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def request_code(self, email, ip="10.0.0.1"):
+        return self.client.post(
+            "/api/auth/request/", {"email": email}, format="json", REMOTE_ADDR=ip
+        )
+
+    def test_per_email_limit_sets_retry_after(self):
+        for _ in range(4):
+            self.assertEqual(self.request_code("user@example.com").status_code, 200)
+
+        response = self.request_code("User@Example.com ", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(self.request_code("other@example.com").status_code, 200)
+
+    def test_per_ip_limit(self):
+        for i in range(20):
+            self.assertEqual(self.request_code(f"u{i}@example.com").status_code, 200)
+
+        self.assertEqual(self.request_code("late@example.com").status_code, 429)
+        self.assertEqual(
+            self.request_code("late@example.com", ip="10.0.0.9").status_code, 200
+        )
+
+    def test_forwarded_for_does_not_reset_the_ip_limit(self):
+        for i in range(21):
+            response = self.client.post(
+                "/api/auth/request/",
+                {"email": f"u{i}@example.com"},
+                format="json",
+                REMOTE_ADDR="10.0.0.1",
+                HTTP_X_FORWARDED_FOR=f"203.0.113.{i}",
+            )
+        self.assertEqual(response.status_code, 429)
+
+
+class CountingEmailBackend(LocMemEmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return True
+
+
+class FailingEmailBackend(LocMemEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP is down")
+
+
+class MailQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_request_code_is_queued_then_sent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/auth/request/", {"email": "user@example.com"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.status, OutboundEmail.PENDING)
+
+        self.assertEqual(Worker(queues=["mail"]).run_pending(), 1)
+        task = QueuedTask.objects.get(name="user.tasks.send_queued_mail")
+        self.assertEqual(task.return_value, {"sent": 1, "retry": 0, "failed": 0})
+        self.assertEqual(mail.outbox[0].to, ["user@example.com"])
+        self.assertIn(queued.context["code"], mail.outbox[0].body)
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.SENT)
+        self.assertIsNotNone(queued.sent_at)
+        self.assertEqual(queued.context, {})
+
+    @override_settings(EMAIL_BACKEND="user.tests.CountingEmailBackend")
+    def test_one_connection_per_batch(self):
+        CountingEmailBackend.opened = 0
+        for i in range(5):
+            enqueue_login_code(f"u{i}@example.com", "123456")
+
+        self.assertEqual(send_pending(batch_size=3)["sent"], 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(CountingEmailBackend.opened, 2)
+
+    @override_settings(
+        EMAIL_BACKEND="user.tests.FailingEmailBackend", MAIL_QUEUE_MAX_ATTEMPTS=2
+    )
+    def test_failures_back_off_then_give_up(self):
+        queued = enqueue_login_code("user@example.com", "123456")
+
+        self.assertEqual(send_pending()["retry"], 1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (OutboundEmail.PENDING, 1))
+        self.assertIn("SMTP is down", queued.last_error)
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+        # Still needed for the retry.
+        self.assertEqual(queued.context, {"code": "123456"})
+
+        # Not due yet.
+        self.assertEqual(send_pending()["retry"], 0)
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_pending()["failed"], 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.FAILED)
+        self.assertEqual(queued.context, {})
+
+    def test_expired_lease_is_claimed_again(self):
+        queued = enqueue_login_code("user@example.com", "123456")
+        OutboundEmail.objects.update(
+            status=OutboundEmail.SENDING,
+            next_attempt_at=timezone.now() - datetime.timedelta(seconds=1),
+        )
+
+        self.assertEqual(send_pending()["sent"], 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.SENT)
+
+
+class UserCreationTests(TestCase):
+    def test_new_user_is_a_single_insert(self):
+        with self.assertNumQueries(1):
+            user = User.objects.create_user(email="user@example.com")
+        self.assertEqual(len(user.uid), 16)
+        self.assertEqual(User.objects.get(pk=user.pk).uid, user.uid)
+
+    def test_bulk_import_in_batches(self):
+        rows = (
+            {"email": f"User{i}@Example.com", "username": f"u{i}"} for i in range(25)
+        )
+
+        with self.assertNumQueries(3):
+            self.assertEqual(User.objects.bulk_import(rows, batch_size=10), 25)
+
+        self.assertEqual(User.objects.count(), 25)
+        self.assertEqual(len(set(User.objects.values_list("uid", flat=True))), 25)
+        self.assertTrue(User.objects.filter(email="User0@example.com").exists())
+
+    def test_import_command_skips_existing_users(self):
+        User.objects.create_user(email="taken@example.com")
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "users.jsonl")
+            with open(path, "w") as stream:
+                stream.write('{"email": "taken@example.com"}\n\n')
+                stream.write(
+                    '{"email": "new@example.com", "is_guest": true, "is_staff": true}\n'
+                )
+            call_command("import_users", path, stdout=out)
+
+        self.assertIn("Created 1 of 2 users", out.getvalue())
+        new = User.objects.get(email="new@example.com")
+        self.assertTrue(new.is_guest)
+        self.assertFalse(new.is_staff)
+
+    def test_import_command_rejects_bad_rows(self):
+        cases = [
+            ('{"phone": "+100"}', "line 2: email must be set"),
+            ('{"email": 5}', "line 2: email must be set"),
+            ('["a@example.com"]', "line 2: expected a JSON object"),
+            ("{", "line 2: "),
+        ]
+        for line, message in cases:
+            with self.subTest(line=line), tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "users.jsonl")
+                with open(path, "w") as stream:
+                    stream.write('{"email": "a@example.com"}\n' + line + "\n")
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command("import_users", path, stdout=io.StringIO())
+
+
+class RefreshRotationTests(TestCase):
+    def setUp(self):
+        reset_auth_caches()
+        self.user = User.objects.create_user(email="user@example.com")
+        self.access = issue_access_token(self.user, device_id="phone")
+        refresh = RefreshToken.objects.create(
+            user=self.user,
+            device_id="phone",
+            expires_at=timezone.now() + datetime.timedelta(days=60),
+        )
+        self.client = APIClient()
+        self.client.cookies["refresh"] = refresh.token
+
+    def refresh(self) -> str:
+        response = self.client.post("/api/auth/refresh/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["access_token"]
+
+    def test_refresh_rotates_the_device_row_in_place(self):
+        AccessToken.objects.filter(pk=self.access.pk).update(
+            expires_at=timezone.now() + datetime.timedelta(minutes=1)
+        )
+        self.refresh()
+        self.refresh()
+
+        token = AccessToken.objects.get(user=self.user, device_id="phone")
+        self.assertEqual(token.pk, self.access.pk)
+        self.assertGreater(
+            token.expires_at, timezone.now() + datetime.timedelta(minutes=59)
+        )
+        self.assertEqual(AccessToken.objects.count(), 1)
+
+    def test_new_device_gets_its_own_row(self):
+        token = AccessToken.rotate(
+            self.user, "laptop", timezone.now() + datetime.timedelta(hours=1)
+        )
+        self.assertNotEqual(token.pk, self.access.pk)
+        self.assertEqual(AccessToken.objects.count(), 2)
+
+    def test_tokens_without_a_device_share_one_row(self):
+        expires_at = timezone.now() + datetime.timedelta(hours=1)
+        first = AccessToken.rotate(self.user, None, expires_at)
+        second = AccessToken.rotate(self.user, None, expires_at, user_agent="curl")
+
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(
+            AccessToken.objects.get(user=self.user, device_id=None).user_agent, "curl"
+        )
+        self.assertEqual(AccessToken.objects.count(), 2)
+
+    @override_settings(JWT_STATELESS_ACCESS_TOKENS=False)
+    def test_rotation_drops_the_cached_row(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access.token}")
+        self.client.get("/api/auth/me/")
+        self.assertIn(self.access.pk, auth._tokens[AccessToken]._data)
+
+        access = self.refresh()
+        self.assertNotIn(self.access.pk, auth._tokens[AccessToken]._data)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+
+    @override_settings(JWT_STATELESS_ACCESS_TOKENS=False)
+    def test_row_rotated_by_another_worker_is_read_again(self):
+        AccessToken.objects.filter(pk=self.access.pk).update(
+            expires_at=timezone.now() + datetime.timedelta(seconds=1)
+        )
+        self.access.refresh_from_db()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access.token}")
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+
+        # Another worker rotates the row; this worker's cache isn't told.
+        AccessToken.objects.filter(pk=self.access.pk).update(
+            expires_at=timezone.now() + datetime.timedelta(hours=1)
+        )
+        self.access.refresh_from_db()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access.token}")
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+        self.assertEqual(
+            auth._tokens[AccessToken].get(self.access.pk).expires_at,
+            self.access.expires_at,
+        )
+
+
+@override_settings(VERIFICATION_CODE_STORE="user.codes.CacheCodeStore")
+class CodeStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        codes.flush_audit()
+        self.store = codes.get_code_store()
+
+    def test_code_is_consumed_once(self):
+        code = self.store.issue("user@example.com", "email")
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.store.consume("user@example.com", "email", code))
+        self.assertFalse(self.store.consume("user@example.com", "email", code))
+
+    def test_new_code_replaces_the_previous_one(self):
+        first = self.store.issue("user@example.com", "email")
+        second = self.store.issue("user@example.com", "email")
+
+        if first != second:
+            self.assertFalse(self.store.consume("user@example.com", "email", first))
+        self.assertTrue(self.store.consume("user@example.com", "email", second))
+
+    @override_settings(VERIFICATION_CODE_MAX_ATTEMPTS=3)
+    def test_wrong_guesses_burn_the_code(self):
+        code = self.store.issue("user@example.com", "email")
+        wrong = "000000" if code != "000000" else "111111"
+        for _ in range(3):
+            self.assertFalse(self.store.consume("user@example.com", "email", wrong))
+
+        self.assertFalse(self.store.consume("user@example.com", "email", code))
+
+    @override_settings(VERIFICATION_CODE_AUDIT=True)
+    def test_audit_rows_are_written_on_flush(self):
+        issued_at = timezone.now() - datetime.timedelta(seconds=30)
+        with mock.patch("user.codes.timezone.now", return_value=issued_at):
+            code = self.store.issue("user@example.com", "email")
+        self.store.consume("user@example.com", "email", code)
+        self.assertFalse(VerificationCode.objects.exists())
+
+        self.assertEqual(codes.flush_audit(), 2)
+        record = VerificationCode.objects.get()
+        self.assertEqual(
+            (record.target, record.code, record.is_used),
+            ("user@example.com", code, True),
+        )
+        self.assertEqual(record.created_at, issued_at)
+
+    def test_login_flow(self):
+        self.client.post("/api/auth/request/", {"email": "user@example.com"})
+        code = OutboundEmail.objects.get().context["code"]
+
+        payload = {"email": "user@example.com", "code": code, "device_id": "phone"}
+        response = self.client.post("/api/auth/enter/", payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access_token", response.json())
+
+        response = self.client.post("/api/auth/enter/", payload)
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(VERIFICATION_CODE_STORE="user.codes.DatabaseCodeStore")
+class DatabaseCodeStoreTests(TestCase):
+    def test_code_is_consumed_once(self):
+        store = codes.get_code_store()
+        code = store.issue("user@example.com", "email")
+
+        self.assertTrue(store.consume("user@example.com", "email", code))
+        self.assertFalse(store.consume("user@example.com", "email", code))
+
+    def test_expired_code_is_rejected(self):
+        store = codes.get_code_store()
+        code = store.issue("user@example.com", "email")
+        VerificationCode.objects.update(
+            created_at=timezone.now() - datetime.timedelta(minutes=6)
+        )
+
+        self.assertFalse(store.consume("user@example.com", "email", code))
+
+    @override_settings(VERIFICATION_CODE_MAX_ATTEMPTS=3)
+    def test_wrong_guesses_burn_the_code(self):
+        store = codes.get_code_store()
+        code = store.issue("user@example.com", "email")
+        wrong = "000000" if code != "000000" else "111111"
+        for _ in range(3):
+            self.assertFalse(store.consume("user@example.com", "email", wrong))
+
+        self.assertFalse(store.consume("user@example.com", "email", code))
+        self.assertTrue(VerificationCode.objects.get().is_used)
+
+        code = store.issue("user@example.com", "email")
+        self.assertFalse(store.consume("user@example.com", "email", wrong))
+        self.assertTrue(store.consume("user@example.com", "email", code))
@@ -3,14 +3,19 @@ from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 
 
-def send_login_code(email, code):
+def login_code_message(email, code, connection=None) -> EmailMultiAlternatives:
     msg = EmailMultiAlternatives(
         "Ваш код для входа",
         f"Ваш код: {code}\n\nЕсли вы не запрашивали вход, просто проигнорируйте это письмо.",
         settings.EMAIL,
         [email],
+        connection=connection,
     )
     msg.attach_alternative(
         render_to_string("authCode.html", {"code": code}), "text/html"
     )
-    msg.send()
+    return msg
+
+
+def send_login_code(email, code):
+    login_code_message(email, code).send()
@@ -16,17 +16,20 @@ from rest_framework.views import APIView
 
 from .auth import JWTAuthentication
 from .models import AccessToken, RefreshToken
+from .rate_limit import LoginCodeIPThrottle, LoginCodeTargetThrottle
+from .revocation import revoke_access_tokens
 from .serializers import (
     AccessTokenSerializer,
     EnterCodeSerializer,
     RequestCodeSerializer,
 )
-from .utils import send_login_code
+from .mail import enqueue_login_code
 
 
 class RequestCodeView(APIView):
     authentication_classes = []
     permission_classes = [AllowAny]
+    throttle_classes = [LoginCodeIPThrottle, LoginCodeTargetThrottle]
     serializer_class = RequestCodeSerializer
 
     def post(self, request: Request) -> Response:
@@ -34,17 +37,12 @@ class RequestCodeView(APIView):
         serializer.is_valid(raise_exception=True)
         login_code = serializer.save()
 
-        try:
-            send_login_code(email=login_code.get("email"), code=login_code.get("code"))
-            return Response(
-                {"message": "Код отправлен на email"},
-                status=status.HTTP_200_OK,
-            )
-        except Exception as exc:
-            return Response(
-                {"message": str(exc)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
+        # Sent by the mail queue worker (user.mail), not inside the request.
+        enqueue_login_code(email=login_code.get("email"), code=login_code.get("code"))
+        return Response(
+            {"message": "Код отправлен на email"},
+            status=status.HTTP_200_OK,
+        )
 
 
 class EnterCodeView(APIView):
@@ -131,10 +129,10 @@ class RefreshView(APIView):
         if not refresh_token.is_valid():
             return Response({"detail": "Refresh token expired"}, status=401)
 
-        new_access = AccessToken.objects.create(
+        new_access = AccessToken.rotate(
             user=refresh_token.user,
-            expires_at=timezone.now() + datetime.timedelta(hours=1),
             device_id=refresh_token.device_id,
+            expires_at=timezone.now() + datetime.timedelta(hours=1),
             user_agent=refresh_token.user_agent,
             ip_address=refresh_token.ip_address,
         )
@@ -164,16 +162,15 @@ class DeviceDeleteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request: Request, pk):
-        try:
-            token = AccessToken.objects.get(pk=pk, user=request.user)
-            token.delete()
-            return Response(
-                {"detail": "Device logged out successfully"}, status=status.HTTP_200_OK
-            )
-        except AccessToken.DoesNotExist:
+        if not revoke_access_tokens(
+            AccessToken.objects.filter(pk=pk, user=request.user)
+        ):
             return Response(
                 {"detail": "Device not found"}, status=status.HTTP_404_NOT_FOUND
             )
+        return Response(
+            {"detail": "Device logged out successfully"}, status=status.HTTP_200_OK
+        )
 
 
 class DeviceLogoutOthersView(APIView):
@@ -188,9 +185,11 @@ class DeviceLogoutOthersView(APIView):
                 {"detail": "device_id required"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        AccessToken.objects.filter(user=request.user).exclude(
-            device_id=current_device_id
-        ).delete()
+        revoke_access_tokens(
+            AccessToken.objects.filter(user=request.user).exclude(
+                device_id=current_device_id
+            )
+        )
 
         return Response(
             {"detail": "All other devices logged out"}, status=status.HTTP_200_OK